@@ -0,0 +1,8 @@
+-- Tabela: ETL_CHECKPOINT (Controle de cargas incrementais)
+-- Guarda quantas linhas de cada arquivo de origem ja foram carregadas,
+-- permitindo retomar uma carga interrompida.
+CREATE TABLE IF NOT EXISTS etl_checkpoint (
+    source          VARCHAR(255) PRIMARY KEY,
+    rows_done       BIGINT       NOT NULL,
+    updated_at      TIMESTAMP
+);
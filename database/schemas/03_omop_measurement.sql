@@ -0,0 +1,24 @@
+-- Tabela: MEASUREMENT (Baseado no OMOP CDM v5.4)
+-- Resultados laboratoriais estruturados (valor numerico, unidade, data/hora)
+CREATE TABLE IF NOT EXISTS measurement (
+    measurement_id                  INTEGER PRIMARY KEY, -- Adaptado para SQLite
+    person_id                       BIGINT       NOT NULL,
+    measurement_concept_id          INTEGER      NOT NULL,
+    measurement_date                DATE         NOT NULL,
+    measurement_datetime            TIMESTAMP    NOT NULL,
+    measurement_type_concept_id     INTEGER      NOT NULL,
+    operator_concept_id             INTEGER,
+    value_as_number                 REAL,
+    value_as_concept_id             INTEGER,
+    unit_concept_id                 INTEGER,
+    range_low                       REAL,
+    range_high                      REAL,
+    measurement_source_value        VARCHAR(50)  NOT NULL, -- Codigo do exame na origem (ex: CREAT)
+    unit_source_value               VARCHAR(50),
+    value_source_value              VARCHAR(50),
+    source_system                   VARCHAR(50)            -- Adaptado: sistema de origem (TASY, SAP...)
+);
+
+-- Índice composto: "último valor" e "tendência em N dias" viram buscas no índice
+CREATE INDEX IF NOT EXISTS idx_measurement_person_concept_dt
+    ON measurement (person_id, measurement_source_value, measurement_datetime);
@@ -0,0 +1,28 @@
+-- Tabela: PERSON (Baseado no OMOP CDM, com campos clinicos usados no dashboard)
+CREATE TABLE IF NOT EXISTS person (
+    person_id                   INTEGER PRIMARY KEY, -- Adaptado para SQLite
+    gender_concept_id           INTEGER      NOT NULL DEFAULT 0,
+    year_of_birth               INTEGER,
+    person_source_value         VARCHAR(100) COLLATE NOCASE, -- Nome exibido no prontuario
+    gender_source_value         VARCHAR(50),
+    idade                       INTEGER,      -- Adaptado: dados clinicos do dashboard
+    peso_kg                     REAL,
+    bsa_m2                      REAL,
+    status                      VARCHAR(50)
+);
+
+-- Busca por prefixo do nome (LIKE 'abc%' usa o indice por ser NOCASE)
+CREATE INDEX IF NOT EXISTS idx_person_source_value ON person (person_source_value);
+
+-- Tabela: NOTE (Baseado no OMOP CDM) - evolucoes clinicas em texto livre
+CREATE TABLE IF NOT EXISTS note (
+    note_id                     INTEGER PRIMARY KEY, -- Adaptado para SQLite
+    person_id                   BIGINT       NOT NULL,
+    note_date                   DATE         NOT NULL,
+    note_datetime               TIMESTAMP,
+    note_type_concept_id        INTEGER      NOT NULL DEFAULT 32817,
+    note_title                  VARCHAR(250),
+    note_text                   TEXT         NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_note_person_dt ON note (person_id, note_datetime);
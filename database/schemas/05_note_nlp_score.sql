@@ -0,0 +1,11 @@
+-- Tabela: NOTE_NLP_SCORE (Cache de inferencia NER + gravidade por conteudo)
+-- Chave = hash SHA-256 do texto da nota: notas identicas nunca sao reprocessadas.
+CREATE TABLE IF NOT EXISTS note_nlp_score (
+    text_hash                   CHAR(64)     NOT NULL,
+    model_version               VARCHAR(20)  NOT NULL,
+    gravidade                   VARCHAR(50)  NOT NULL,
+    confianca                   REAL         NOT NULL,
+    entidades_json              TEXT,
+    scored_at                   TIMESTAMP    NOT NULL,
+    PRIMARY KEY (text_hash, model_version)
+);
@@ -0,0 +1,20 @@
+-- Tabela: PK_FIT (Ajuste MIPD por paciente)
+-- Ultima estimativa MAP dos parametros individuais (CL, V) e a dose recomendada.
+-- Os etas salvos sao o ponto de partida (warm start) da proxima reestimacao.
+CREATE TABLE IF NOT EXISTS pk_fit (
+    person_id                   INTEGER PRIMARY KEY,
+    model_version               VARCHAR(20)  NOT NULL,
+    eta_cl                      REAL         NOT NULL,
+    eta_v                       REAL         NOT NULL,
+    cl_L_h                      REAL         NOT NULL,
+    vd_L                        REAL         NOT NULL,
+    crcl_ml_min                 REAL,
+    creatinina_mg_dl            REAL,
+    n_obs                       INTEGER      NOT NULL,
+    iteracoes                   INTEGER,
+    dose_padrao_mg              REAL,
+    auc_alvo_mg_h_L             REAL,        -- AUC do paciente de referencia com a dose padrao
+    dose_recomendada_mg         REAL,
+    tempo_acima_h               REAL,        -- previsto para a dose recomendada (24h)
+    fitted_at                   TIMESTAMP    NOT NULL
+);
@@ -0,0 +1,21 @@
+-- Tabela: RENAL_ALERT (Regras de nefrotoxicidade avaliadas na ingestao)
+-- Uma linha por MUDANCA de estado renal do paciente (novo estagio KDIGO, CrCl abaixo
+-- do limite ou normalizacao). A linha mais recente de cada paciente e o estado atual.
+CREATE TABLE IF NOT EXISTS renal_alert (
+    alert_id                    INTEGER PRIMARY KEY,
+    person_id                   BIGINT       NOT NULL,
+    alert_datetime              TIMESTAMP    NOT NULL, -- data/hora da creatinina que disparou
+    estagio_kdigo               INTEGER      NOT NULL, -- 0 (sem LRA) a 3
+    criterio                    VARCHAR(50)  NOT NULL, -- KDIGO_RAZAO, KDIGO_48H, KDIGO_ABS, CRCL_BAIXO, NORMALIZADO
+    creatinina_mg_dl            REAL         NOT NULL,
+    basal_mg_dl                 REAL,                  -- menor valor nos 7 dias anteriores
+    razao_basal                 REAL,
+    delta_48h_mg_dl             REAL,                  -- aumento sobre o menor valor das 48h anteriores
+    crcl_ml_min                 REAL,                  -- Cockcroft-Gault (sem cadastro = NULL)
+    crcl_baixo                  INTEGER      NOT NULL DEFAULT 0,
+    source_system               VARCHAR(50),
+    created_at                  TIMESTAMP    NOT NULL
+);
+
+-- Estado atual do paciente (dashboard) = ultima linha no indice
+CREATE INDEX IF NOT EXISTS idx_renal_alert_person_dt ON renal_alert (person_id, alert_datetime);
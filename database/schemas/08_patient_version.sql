@@ -0,0 +1,33 @@
+-- Tabela: PATIENT_VERSION (Versao dos dados de cada paciente)
+-- Incrementada por gatilho a cada insercao/alteracao, venha de onde vier
+-- (HL7, MLLP, lote HL7, API, ETL). O dashboard usa (person_id, version) como
+-- chave do cache: so o paciente alterado e recarregado.
+CREATE TABLE IF NOT EXISTS patient_version (
+    person_id                   BIGINT       PRIMARY KEY NOT NULL, -- sem alias de rowid: aceita IDs de texto da origem
+    version                     INTEGER      NOT NULL,
+    updated_at                  TIMESTAMP    NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_measurement_version AFTER INSERT ON measurement
+BEGIN
+    INSERT INTO patient_version (person_id, version, updated_at) VALUES (NEW.person_id, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (person_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_note_version AFTER INSERT ON note
+BEGIN
+    INSERT INTO patient_version (person_id, version, updated_at) VALUES (NEW.person_id, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (person_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_person_insert_version AFTER INSERT ON person
+BEGIN
+    INSERT INTO patient_version (person_id, version, updated_at) VALUES (NEW.person_id, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (person_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_person_update_version AFTER UPDATE ON person
+BEGIN
+    INSERT INTO patient_version (person_id, version, updated_at) VALUES (NEW.person_id, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (person_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+END;
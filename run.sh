@@ -12,5 +12,9 @@ mkdir -p src/data/processed
 # A versão mais completa do generate_synthetic.py (com 5 pacientes) é executada
 python3 src/data/generate_synthetic.py
 
+# --- 3.1 ARTEFATOS DE IA (TREINO OFFLINE; O DASHBOARD SÓ CARREGA DO DISCO) ---
+[ -f data/models/severidade_rf_v1.joblib ] || python3 src/models/nlp/model_store.py
+[ -f data/models/cox_toxicidade_v1.joblib ] || python3 src/models/toxicity/risk_scoring.py --train
+
 # --- 4. INICIA O APLICATIVO ---
 python3 -m streamlit run src/app/dashboard.py
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Servidor stub compatível com a API da Groq (OpenAI): respostas sintéticas com
+# latência configurável, para medir cache e latência sem acesso à rede.
+TTFT_S = 0.150        # tempo até o primeiro token
+TOKEN_DELAY_S = 0.005
+N_TOKENS = 40
+
+app = FastAPI(title="Groq Stub")
+stats = {"requests": 0}
+
+
+def _chunk(model, content=None, finish=None):
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": content} if content else {},
+                     "finish_reason": finish}],
+    }
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    model = body.get("model", "stub")
+    tokens = [f"- item {i} " for i in range(N_TOKENS)]
+
+    if not body.get("stream"):
+        await asyncio.sleep(TTFT_S + TOKEN_DELAY_S * N_TOKENS)
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                         "finish_reason": "stop"}],
+        }
+
+    async def events():
+        await asyncio.sleep(TTFT_S)
+        for token in tokens:
+            yield f"data: {json.dumps(_chunk(model, token))}\n\n"
+            await asyncio.sleep(TOKEN_DELAY_S)
+        yield f"data: {json.dumps(_chunk(model, finish='stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def start_stub_server(host="127.0.0.1", port=0):
+    """Sobe o stub em uma thread e devolve a base_url para o cliente Groq."""
+    import uvicorn
+
+    if port == 0:
+        with socket.socket() as s:
+            s.bind((host, 0))
+            port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="groq-stub", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    # Uso: python src/ai/groq_stub.py  ->  GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=stub
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=8765)
@@ -1,46 +1,332 @@
+import asyncio
+import atexit
+import hashlib
+import json
 import os
-from groq import Groq
-import streamlit as st
+import queue
+import sqlite3
+import sys
+import threading
+import time
 
-def get_second_opinion(texto_clinico, gravidade, entidades):
-    """
-    Usa a API gratuita da Groq (Llama 3.3) para gerar uma segunda opinião clínica.
-    Modelo atualizado para evitar erro de 'decommissioned'.
-    """
-    # Tenta pegar a chave dos segredos do Streamlit ou variáveis de ambiente
-    api_key = os.environ.get("GROQ_API_KEY") 
-    
-    if not api_key:
-        return "⚠️ Erro: API Key da Groq não encontrada. Configure na barra lateral."
+try:
+    from src.monitoring.metrics import record
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.monitoring.metrics import record
+
+# Modelo atualizado e estável (Dez 2025)
+MODEL = "llama-3.3-70b-versatile"
+# Incrementar sempre que os prompts mudarem (invalida o cache)
+PROMPT_VERSION = "v1"
+MAX_CONCURRENCY = 4
+# Espera maxima para fechar o cliente e o event loop no encerramento
+CLOSE_TIMEOUT_S = 5
 
-    client = Groq(api_key=api_key)
+# Cache persistente de respostas (LRU + TTL)
+CACHE_PATH = "data/cache/llm_groq_cache.db"
+CACHE_TTL_S = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 5000
 
-    system_prompt = """
-    Você é um Oncologista Sênior e Farmacêutico Clínico. 
+SYSTEM_PROMPT = """
+    Você é um Oncologista Sênior e Farmacêutico Clínico.
     Analise o caso focando em: 1. Validação da gravidade; 2. Manejo de sintomas; 3. Segurança da Cisplatina.
     Responda em Português (Brasil). Seja conciso, técnico e use tópicos.
     """
 
+
+def build_messages(texto_clinico, gravidade, entidades):
     user_prompt = f"""
     CASO CLÍNICO: "{texto_clinico}"
-    
+
     DADOS DO SISTEMA:
     - Entidades encontradas: {entidades}
     - Classificação Automática: {gravidade}
-    
+
     Por favor, forneça uma segunda opinião estruturada.
     """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def cache_key(texto_clinico, gravidade, entidades, model=MODEL, prompt_version=PROMPT_VERSION):
+    payload = json.dumps([texto_clinico, gravidade, entidades, model, prompt_version],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache SQLite de respostas do LLM com expiração (TTL) e descarte LRU."""
+    def __init__(self, path=CACHE_PATH, ttl_s=CACHE_TTL_S, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key   CHAR(64) PRIMARY KEY,
+                model       VARCHAR(100),
+                response    TEXT     NOT NULL,
+                created_at  REAL     NOT NULL,
+                last_access REAL     NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT response, created_at FROM llm_cache WHERE cache_key = ?",
+                                    (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_s:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response, model=MODEL):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                              (key, model, response, now, now))
+            # Expirados primeiro, depois os menos usados além do limite
+            self.conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_s,))
+            self.conn.execute(
+                """DELETE FROM llm_cache WHERE cache_key IN (
+                       SELECT cache_key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)""",
+                (self.max_entries,))
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class GroqSecondOpinion:
+    """
+    Cliente assíncrono compartilhado (um AsyncGroq e um pool HTTP por processo),
+    rodando num event loop próprio em segundo plano para não bloquear o script
+    do Streamlit. Limita as requisições simultâneas e consulta o cache antes da API;
+    perguntas idênticas em andamento compartilham uma única chamada.
+    """
+    def __init__(self, api_key=None, base_url=None, model=MODEL,
+                 max_concurrency=MAX_CONCURRENCY, cache=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else ResponseCache()
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+        # cache_key -> Future com o texto da chamada em andamento (None se falhou)
+        self._inflight = {}
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="groq-loop", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def close(self):
+        """Fecha o pool HTTP do cliente e encerra o event loop dedicado."""
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._client.close(), loop).result(CLOSE_TIMEOUT_S)
+            except Exception as e:
+                print(f"[AVISO] Falha ao fechar o cliente Groq: {e}")
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(CLOSE_TIMEOUT_S)
+        if not loop.is_running():
+            loop.close()
+
+    def _get_client(self):
+        # Criados dentro do loop dedicado (o pool HTTP fica preso a ele)
+        if self._client is None:
+            from groq import AsyncGroq
+            self._client = AsyncGroq(api_key=self.api_key, base_url=self.base_url)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def astream(self, texto_clinico, gravidade, entidades):
+        """Gera os tokens da resposta à medida que chegam (ou a resposta do cache)."""
+        t0 = time.perf_counter()
+        key = cache_key(texto_clinico, gravidade, entidades, self.model)
+        running = asyncio.get_running_loop()
+        while True:
+            cached = self.cache.get(key)
+            if cached is not None:
+                record("llm_call", (time.perf_counter() - t0) * 1000, cache="hit", model=self.model)
+                yield cached
+                return
+            pending = self._inflight.get(key)
+            if pending is None or pending.get_loop() is not running:
+                break
+            # Mesma pergunta ja em andamento: espera a resposta dela em vez de chamar a API de novo
+            text = await asyncio.shield(pending)
+            if text:
+                record("llm_call", (time.perf_counter() - t0) * 1000, cache="coalesced", model=self.model)
+                yield text
+                return
+            # A chamada compartilhada falhou: tenta de novo (um dos que esperavam assume)
+
+        client = self._get_client()
+        inflight = self._inflight[key] = running.create_future()
+        parts = []
+        status = "error"
+        finish = None
+        try:
+            async with self._semaphore:
+                stream = await client.chat.completions.create(
+                    messages=build_messages(texto_clinico, gravidade, entidades),
+                    model=self.model,
+                    temperature=0.2,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].finish_reason:
+                        finish = chunk.choices[0].finish_reason
+                    token = chunk.choices[0].delta.content if chunk.choices else None
+                    if token:
+                        if not parts:
+                            # Tempo ate o primeiro token (o que o usuario percebe na UI)
+                            record("llm_first_token", (time.perf_counter() - t0) * 1000, model=self.model)
+                        parts.append(token)
+                        yield token
+            status = "ok"
+        finally:
+            record("llm_call", (time.perf_counter() - t0) * 1000, status, len(parts),
+                   cache="miss", model=self.model)
+            text = "".join(parts)
+            # So respostas completas vao para o cache (nunca vazia, truncada ou com erro)
+            complete = status == "ok" and finish == "stop" and bool(text.strip())
+            if complete:
+                self.cache.put(key, text, self.model)
+            if self._inflight.get(key) is inflight:
+                del self._inflight[key]
+            inflight.set_result(text if complete else None)
+
+    def stream(self, texto_clinico, gravidade, entidades):
+        """Ponte síncrona: gerador de tokens para o Streamlit (st.write_stream)."""
+        loop = self._ensure_loop()
+        tokens = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for token in self.astream(texto_clinico, gravidade, entidades):
+                    tokens.put(token)
+            except Exception as e:
+                tokens.put(e)
+            finally:
+                tokens.put(done)
 
+        asyncio.run_coroutine_threadsafe(pump(), loop)
+        while True:
+            item = tokens.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def ask(self, texto_clinico, gravidade, entidades):
+        return "".join(self.stream(texto_clinico, gravidade, entidades))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Instância compartilhada; recriada se a chave mudar (ex: digitada na barra lateral)."""
+    global _service
+    api_key = os.environ.get("GROQ_API_KEY")
+    with _service_lock:
+        if _service is None or _service.api_key != api_key:
+            previous = _service
+            _service = GroqSecondOpinion(api_key=api_key, base_url=os.environ.get("GROQ_BASE_URL"),
+                                         cache=previous.cache if previous else None)
+            if previous is not None:
+                previous.close()
+        return _service
+
+
+def close_service():
+    """Fecha o cliente compartilhado (registrado no atexit)."""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
+
+
+atexit.register(close_service)
+
+
+def stream_second_opinion(texto_clinico, gravidade, entidades):
+    """Versão em streaming de get_second_opinion (tokens chegam na UI conforme gerados)."""
+    # Tenta pegar a chave dos segredos do Streamlit ou variáveis de ambiente
+    if not os.environ.get("GROQ_API_KEY"):
+        yield "⚠️ Erro: API Key da Groq não encontrada. Configure na barra lateral."
+        return
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            # Modelo atualizado e estável (Dez 2025)
-            model="llama-3.3-70b-versatile", 
-            temperature=0.2,
-        )
-        return chat_completion.choices[0].message.content
+        yield from get_service().stream(texto_clinico, gravidade, entidades)
     except Exception as e:
-        return f"Erro na conexão com Groq: {str(e)}"
\ No newline at end of file
+        yield f"Erro na conexão com Groq: {str(e)}"
+
+
+def get_second_opinion(texto_clinico, gravidade, entidades):
+    """
+    Usa a API gratuita da Groq (Llama 3.3) para gerar uma segunda opinião clínica.
+    Modelo atualizado para evitar erro de 'decommissioned'.
+    """
+    return "".join(stream_second_opinion(texto_clinico, gravidade, entidades))
+
+
+def benchmark(n_requests=200, n_cases=20, workers=16):
+    """Taxa de acerto do cache e latência contra o servidor stub local (sem rede)."""
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        from src.ai.groq_stub import start_stub_server
+    except ImportError:
+        from groq_stub import start_stub_server
+
+    base_url = start_stub_server()
+    service = GroqSecondOpinion(api_key="stub", base_url=base_url, cache=ResponseCache(":memory:"))
+    casos = [(f"Paciente {i} com nefrotoxicidade grau {i % 4}.", "Grau 3/4 (Grave)", [{"word": "creatinina"}])
+             for i in range(n_cases)]
+
+    def one(i):
+        t0 = time.perf_counter()
+        service.ask(*casos[i % n_cases])
+        return (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        lat = sorted(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - t0
+    service.close()
+    p = lambda q: lat[int(q * (len(lat) - 1))]
+    print(f"[OK] {n_requests} consultas ({n_cases} casos distintos) em {elapsed:.2f}s | "
+          f"hit rate {service.cache.hit_rate():.0%} | p50 {p(0.5):.1f} ms | p99 {p(0.99):.1f} ms")
+
+
+if __name__ == "__main__":
+    # python src/ai/llm_groq.py --bench  (usa o stub local, sem acesso à rede)
+    if "--bench" in sys.argv:
+        benchmark()
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.models.pkpd.mipd import load_fits
+from src.models.pkpd.simulacao_cisplatina import simulate_pk_one_compartment, plot_pk_curve
+from src.models.toxicity.predicao_risco import plot_survival_curve
+from src.models.toxicity.risk_scoring import load_cox_model, load_active_cohort, survival_matrix
+
+DB_PATH = "database/oncopharm.db"
+# Um diretorio por paciente: reports/graficos/<person_id>/pk_<hash>.png
+OUTPUT_DIR = "reports/graficos"
+CHART_DPI = 300
+# Incrementar quando o layout dos graficos mudar (invalida o cache)
+CHART_VERSION = "v1"
+
+
+def chart_key(kind, inputs, dpi=CHART_DPI):
+    """Hash das entradas do modelo e da resolucao: mesmas entradas -> mesmo arquivo (nunca re-renderizado)."""
+    payload = json.dumps([CHART_VERSION, kind, dpi, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def build_jobs(conn, output_dir=OUTPUT_DIR, dpi=CHART_DPI):
+    """
+    Entradas dos graficos de todo o censo (pacientes ativos): curva PK com os
+    parametros MIPD ja salvos em pk_fit (somente leitura; o worker mipd.py os mantem)
+    e curva livre de toxicidade do modelo de Cox (pontuacao em lote).
+    """
+    cohort = load_active_cohort(conn)
+    if cohort.empty:
+        return []
+    pids = cohort["person_id"].astype(int).tolist()
+    fits = load_fits(conn, pids, refit_stale=False)
+    if len(fits) < len(pids):
+        print(f"[AVISO] {len(pids) - len(fits)} pacientes sem ajuste MIPD em pk_fit (sem curva PK). "
+              f"Rode: python src/models/pkpd/mipd.py --once")
+    model = load_cox_model()
+    surv = survival_matrix(model, cohort)
+    days = model["day_grid"].tolist()
+
+    jobs = []
+    for i, pid in enumerate(pids):
+        if pid in fits.index:
+            fit = fits.loc[pid]
+            pk = {"pid": pid, "dose_mg": round(float(fit["dose_recomendada_mg"]), 2),
+                  "cl_L_h": round(float(fit["cl_L_h"]), 4), "vd_L": round(float(fit["vd_L"]), 4)}
+            jobs.append(("pk", pk))
+        risk = {"pid": pid, "model_version": model["version"], "days": days,
+                "surv": np.round(surv[i], 6).tolist()}
+        jobs.append(("risco", risk))
+    return [(kind, inputs, os.path.join(output_dir, str(inputs["pid"]), f"{kind}_{chart_key(kind, inputs, dpi)}.png"))
+            for kind, inputs in jobs]
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_chart(job, dpi=CHART_DPI):
+    """Renderiza um grafico (processo de trabalho). Escrita atomica: .tmp.png -> rename."""
+    kind, inputs, path = job
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path[:-4] + ".tmp.png"
+    if kind == "pk":
+        t, cp = simulate_pk_one_compartment(inputs["dose_mg"], inputs["cl_L_h"], inputs["vd_L"])
+        plot_pk_curve(t, cp, inputs["dose_mg"], inputs["pid"], tmp, dpi=dpi)
+    else:
+        plot_survival_curve(inputs["days"], [inputs["surv"]], tmp, dpi=dpi)
+    os.replace(tmp, path)
+    # Versoes antigas do mesmo grafico deixam de ser referenciadas
+    prefix = f"{kind}_"
+    for name in os.listdir(os.path.dirname(path)):
+        if name.startswith(prefix) and not name.endswith(".tmp.png") and name != os.path.basename(path):
+            os.remove(os.path.join(os.path.dirname(path), name))
+    return path
+
+
+def render_census(conn, output_dir=OUTPUT_DIR, workers=None, dpi=CHART_DPI):
+    """Renderiza apenas os graficos cujas entradas mudaram, em paralelo. Retorna o relatorio."""
+    t0 = time.perf_counter()
+    jobs = build_jobs(conn, output_dir, dpi)
+    pending = [job for job in jobs if not os.path.exists(job[2])]
+    workers = workers or os.cpu_count() or 1
+    if pending:
+        if workers == 1:
+            _init_worker()
+            for job in pending:
+                render_chart(job, dpi)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                list(pool.map(render_chart, pending, [dpi] * len(pending), chunksize=4))
+    elapsed = time.perf_counter() - t0
+    return {
+        "charts": len(jobs),
+        "rendered": len(pending),
+        "cache_hits": len(jobs) - len(pending),
+        "hit_rate": (len(jobs) - len(pending)) / len(jobs) if jobs else 0.0,
+        "elapsed_s": elapsed,
+        "charts_per_s": len(jobs) / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+    }
+
+
+def print_report(report):
+    print(f"[OK] {report['charts']} graficos ({report['rendered']} renderizados, "
+          f"{report['cache_hits']} do cache, hit rate {report['hit_rate']:.0%}) em "
+          f"{report['elapsed_s']:.2f}s | {report['charts_per_s']:.1f} graficos/s | {report['workers']} processos")
+
+
+if __name__ == "__main__":
+    # python -m src.app.chart_pipeline [db_path] [--workers=N] [--dpi=N]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    conn = sqlite3.connect(args[0] if args else DB_PATH, timeout=30)
+    print_report(render_census(conn, workers=int(opts.get("workers", 0)) or None,
+                               dpi=int(opts.get("dpi", CHART_DPI))))
+    conn.close()
@@ -1,19 +1,24 @@
+import time
+_T_INICIO = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import os
 from datetime import datetime
-from transformers import pipeline
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.pipeline import make_pipeline
+
+from src.app.data_access import open_repository, PAGE_SIZE
+# transformers/sklearn só são importados no primeiro uso (aba de Farmacovigilância)
+from src.models.nlp.model_store import load_severity_model, load_ner_model
+from src.models.nlp.note_scoring import score_texts
+from src.models.pkpd.simulacao_cisplatina import simulate_pk_one_compartment
+from src.models.toxicity.renal_rules import CRCL_LIMITE_ML_MIN
 
 # Importação Segura da Groq (com tratamento de erro)
 try:
-    from src.ai.llm_groq import get_second_opinion
+    from src.ai.llm_groq import stream_second_opinion
 except ImportError:
-    def get_second_opinion(a,b,c): return "Módulo Groq não configurado."
+    def stream_second_opinion(a,b,c): yield "Módulo Groq não configurado."
 
 # --- 1. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(
@@ -67,58 +72,51 @@ st.markdown("""
 
 # --- 4. CARREGAMENTO DE MODELOS E DADOS ---
 @st.cache_resource
-def load_ai():
-    try: 
-        ner = pipeline("ner", model="d4data/biomedical-ner-all", aggregation_strategy="simple")
-    except: 
-        ner = None
-    
-    # Random Forest com dados de exemplo embutidos (Fallback)
+def startup_report():
+    # Medido uma vez por processo: o primeiro run é o cold start da réplica
+    return {"import_s": round(time.perf_counter() - _T_INICIO, 3)}
+
+def timed(etapa, fn, *args):
+    # Registra no relatório apenas a primeira execução de cada etapa
+    t0 = time.perf_counter()
+    out = fn(*args)
+    report = startup_report()
+    if etapa not in report:
+        report[etapa] = round(time.perf_counter() - t0, 3)
+        print(f"[STARTUP] {etapa}: {report[etapa]}s")
+    return out
+
+startup_report()
+
+# Artefatos versionados gerados offline (python src/models/nlp/model_store.py)
+@st.cache_resource
+def load_rf():
     try:
-        base = os.getcwd()
-        path = os.path.join(base, "data/processed/treino_ia.csv")
-        if os.path.exists(path):
-            df = pd.read_csv(path)
-        else:
-            # Dados de treino na memória se não achar arquivo
-            data_train = {"texto": ["Dor leve", "Dor intensa e vomitos", "Neutropenia febril", "Sem queixas"], 
-                          "gravidade": ["Grau 1 (Leve)", "Grau 3/4 (Grave)", "Grau 3/4 (Grave)", "Grau 0"]}
-            df = pd.DataFrame(data_train)
-            
-        rf = make_pipeline(TfidfVectorizer(), RandomForestClassifier(n_estimators=50))
-        rf.fit(df['texto'], df['gravidade'])
-    except: 
-        rf = None
-    return ner, rf
-
-ner_engine, rf_engine = load_ai()
-
-@st.cache_data
-def load_data():
-    # Tenta carregar do disco. Se falhar, carrega da memória (Blindagem)
+        return timed("load_rf_s", load_severity_model)
+    except Exception:
+        return None
+
+@st.cache_resource
+def load_ner():
     try:
-        base = os.getcwd()
-        p = pd.read_csv(os.path.join(base, "data/processed/pacientes_mock.csv"))
-        e = pd.read_csv(os.path.join(base, "data/processed/exames_mock.csv"))
-        n = pd.read_csv(os.path.join(base, "data/processed/notas_mock.csv"))
-        return p, e, n
+        return timed("load_ner_s", load_ner_model)
     except Exception:
-        # DADOS DE EMERGÊNCIA (FALLBACK)
-        p = pd.DataFrame([
-            {"id": 1001, "nome": "Maria Silva (Demo)", "idade": 45, "sexo": "F", "peso": 60.0, "bsa": 1.65, "status": "Tratamento"},
-            {"id": 1002, "nome": "João Santos (Demo)", "idade": 68, "sexo": "M", "peso": 75.0, "bsa": 1.88, "status": "Risco Elevado"}
-        ])
-        e = pd.DataFrame([
-            {"patient_id": 1001, "tipo": "Creatinina", "valor": 0.8},
-            {"patient_id": 1002, "tipo": "Creatinina", "valor": 1.9}
-        ])
-        n = pd.DataFrame([
-            {"patient_id": 1001, "texto": "Paciente refere fadiga leve, mantendo atividades."},
-            {"patient_id": 1002, "texto": "Apresenta sinais de nefrotoxicidade aguda e oligúria severa."}
-        ])
-        return p, e, n
-
-df_p, df_e, df_n = load_data()
+        return None
+
+@st.cache_resource
+def load_repository():
+    # Banco SQLite com consultas indexadas por paciente (fallback em memória embutido)
+    return timed("load_db_s", open_repository)
+
+repo = load_repository()
+
+VERSION_POLL_S = 10
+
+@st.cache_data(max_entries=256)
+def load_patient(pid, version):
+    # Busca APENAS o paciente selecionado. A versao (incrementada a cada insercao no banco)
+    # entra na chave: exame novo via HL7/API invalida so este paciente no proximo rerun
+    return repo.get_patient(pid), repo.get_exams(pid), repo.get_notes(pid)
 
 # --- 5. BARRA LATERAL ---
 with st.sidebar:
@@ -143,18 +141,34 @@ with st.sidebar:
         if not tem_chave:
             api_key = st.text_input("Cole sua Groq API Key:", type="password")
             if api_key: os.environ["GROQ_API_KEY"] = api_key
+        st.caption("Tempos de inicialização (s): " +
+                   " | ".join(f"{k} {v}" for k, v in startup_report().items()))
 
-    if not df_p.empty:
-        st.subheader("📂 Prontuários")
-        lista = df_p.apply(lambda x: f"{x['id']} - {x['nome']}", axis=1)
-        sel = st.selectbox("Buscar Paciente:", lista)
-        pid = int(sel.split(" - ")[0])
-        paciente = df_p[df_p['id'] == pid].iloc[0]
-        exames = df_e[df_e['patient_id'] == pid]
-        notas = df_n[df_n['patient_id'] == pid]
-    else:
-        st.error("Erro crítico: Dados não carregados.")
+    st.subheader("📂 Prontuários")
+    busca = st.text_input("Buscar Paciente:", placeholder="Nome ou ID")
+    total = repo.count_patients(busca)
+    pagina = 1
+    if total > PAGE_SIZE:
+        pagina = st.number_input(f"Página (de {(total - 1) // PAGE_SIZE + 1})", min_value=1,
+                                 max_value=(total - 1) // PAGE_SIZE + 1, value=1)
+    lista = repo.search_patients(busca, limit=PAGE_SIZE, offset=(pagina - 1) * PAGE_SIZE)
+    if lista.empty:
+        st.error("Nenhum paciente encontrado.")
         st.stop()
+    nomes = dict(zip(lista['id'], lista['nome']))
+    pid = st.selectbox("Paciente:", list(nomes), format_func=lambda i: f"{i} - {nomes[i]}")
+    versao = repo.get_version(int(pid))
+    paciente, exames, notas = load_patient(int(pid), versao)
+
+# Sem interacao do usuario: consulta a versao a cada poucos segundos (1 busca por PK)
+# e so refaz a pagina quando chegou dado novo do paciente aberto
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=VERSION_POLL_S)
+    def watch_version(pid, versao):
+        if repo.get_version(pid) != versao:
+            st.rerun()
+
+    watch_version(int(pid), versao)
 
 # --- 6. HEADER ---
 st.markdown("""
@@ -167,12 +181,22 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-creat = exames[exames['tipo']=='Creatinina']['valor'].iloc[-1] if not exames.empty else 0.0
-risco = creat > 1.2
+creatininas = exames[exames['tipo']=='Creatinina']['valor']
+creat = creatininas.iloc[-1] if not creatininas.empty else 0.0
+# Estado renal vigente (KDIGO + Cockcroft-Gault), avaliado na ingestao pelo motor de regras
+renal = repo.get_renal_status(int(pid))
+risco = renal is not None and (renal['estagio_kdigo'] > 0 or bool(renal['crcl_baixo']))
+if risco:
+    alerta_renal = (f"🔴 ALERTA RENAL: KDIGO {renal['estagio_kdigo']}" if renal['estagio_kdigo'] > 0
+                    else f"🔴 ALERTA RENAL: CrCl < {CRCL_LIMITE_ML_MIN:.0f} mL/min")
+else:
+    alerta_renal = "🟢 ESTÁVEL"
+# MIPD: parametros individuais (MAP) a partir da creatinina e dos niveis plasmaticos
+mipd = repo.get_mipd(int(pid))
 st.markdown(f"""
 <div class="patient-banner" style="border-left-color: {'#ff5252' if risco else '#00c853'};">
     <h3 style="margin:0">{paciente['nome']}</h3>
-    <span>ID: {paciente['id']} | Idade: {paciente['idade']}a | <b>{'🔴 ALERTA RENAL' if risco else '🟢 ESTÁVEL'}</b></span>
+    <span>ID: {paciente['id']} | Idade: {paciente['idade']}a | <b>{alerta_renal}</b></span>
 </div>
 """, unsafe_allow_html=True)
 
@@ -182,7 +206,8 @@ tab1, tab2, tab3, tab4 = st.tabs(["📊 Visão Geral", "💊 Farmacocinética",
 with tab1:
     c1,c2,c3 = st.columns(3)
     c1.metric("Creatinina", f"{creat} mg/dL")
-    c2.metric("Clearance", "45 mL/min" if risco else "95 mL/min")
+    crcl = mipd['crcl_ml_min'] if mipd else (renal['crcl_ml_min'] if renal else None)
+    c2.metric("Clearance", f"{crcl:.0f} mL/min" if crcl is not None else "-")
     c3.metric("Peso", f"{paciente['peso']} kg")
     st.dataframe(exames, use_container_width=True, hide_index=True)
 
@@ -190,41 +215,54 @@ with tab2:
     c1, c2 = st.columns([1,3])
     with c1:
         st.info("Ajuste MIPD")
-        if risco: st.error("Reduzir 25%"); kel=0.15
-        else: st.success("Dose Padrão"); kel=0.45
+        if mipd is None:
+            st.warning("Sem ajuste MIPD salvo. Rode: python src/models/pkpd/mipd.py")
+        else:
+            dose_rec, dose_pad = mipd['dose_recomendada_mg'], mipd['dose_padrao_mg']
+            if dose_rec < dose_pad: st.error(f"Reduzir para {dose_rec:.0f} mg")
+            else: st.success("Dose Padrão")
+            st.metric("Dose recomendada", f"{dose_rec:.0f} mg", f"{(dose_rec / dose_pad - 1) * 100:.0f}%")
+            st.caption(f"CL {mipd['cl_L_h']:.2f} L/h | V {mipd['vd_L']:.1f} L | "
+                       f"{int(mipd['n_obs'])} nível(is) plasmático(s)")
     with c2:
-        t = np.linspace(0, 24, 100)
-        c = (100/30)*np.exp(-kel*t)
-        fig = go.Figure(go.Scatter(x=t, y=c, fill='tozeroy', name='Conc.'))
-        fig.add_hline(y=1.5, line_dash="dash", line_color="red")
-        fig.update_layout(title="Simulação 24h", height=350)
-        st.plotly_chart(fig, use_container_width=True)
+        if mipd is not None:
+            t, c = simulate_pk_one_compartment(dose_rec, mipd['cl_L_h'], mipd['vd_L'], t=np.linspace(0, 24, 100))
+            _, c_pad = simulate_pk_one_compartment(dose_pad, mipd['cl_L_h'], mipd['vd_L'], t=t)
+            fig = go.Figure(go.Scatter(x=t, y=c, fill='tozeroy', name=f'{dose_rec:.0f} mg'))
+            fig.add_trace(go.Scatter(x=t, y=c_pad, name=f'Padrão {dose_pad:.0f} mg', line=dict(dash='dot')))
+            fig.add_hline(y=1.5, line_dash="dash", line_color="red")
+            fig.update_layout(title="Simulação 24h", height=350)
+            st.plotly_chart(fig, use_container_width=True)
 
 with tab3:
     st.markdown("### 🕵️ Análise de Texto (BioBERT + RF)")
-    texto = notas['texto'].iloc[0]
+    texto = notas['texto'].iloc[0] if not notas.empty else ""
+    # Resultado pré-calculado pelo worker (python src/models/nlp/note_scoring.py)
+    res = repo.get_note_score(texto) if texto else None
     c1, c2 = st.columns(2)
     with c1:
         st.text_area("Evolução:", value=texto, height=180, disabled=True)
-        if st.button("🔍 Analisar"):
+        if res:
+            st.caption("⚡ Resultado pré-calculado (cache por conteúdo da nota)")
+        elif st.button("🔍 Analisar"):
+            with st.spinner("Carregando modelos..."):
+                rf_engine, ner_engine = load_rf(), load_ner()
             if ner_engine and rf_engine:
                 with st.spinner("Processando..."):
-                    g = rf_engine.predict([texto])[0]
-                    c = rf_engine.predict_proba([texto]).max()
-                    e = ner_engine(texto)
-                    st.session_state['ai_res'] = {'g':g, 'c':c, 'e':e}
-            else: st.warning("Modelo IA carregando...")
+                    g, c, e = timed("first_inference_s", score_texts, [texto], rf_engine, ner_engine)[0]
+                    res = {'g':g, 'c':c, 'e':e}
+                    repo.save_note_score(texto, res)
+            else: st.warning("Modelo IA indisponível.")
     with c2:
-        if 'ai_res' in st.session_state:
-            res = st.session_state['ai_res']
+        if res:
             bg = "bg-grave" if "Grave" in res['g'] else "bg-leve"
             st.markdown(f"<span class='badge-grade {bg}'>{res['g']}</span> (Conf: {int(res['c']*100)}%)", unsafe_allow_html=True)
             st.write(res['e'])
             if st.button("🧠 Segunda Opinião (Groq)"):
                 if "GROQ_API_KEY" in os.environ:
-                    with st.spinner("Consultando..."):
-                        op = get_second_opinion(texto, res['g'], res['e'])
-                        st.info(op)
+                    # Cliente assíncrono com cache: tokens aparecem conforme chegam
+                    with st.container(border=True):
+                        st.write_stream(stream_second_opinion(texto, res['g'], res['e']))
                 else: st.warning("Chave de API não configurada.")
 
 with tab4:
@@ -0,0 +1,191 @@
+import glob
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+from src.integration.adapters.omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+from src.models.nlp.note_scoring import text_hash, lookup_scores, save_scores
+from src.models.pkpd.mipd import load_fits
+from src.models.toxicity.renal_rules import RenalRulesEngine, SQL_INSERT_RENAL_ALERT, latest_status
+
+DB_PATH = "database/oncopharm.db"
+SCHEMA_DIR = "database/schemas"
+DATA_DIR = "data/processed"
+PAGE_SIZE = 50
+
+# Codigo do exame no banco <-> nome exibido no dashboard
+EXAM_NAMES = {"CREAT": "Creatinina", "UREA": "Ureia", "HEMOG": "Hemoglobina", "HB": "Hemoglobina",
+              "PLT": "Plaquetas", "K": "Potassio", "CISPL": "Cisplatina (nivel)"}
+EXAM_CODES = {v: k for k, v in EXAM_NAMES.items()}
+
+# Dados de emergencia (mesmo fallback de antes, agora num SQLite em memoria)
+DEMO_PATIENTS = [
+    {"id": 1001, "nome": "Maria Silva (Demo)", "idade": 45, "sexo": "F", "peso": 60.0, "bsa": 1.65, "status": "Tratamento"},
+    {"id": 1002, "nome": "João Santos (Demo)", "idade": 68, "sexo": "M", "peso": 75.0, "bsa": 1.88, "status": "Risco Elevado"},
+]
+DEMO_EXAMS = [
+    {"patient_id": 1001, "tipo": "Creatinina", "valor": 0.8},
+    {"patient_id": 1002, "tipo": "Creatinina", "valor": 1.9},
+]
+DEMO_NOTES = [
+    {"patient_id": 1001, "texto": "Paciente refere fadiga leve, mantendo atividades."},
+    {"patient_id": 1002, "texto": "Apresenta sinais de nefrotoxicidade aguda e oligúria severa."},
+]
+
+
+class PatientRepository:
+    """
+    Camada de acesso do dashboard: consultas indexadas por paciente.
+    Nada e carregado em massa; cada rerun busca apenas o paciente selecionado.
+    """
+    def __init__(self, db_path=DB_PATH, schema_dir=SCHEMA_DIR):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # O Streamlit executa cada sessao em uma thread propria
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        for schema_path in sorted(glob.glob(os.path.join(schema_dir, "*.sql"))):
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                self.conn.executescript(f.read())
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    # --- Carga inicial (mocks CSV ou dados de emergencia) ---
+    def is_empty(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM person LIMIT 1").fetchone() is None
+
+    def seed(self, patients, exams, notes):
+        """Importa pacientes/exames/notas em DataFrames (formato dos mocks CSV)."""
+        persons = list(zip(
+            patients["id"].astype(int).tolist(), patients["nome"].tolist(), patients["sexo"].tolist(),
+            patients["idade"].tolist(), patients["peso"].tolist(), patients["bsa"].tolist(),
+            patients["status"].tolist(),
+        ))
+        # Colunas opcionais do gerador sintetico (unidade/data); os mocks antigos nao as tem
+        n_exams = len(exams)
+        units = exams["unidade"] if "unidade" in exams else ["mg/dL"] * n_exams
+        dates = exams["data"].astype(str) if "data" in exams else [None] * n_exams
+        measurements = [
+            measurement_row(int(pid), EXAM_CODES.get(tipo, tipo), valor, unit, dt, source_system="MOCK")
+            for pid, tipo, valor, unit, dt in zip(exams["patient_id"], exams["tipo"], exams["valor"], units, dates)
+        ]
+        note_dates = notes["data"].astype(str) if "data" in notes else [None] * len(notes)
+        notes_rows = [(int(pid), dt, dt, texto)
+                      for pid, texto, dt in zip(notes["patient_id"], notes["texto"], note_dates)]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO person (person_id, person_source_value, gender_source_value,
+                                                  idade, peso_kg, bsa_m2, status)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""", persons)
+            self.conn.executemany(SQL_INSERT_MEASUREMENT, measurements)
+            self.conn.executemany(
+                """INSERT INTO note (person_id, note_date, note_datetime, note_text)
+                   VALUES (?, date(COALESCE(?, 'now')), datetime(COALESCE(?, 'now')), ?)""", notes_rows)
+            # Mesmas regras renais da ingestao, em ordem cronologica por paciente
+            rules = RenalRulesEngine(conn=self.conn, aquecer=False)
+            alerts = rules.process_measurements(sorted(measurements, key=lambda r: (r[0], r[3])))
+            self.conn.executemany(SQL_INSERT_RENAL_ALERT, alerts)
+
+    def seed_from_csv(self, data_dir=DATA_DIR):
+        paths = [os.path.join(data_dir, f) for f in ("pacientes_mock.csv", "exames_mock.csv", "notas_mock.csv")]
+        if not all(os.path.exists(p) for p in paths):
+            return False
+        self.seed(*(pd.read_csv(p) for p in paths))
+        return True
+
+    # --- Consultas do dashboard ---
+    def count_patients(self, query=""):
+        where, params = self._search_filter(query)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM person {where}", params).fetchone()[0]
+
+    def search_patients(self, query="", limit=PAGE_SIZE, offset=0):
+        """Pagina de pacientes (id, nome) por prefixo do nome ou ID exato."""
+        where, params = self._search_filter(query)
+        return self._query(
+            f"""SELECT person_id AS id, person_source_value AS nome FROM person {where}
+                ORDER BY person_source_value LIMIT ? OFFSET ?""",
+            params + (limit, offset),
+        )
+
+    @staticmethod
+    def _search_filter(query):
+        query = (query or "").strip()
+        if not query:
+            return "", ()
+        if query.isdigit():
+            return "WHERE person_id = ? OR person_source_value LIKE ?", (int(query), query + "%")
+        return "WHERE person_source_value LIKE ?", (query + "%",)
+
+    def get_version(self, pid):
+        """Versao dos dados do paciente (gatilhos de 08_patient_version.sql); 0 se nunca alterado."""
+        with self._lock:
+            row = self.conn.execute("SELECT version FROM patient_version WHERE person_id = ?", (pid,)).fetchone()
+        return row[0] if row else 0
+
+    def get_patient(self, pid):
+        df = self._query(
+            """SELECT person_id AS id, person_source_value AS nome, idade, gender_source_value AS sexo,
+                      peso_kg AS peso, bsa_m2 AS bsa, status
+               FROM person WHERE person_id = ?""", (pid,))
+        return df.iloc[0] if not df.empty else None
+
+    def get_exams(self, pid):
+        df = self._query(
+            """SELECT person_id AS patient_id, measurement_source_value AS codigo,
+                      value_as_number AS valor, unit_source_value AS unidade,
+                      measurement_datetime AS data
+               FROM measurement WHERE person_id = ?
+               ORDER BY measurement_source_value, measurement_datetime""", (pid,))
+        df.insert(1, "tipo", df["codigo"].map(EXAM_NAMES).fillna(df["codigo"]))
+        return df
+
+    def get_notes(self, pid):
+        return self._query(
+            """SELECT person_id AS patient_id, note_text AS texto, note_datetime AS data
+               FROM note WHERE person_id = ? ORDER BY note_datetime DESC""", (pid,))
+
+    # --- Cache de pontuacao NLP (chave = hash do texto) ---
+    def get_note_score(self, text):
+        h = text_hash(text)
+        with self._lock:
+            return lookup_scores(self.conn, [h]).get(h)
+
+    def save_note_score(self, text, res):
+        with self._lock:
+            save_scores(self.conn, [text_hash(text)], [(res['g'], res['c'], res['e'])])
+
+    # --- Alertas renais (gravados pelo motor de regras na ingestao) ---
+    def get_renal_status(self, pid):
+        """Estado renal vigente: ultima linha de renal_alert do paciente (dict) ou None."""
+        with self._lock:
+            return latest_status(self.conn, pid)
+
+    # --- MIPD (estimativa bayesiana + dose recomendada) ---
+    def get_mipd(self, pid):
+        """
+        Ajuste salvo em pk_fit (somente leitura). Reajustes ficam com o worker
+        mipd.py (update_pending), nunca com a renderizacao do dashboard.
+        """
+        with self._lock:
+            fit = load_fits(self.conn, [pid], refit_stale=False)
+        return fit.iloc[0].to_dict() if not fit.empty else None
+
+
+def open_repository(db_path=DB_PATH, data_dir=DATA_DIR):
+    """Abre o banco; se estiver vazio importa os mocks, e sem banco usa os dados de emergencia."""
+    try:
+        repo = PatientRepository(db_path)
+        if repo.is_empty():
+            repo.seed_from_csv(data_dir)
+        if not repo.is_empty():
+            return repo
+    except sqlite3.Error:
+        pass
+    # DADOS DE EMERGÊNCIA (FALLBACK)
+    repo = PatientRepository(":memory:")
+    repo.seed(pd.DataFrame(DEMO_PATIENTS), pd.DataFrame(DEMO_EXAMS), pd.DataFrame(DEMO_NOTES))
+    return repo
@@ -0,0 +1,348 @@
+import asyncio
+import contextlib
+import glob
+import importlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_DIR = "database/schemas"
+# Resultados de cada execucao e a linha de base versionada por maquina
+RESULTS_DIR = "reports/benchmarks"
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+SEED = 42
+# Repeticoes por tamanho: vale a mediana (a primeira rodada aquece caches/imports)
+REPEATS = 3
+# Regressao: vazao abaixo de (1 - TOL) x linha de base, ou p99 acima de (1 + TOL) x linha de base
+THROUGHPUT_TOLERANCE = 0.20
+LATENCY_TOLERANCE = 0.50
+
+
+# --- Infraestrutura ---
+
+def new_database(tmp_dir):
+    """Banco temporario com todos os esquemas do repositorio (nunca toca no banco real)."""
+    path = os.path.join(tmp_dir, "bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    for schema_path in sorted(glob.glob(os.path.join(SCHEMA_DIR, "*.sql"))):
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+    conn.close()
+    return path
+
+
+def latency_stats(samples_ms):
+    samples = np.asarray(samples_ms, dtype=float)
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 4),
+            "p99_ms": round(float(np.percentile(samples, 99)), 4)}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "commit": commit,
+    }
+
+
+# --- Benchmarks: cada um recebe o tamanho e devolve {items, seconds, p50_ms, p99_ms} ---
+
+def bench_hl7(n):
+    """HospitalInterfaceEngine: parse ORU + spool duravel + drenagem para o banco, mensagem a mensagem."""
+    from src.integration.adapters.hl7_tasy_mv import HospitalInterfaceEngine
+    from src.integration.simulate_tasy import LabResultFactory
+
+    factory = LabResultFactory(seed=SEED)
+    messages = [factory.to_hl7(factory.next()) for _ in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = HospitalInterfaceEngine(new_database(tmp), verbose=False)
+        samples = []
+        # O escritor em grupo loga cada lote
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            for message in messages:
+                start = time.perf_counter()
+                engine.parse_oru_message(message)
+                samples.append((time.perf_counter() - start) * 1000)
+            # Flush final entra na conta: a mensagem so esta persistida apos o commit
+            engine.close()
+            elapsed = time.perf_counter() - t0
+    return {"items": n, "seconds": elapsed, **latency_stats(samples)}
+
+
+def bench_api(n):
+    """receive_lab_result via ASGI em processo (validacao pydantic + spool com fsync + drenagem)."""
+    import httpx
+    from src.integration import api_server
+    from src.integration.simulate_tasy import LabResultFactory
+
+    factory = LabResultFactory(seed=SEED)
+    payloads = [factory.to_json(factory.next()) for _ in range(n)]
+
+    async def run():
+        samples = []
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with api_server.lifespan(api_server.app), \
+                httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            t0 = time.perf_counter()
+            for payload in payloads:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/integrate/lab-result", json=payload)
+                response.raise_for_status()
+                samples.append((time.perf_counter() - start) * 1000)
+            return time.perf_counter() - t0, samples
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = api_server.DB_PATH
+        api_server.DB_PATH = new_database(tmp)
+        try:
+            elapsed, samples = asyncio.run(run())
+        finally:
+            api_server.DB_PATH = previous
+    return {"items": n, "seconds": elapsed, **latency_stats(samples)}
+
+
+def bench_etl(n):
+    """02_load_to_sql.load_data: CSV limpo -> episode, em blocos com checkpoint."""
+    etl = importlib.import_module("src.etl.02_load_to_sql")
+    rng = np.random.default_rng(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "dados_limpos.csv")
+        pd.DataFrame({
+            "id_paciente": np.arange(1, n + 1),
+            "dose_cisplatina": rng.choice([50.0, 75.0, 100.0], n),
+            "toxicidade_renal": rng.integers(0, 5, n),
+        }).to_csv(csv_path, index=False)
+        conn = sqlite3.connect(new_database(tmp))
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            etl.load_data(conn, csv_path)
+        elapsed = time.perf_counter() - t0
+        conn.close()
+    return {"items": n, "seconds": elapsed, **latency_stats([elapsed * 1000])}
+
+
+def _synthetic_notes(n):
+    from src.data.generate_synthetic import make_notes
+    from src.models.nlp.ae_detector import PharmacovigilanceNLP
+
+    nlp = PharmacovigilanceNLP()
+    terms = {syn: (canonical, nlp.tox_terms[canonical]["risco"]) for syn, canonical in nlp.synonyms.items()}
+    patients = pd.DataFrame({"id": np.arange(n)})
+    return make_notes(np.random.default_rng(SEED), patients, terms, notes_per_patient=1)["texto"].tolist(), nlp
+
+
+def bench_nlp(n):
+    """PharmacovigilanceNLP.analyze_text, nota a nota (texto livre com termos injetados)."""
+    texts, nlp = _synthetic_notes(n)
+    samples = []
+    t0 = time.perf_counter()
+    for text in texts:
+        start = time.perf_counter()
+        nlp.analyze_text(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - t0
+    return {"items": n, "seconds": elapsed, **latency_stats(samples)}
+
+
+_MODELS = {}
+
+
+def bench_scoring(n):
+    """Gravidade (RF) + NER do dashboard em lotes; NER entra apenas se estiver instalado."""
+    from src.models.nlp.model_store import load_severity_model, load_ner_model
+    from src.models.nlp.note_scoring import BATCH_SIZE, score_texts
+
+    if "rf" not in _MODELS:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _MODELS["rf"] = load_severity_model()
+        try:
+            _MODELS["ner"] = load_ner_model()
+        except Exception:
+            _MODELS["ner"] = None
+    texts, _ = _synthetic_notes(n)
+    samples = []
+    t0 = time.perf_counter()
+    for start in range(0, n, BATCH_SIZE):
+        batch_t0 = time.perf_counter()
+        score_texts(texts[start:start + BATCH_SIZE], _MODELS["rf"], _MODELS["ner"], BATCH_SIZE)
+        samples.append((time.perf_counter() - batch_t0) * 1000)
+    elapsed = time.perf_counter() - t0
+    return {"items": n, "seconds": elapsed, "ner": _MODELS["ner"] is not None, **latency_stats(samples)}
+
+
+def bench_pk(n):
+    """pk_engine.simulate_ward: n pacientes x 3 esquemas x 6 ciclos (2 compartimentos)."""
+    from src.models.pkpd.pk_engine import CL_L_H, V1_L, simulate_ward
+
+    rng = np.random.default_rng(SEED)
+    patients = {"cl": CL_L_H * rng.lognormal(0, 0.3, n), "v1": V1_L * rng.lognormal(0, 0.2, n),
+                "q": np.full(n, 1.5), "v2": np.full(n, 40.0)}
+    regimens = {"dose": [75.0, 40.0, 100.0], "tinf": [1.0, 1.0, 2.0],
+                "tau": [504.0, 168.0, 504.0], "n_doses": [6, 6, 6]}
+    t = np.linspace(0, 6 * 504, 500)
+    t0 = time.perf_counter()
+    simulate_ward(patients, regimens, t)
+    elapsed = time.perf_counter() - t0
+    return {"items": n, "seconds": elapsed, **latency_stats([elapsed * 1000])}
+
+
+def bench_cox(n):
+    """risk_scoring.rank_at_risk: matriz de sobrevida + ranking da coorte inteira."""
+    from src.models.toxicity.risk_scoring import load_cox_model, rank_at_risk
+
+    if "cox" not in _MODELS:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _MODELS["cox"] = load_cox_model()
+    rng = np.random.default_rng(SEED)
+    cohort = pd.DataFrame({
+        "person_id": np.arange(n),
+        "dose_mg": rng.normal(70, 15, n),
+        "variante_genetica": rng.binomial(1, 0.3, n),
+        "idade": rng.normal(60, 10, n),
+    })
+    t0 = time.perf_counter()
+    rank_at_risk(_MODELS["cox"], cohort)
+    elapsed = time.perf_counter() - t0
+    return {"items": n, "seconds": elapsed, **latency_stats([elapsed * 1000])}
+
+
+def bench_renal(n):
+    """renal_rules.RenalRulesEngine: n creatininas (12 por paciente) pelas regras KDIGO, em memoria."""
+    from src.models.toxicity.renal_rules import benchmark
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = benchmark(n_pacientes=max(n // 12, 1), exames_por_paciente=12, seed=SEED)
+    return {**result, **latency_stats([result["seconds"] * 1000])}
+
+
+def bench_analytics(n):
+    """columnar_store.AnalyticsStore: consultas de coorte (DuckDB) sobre n exames + n/10 episodios em Parquet."""
+    from src.analytics.columnar_store import benchmark
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = benchmark(n_measurements=n, seed=SEED)
+    return {**result, **latency_stats([result["nefro_dose"] * 1000, result["lab_mes"] * 1000])}
+
+
+# nome -> (funcao, unidade, tamanhos)
+BENCHMARKS = {
+    "hl7_parse_persist": (bench_hl7, "msg", (500, 2_000, 10_000)),
+    "api_ingest": (bench_api, "req", (200, 1_000, 3_000)),
+    "etl_load": (bench_etl, "linhas", (10_000, 100_000, 500_000)),
+    "nlp_analyze_text": (bench_nlp, "notas", (10_000, 50_000, 200_000)),
+    "rf_ner_scoring": (bench_scoring, "notas", (128, 1_024, 4_096)),
+    "pk_simulation": (bench_pk, "pacientes", (300, 1_000, 3_000)),
+    "cox_scoring": (bench_cox, "pacientes", (50_000, 200_000, 1_000_000)),
+    "renal_rules": (bench_renal, "resultados", (12_000, 120_000, 600_000)),
+    "analytics_query": (bench_analytics, "linhas", (1_000_000, 3_000_000, 10_000_000)),
+}
+
+
+def run_suite(only=None, quick=False, repeats=REPEATS):
+    """Roda os benchmarks (mediana de 'repeats' rodadas por tamanho) e devolve o relatorio."""
+    results = {}
+    for name, (fn, unit, sizes) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        results[name] = {}
+        for size in (sizes[:1] if quick else sizes):
+            try:
+                runs = [fn(size) for _ in range(repeats)]
+            except ImportError as e:
+                print(f"[AVISO] {name}: dependencia ausente ({e}); ignorado.")
+                results.pop(name)
+                break
+            best = sorted(runs, key=lambda r: r["seconds"])[len(runs) // 2]
+            entry = {
+                "throughput": round(best["items"] / best["seconds"], 1),
+                "unit": f"{unit}/s",
+                "seconds": round(best["seconds"], 4),
+                "p50_ms": best["p50_ms"],
+                "p99_ms": best["p99_ms"],
+            }
+            if "ner" in best:
+                entry["ner"] = best["ner"]
+            results[name][str(size)] = entry
+            print(f"      {name:18s} n={size:>9d}: {entry['throughput']:>12.1f} {entry['unit']:12s} "
+                  f"p50 {entry['p50_ms']:.3f} ms | p99 {entry['p99_ms']:.3f} ms")
+    return {"created_at": datetime.now().isoformat(timespec="seconds"), "environment": environment(),
+            "repeats": repeats, "results": results}
+
+
+def compare(report, baseline, throughput_tol=THROUGHPUT_TOLERANCE, latency_tol=LATENCY_TOLERANCE):
+    """Lista de regressoes (benchmark, tamanho, metrica, atual, base) frente a linha de base."""
+    env, base_env = report["environment"], baseline.get("environment", {})
+    if (env.get("host"), env.get("cpu_count")) != (base_env.get("host"), base_env.get("cpu_count")):
+        print(f"[AVISO] Linha de base gerada em outra maquina ({base_env.get('host')}, "
+              f"{base_env.get('cpu_count')} CPUs); a comparacao pode nao ser valida.")
+    regressions = []
+    for name, sizes in report["results"].items():
+        for size, cur in sizes.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if base is None:
+                continue
+            if cur["throughput"] < base["throughput"] * (1 - throughput_tol):
+                regressions.append((name, size, "throughput", cur["throughput"], base["throughput"]))
+            if cur["p99_ms"] > base["p99_ms"] * (1 + latency_tol):
+                regressions.append((name, size, "p99_ms", cur["p99_ms"], base["p99_ms"]))
+    return regressions
+
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    # python -m src.benchmarks.suite [--quick] [--only=hl7_parse_persist,cox_scoring] [--repeats=3]
+    #                                [--save-baseline] [--baseline=reports/benchmarks/baseline.json]
+    # Sai com codigo 1 se houver regressao frente a linha de base (gate de deploy)
+    opts = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    only = set(opts["only"].split(",")) if "only" in opts else None
+    unknown = (only or set()) - set(BENCHMARKS)
+    if unknown:
+        print(f"[ERRO] Benchmarks desconhecidos: {', '.join(sorted(unknown))} (opcoes: {', '.join(BENCHMARKS)})")
+        sys.exit(2)
+
+    print(f"[INFO] Suite de benchmarks ({'rapida' if '--quick' in sys.argv else 'completa'})...")
+    report = run_suite(only, quick="--quick" in sys.argv, repeats=int(opts.get("repeats", REPEATS)))
+    run_path = os.path.join(RESULTS_DIR, f"run_{datetime.now():%Y%m%d_%H%M%S}.json")
+    save_report(report, run_path)
+    print(f"[OK] Resultados salvos: {run_path}")
+
+    baseline_path = opts.get("baseline", BASELINE_PATH)
+    if "--save-baseline" in sys.argv:
+        save_report(report, baseline_path)
+        print(f"[OK] Linha de base atualizada: {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        for name, size, metric, cur, base in regressions:
+            print(f"[ERRO] Regressao em {name} n={size}: {metric} {cur} (linha de base {base})")
+        if regressions:
+            sys.exit(1)
+        print("[OK] Sem regressoes frente a linha de base.")
+    else:
+        print(f"[AVISO] Sem linha de base em {baseline_path}. Rode com --save-baseline.")
@@ -1,46 +1,338 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import time
+
+# Parquet e opcional: sem pyarrow o gerador grava apenas CSV e HL7
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from src.models.nlp.ae_detector import PharmacovigilanceNLP
+except ImportError:
+    # Execucao direta: python src/data/generate_synthetic.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.models.nlp.ae_detector import PharmacovigilanceNLP
 
 DATA_DIR = "data/processed"
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# --- 1. DATASET DE TREINAMENTO (IA) ---
-dados_treino = [
-    {"texto": "Paciente refere fadiga leve, sem dor. Mantendo atividades.", "gravidade": "Grau 1 (Leve)"},
-    {"texto": "Dor intensa e vomitos incoerciveis, necessita intervencao.", "gravidade": "Grau 3/4 (Grave)"},
-    {"texto": "Neutropenia febril, risco de sepse. Internacao urgente.", "gravidade": "Grau 3/4 (Grave)"},
-    {"texto": "Nefrotoxicidade aguda, creatinina triplicou. Oliguria.", "gravidade": "Grau 3/4 (Grave)"},
-    {"texto": "Evolucao assintomatica. Sem queixas ou intercorrencias.", "gravidade": "Grau 0 (Normal)"}
-]
-df_treino = pd.DataFrame(dados_treino * 5) 
-df_treino.to_csv(os.path.join(DATA_DIR, "treino_ia.csv"), index=False)
-
-# --- 2. PACIENTES DO DASHBOARD (5 Mocks) ---
-pacientes = [
-    {"id": 1001, "nome": "Maria Silva (Estavel)", "idade": 45, "sexo": "F", "peso": 60.0, "bsa": 1.65, "status": "Estável"},
-    {"id": 1002, "nome": "Joao Santos (Risco Renal)", "idade": 68, "sexo": "M", "peso": 75.0, "bsa": 1.88, "status": "Alerta Elevado"},
-    {"id": 1003, "nome": "Ana Costa (RAM)", "idade": 52, "sexo": "F", "peso": 68.0, "bsa": 1.70, "status": "Monitoramento RAM"},
-    {"id": 1004, "nome": "Carlos Pereira (Risco PK)", "idade": 71, "sexo": "M", "peso": 82.0, "bsa": 1.95, "status": "Alerta PK"},
-    {"id": 1005, "nome": "Sofia Mendes (Estavel)", "idade": 38, "sexo": "F", "peso": 55.0, "bsa": 1.58, "status": "Estável"}
-]
-df_pacientes = pd.DataFrame(pacientes)
+# Modo carga (--patients=N): tudo sob um unico diretorio
+SYNTHETIC_DIR = "data/synthetic"
+CHUNK_PATIENTS = 5_000
+SEED = 42
+N_CYCLES = 6
+CYCLE_DAYS = 21
+NOTES_PER_PATIENT = 2
+TRAIN_ROWS = 20_000
+START_DATE = np.datetime64("2025-01-06T08:00")
 
-# --- 3. EXAMES E NOTAS MOCK ---
-exames = [
-    {"patient_id": 1001, "tipo": "Creatinina", "valor": 0.8}, {"patient_id": 1002, "tipo": "Creatinina", "valor": 1.9},
-    {"patient_id": 1003, "tipo": "Creatinina", "valor": 0.9}, {"patient_id": 1004, "tipo": "Creatinina", "valor": 1.5},
-    {"patient_id": 1005, "tipo": "Creatinina", "valor": 0.7},
+# Exames por ciclo: codigo -> (nome no dashboard, nome HL7, unidade, media, dp, faixa normal)
+EXAMS = {
+    "CREAT": ("Creatinina", "Creatinina Serica", "mg/dL", 0.9, 0.2, (0.6, 1.2)),
+    "UREA":  ("Ureia", "Ureia Serica", "mg/dL", 32.0, 8.0, (15.0, 45.0)),
+    "HB":    ("Hemoglobina", "Hemoglobina", "g/dL", 12.5, 1.4, (12.0, 16.0)),
+    "PLT":   ("Plaquetas", "Plaquetas", "10^3/uL", 240.0, 60.0, (150.0, 400.0)),
+    "K":     ("Potassio", "Potassio Serico", "mmol/L", 4.2, 0.4, (3.5, 5.1)),
+}
+STATUS = ["Tratamento", "Estável", "Alerta Elevado", "Monitoramento RAM", "Alta"]
+STATUS_P = [0.55, 0.2, 0.1, 0.1, 0.05]
+# Frases sem evento adverso e moldes para injetar um termo do dicionario CTCAE
+QUIET_NOTES = [
+    "Paciente refere fadiga leve, mantendo atividades.",
+    "Evolucao sem intercorrencias; tratamento bem tolerado.",
+    "Sem queixas ativas. Aceitando bem a dieta.",
+    "Evolucao assintomatica. Sem queixas ou intercorrencias.",
 ]
-notas = [
-    {"patient_id": 1001, "texto": "Paciente refere fadiga leve, mantendo atividades."},
-    {"patient_id": 1002, "texto": "Apresenta sinais de nefrotoxicidade aguda e oliguria severa."},
-    {"patient_id": 1003, "texto": "Relata rash cutaneo difuso e leve prurido."},
-    {"patient_id": 1004, "texto": "Sem queixas ativas. Exames de rotina demonstram alteracao renal recente."},
-    {"patient_id": 1005, "texto": "Evolucao sem intercorrencias; tratamento bem tolerado."}
+AE_TEMPLATES = [
+    "Paciente refere {termo} desde o ciclo {ciclo}.",
+    "Evolui com {termo} apos cisplatina, orientado retorno.",
+    "Ao exame: {termo}. Mantida conduta e reavaliacao em 48h.",
+    "Familiar relata {termo} nos ultimos dias do ciclo {ciclo}.",
 ]
+AE_RATE = 0.35
+# Risco do termo (dicionario) -> rotulo de gravidade usado no treino
+GRADE_BY_RISK = {"Alto": "Grau 3/4 (Grave)", "Médio": "Grau 1 (Leve)", "Baixo": "Grau 1 (Leve)"}
+GRADE_NONE = "Grau 0 (Normal)"
+
+
+def generate_mocks(data_dir=DATA_DIR):
+    """Os 5 pacientes fixos usados pelo dashboard (modo padrao, sem argumentos)."""
+    os.makedirs(data_dir, exist_ok=True)
+
+    # --- 1. DATASET DE TREINAMENTO (IA) ---
+    dados_treino = [
+        {"texto": "Paciente refere fadiga leve, sem dor. Mantendo atividades.", "gravidade": "Grau 1 (Leve)"},
+        {"texto": "Dor intensa e vomitos incoerciveis, necessita intervencao.", "gravidade": "Grau 3/4 (Grave)"},
+        {"texto": "Neutropenia febril, risco de sepse. Internacao urgente.", "gravidade": "Grau 3/4 (Grave)"},
+        {"texto": "Nefrotoxicidade aguda, creatinina triplicou. Oliguria.", "gravidade": "Grau 3/4 (Grave)"},
+        {"texto": "Evolucao assintomatica. Sem queixas ou intercorrencias.", "gravidade": "Grau 0 (Normal)"}
+    ]
+    df_treino = pd.DataFrame(dados_treino * 5)
+    df_treino.to_csv(os.path.join(data_dir, "treino_ia.csv"), index=False)
+
+    # --- 2. PACIENTES DO DASHBOARD (5 Mocks) ---
+    pacientes = [
+        {"id": 1001, "nome": "Maria Silva (Estavel)", "idade": 45, "sexo": "F", "peso": 60.0, "bsa": 1.65, "status": "Estável"},
+        {"id": 1002, "nome": "Joao Santos (Risco Renal)", "idade": 68, "sexo": "M", "peso": 75.0, "bsa": 1.88, "status": "Alerta Elevado"},
+        {"id": 1003, "nome": "Ana Costa (RAM)", "idade": 52, "sexo": "F", "peso": 68.0, "bsa": 1.70, "status": "Monitoramento RAM"},
+        {"id": 1004, "nome": "Carlos Pereira (Risco PK)", "idade": 71, "sexo": "M", "peso": 82.0, "bsa": 1.95, "status": "Alerta PK"},
+        {"id": 1005, "nome": "Sofia Mendes (Estavel)", "idade": 38, "sexo": "F", "peso": 55.0, "bsa": 1.58, "status": "Estável"}
+    ]
+    df_pacientes = pd.DataFrame(pacientes)
+
+    # --- 3. EXAMES E NOTAS MOCK ---
+    exames = [
+        {"patient_id": 1001, "tipo": "Creatinina", "valor": 0.8}, {"patient_id": 1002, "tipo": "Creatinina", "valor": 1.9},
+        {"patient_id": 1003, "tipo": "Creatinina", "valor": 0.9}, {"patient_id": 1004, "tipo": "Creatinina", "valor": 1.5},
+        {"patient_id": 1005, "tipo": "Creatinina", "valor": 0.7},
+    ]
+    notas = [
+        {"patient_id": 1001, "texto": "Paciente refere fadiga leve, mantendo atividades."},
+        {"patient_id": 1002, "texto": "Apresenta sinais de nefrotoxicidade aguda e oliguria severa."},
+        {"patient_id": 1003, "texto": "Relata rash cutaneo difuso e leve prurido."},
+        {"patient_id": 1004, "texto": "Sem queixas ativas. Exames de rotina demonstram alteracao renal recente."},
+        {"patient_id": 1005, "texto": "Evolucao sem intercorrencias; tratamento bem tolerado."}
+    ]
+
+    df_pacientes.to_csv(os.path.join(data_dir, "pacientes_mock.csv"), index=False)
+    pd.DataFrame(exames).to_csv(os.path.join(data_dir, "exames_mock.csv"), index=False)
+    pd.DataFrame(notas).to_csv(os.path.join(data_dir, "notas_mock.csv"), index=False)
+    print("[OK] Dados Mock gerados com sucesso.")
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    # ru_maxrss em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_patients(rng, first_id, n):
+    idade = rng.integers(18, 90, n)
+    sexo = np.where(rng.random(n) < 0.5, "F", "M")
+    peso = np.round(np.clip(rng.normal(70, 13, n), 38, 160), 1)
+    altura = rng.normal(np.where(sexo == "F", 161, 174), 7)
+    ids = np.arange(first_id, first_id + n)
+    return pd.DataFrame({
+        "id": ids,
+        "nome": [f"Paciente Sintetico {i:07d}" for i in ids],
+        "idade": idade,
+        "sexo": sexo,
+        "peso": peso,
+        "bsa": np.round(np.sqrt(altura * peso / 3600), 2),  # Mosteller
+        "status": rng.choice(STATUS, n, p=STATUS_P),
+    })
+
+
+def make_labs(rng, patients, n_cycles=N_CYCLES):
+    """Exames longitudinais (um painel por ciclo); creatinina sobe nos nefrotoxicos."""
+    n = len(patients)
+    ids = np.repeat(patients["id"].to_numpy(), n_cycles)
+    ciclo = np.tile(np.arange(n_cycles), n)
+    datas = (START_DATE + (ciclo * CYCLE_DAYS * 24 * 60).astype("timedelta64[m]")
+             + rng.integers(0, 12 * 60, n * n_cycles).astype("timedelta64[m]"))
+    # Deriva renal por paciente: ~15% acumulam dano a cada ciclo
+    drift = np.repeat(np.where(rng.random(n) < 0.15, rng.uniform(0.1, 0.35, n), 0.0), n_cycles)
+    frames = []
+    for code, (tipo, _, unidade, media, dp, _) in EXAMS.items():
+        base = np.repeat(rng.normal(media, dp, n), n_cycles)
+        valor = base * (1 + drift * ciclo) if code == "CREAT" else base + rng.normal(0, dp / 4, n * n_cycles)
+        frames.append(pd.DataFrame({
+            "patient_id": ids, "tipo": tipo, "codigo": code,
+            "valor": np.round(np.maximum(valor, 0.01), 2), "unidade": unidade, "data": datas, "ciclo": ciclo,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_notes(rng, patients, terms, notes_per_patient=NOTES_PER_PATIENT):
+    """Evolucoes em texto livre; ~AE_RATE delas com um termo do dicionario injetado."""
+    n = len(patients) * notes_per_patient
+    ids = np.repeat(patients["id"].to_numpy(), notes_per_patient)
+    ciclo = rng.integers(1, N_CYCLES + 1, n)
+    tem_evento = rng.random(n) < AE_RATE
+    synonyms = list(terms)
+    termo_idx = rng.integers(0, len(synonyms), n)
+    tpl_idx = rng.integers(0, len(AE_TEMPLATES), n)
+    quiet_idx = rng.integers(0, len(QUIET_NOTES), n)
+    textos, eventos, graus = [], [], []
+    for ev, ti, pi, qi, c in zip(tem_evento, termo_idx, tpl_idx, quiet_idx, ciclo):
+        if ev:
+            syn = synonyms[ti]
+            canonical, risco = terms[syn]
+            textos.append(AE_TEMPLATES[pi].format(termo=syn, ciclo=c))
+            eventos.append(canonical)
+            graus.append(GRADE_BY_RISK.get(risco, GRADE_NONE))
+        else:
+            textos.append(QUIET_NOTES[qi])
+            eventos.append("")
+            graus.append(GRADE_NONE)
+    datas = (START_DATE + ((ciclo - 1) * CYCLE_DAYS * 24 * 60).astype("timedelta64[m]")
+             + rng.integers(0, 20 * 24 * 60, n).astype("timedelta64[m]"))
+    return pd.DataFrame({"patient_id": ids, "texto": textos, "data": datas,
+                         "evento_injetado": eventos, "gravidade": graus})
+
+
+def make_raw_etl(rng, patients):
+    """Entrada do ETL 01 (data/raw/dados_teste.csv): dose e toxicidade como texto."""
+    dose = np.round(patients["bsa"].to_numpy() * 75 / 5) * 5
+    return pd.DataFrame({
+        "id_paciente": patients["id"],
+        "dose_cisplatina": [f"{d:.0f}mg" for d in dose],
+        "toxicidade_renal": [f"grau_{g}" for g in rng.choice(5, len(patients), p=[0.6, 0.2, 0.1, 0.07, 0.03])],
+    })
+
+
+def hl7_ts(values):
+    """datetime64 -> YYYYMMDDHHMMSS (formato dos campos TS do HL7)."""
+    iso = np.datetime_as_string(np.asarray(values, dtype="datetime64[s]"))
+    return np.array([v.replace("-", "").replace("T", "").replace(":", "") for v in iso], dtype=object)
+
+
+def labs_to_hl7(labs, msg_offset):
+    """
+    Uma ORU^R01 por paciente e ciclo, com um OBX por exame do painel.
+    Montagem vetorizada por coluna de exame (arrays de objetos), sem laco por OBX.
+    """
+    n_exams = len(EXAMS)
+    # make_labs empilha um bloco por exame: estavel por paciente/ciclo mantem a ordem de EXAMS
+    labs = labs.sort_values(["patient_id", "ciclo"], kind="stable")
+    n_msgs = len(labs) // n_exams
+    pids = labs["patient_id"].to_numpy()[::n_exams].astype(str).astype(object)
+    ts = hl7_ts(labs["data"].to_numpy()[::n_exams])
+    valor = labs["valor"].to_numpy(dtype=float).reshape(n_msgs, n_exams)
+    msg_ids = np.char.zfill(np.arange(msg_offset + 1, msg_offset + n_msgs + 1).astype(str), 10).astype(object)
+
+    msgs = ("MSH|^~\\&|TASY|LAB|ONCO|CDSS|" + ts + "||ORU^R01|SYN" + msg_ids + "|P|2.3\r"
+            "PID|1||" + pids + "||PACIENTE^SINTETICO\r"
+            "OBR|1|||PAINEL^Painel Oncologico")
+    for j, (code, (_, name, unidade, _, _, (low, high))) in enumerate(EXAMS.items()):
+        v = valor[:, j]
+        flag = np.where(v > high, "H", np.where(v < low, "L", "N")).astype(object)
+        msgs = (msgs + f"\rOBX|{j + 1}|NM|{code}^{name}||" + v.astype(str).astype(object)
+                + f"|{unidade}||" + flag + "|||F|||" + ts)
+    return msgs.tolist(), n_msgs
+
+
+class _ParquetSink:
+    """Um ParquetWriter por tabela, aberto no primeiro bloco (esquema do pandas)."""
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.writers = {}
+
+    def write(self, name, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if name not in self.writers:
+            os.makedirs(self.out_dir, exist_ok=True)
+            self.writers[name] = pq.ParquetWriter(os.path.join(self.out_dir, f"{name}.parquet"),
+                                                  table.schema, compression="zstd")
+        self.writers[name].write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def generate_dataset(n_patients, out_dir=SYNTHETIC_DIR, seed=SEED, chunk_patients=CHUNK_PATIENTS,
+                     n_cycles=N_CYCLES, notes_per_patient=NOTES_PER_PATIENT, train_rows=TRAIN_ROWS,
+                     parquet=True, hl7=True):
+    """
+    Gera o conjunto de carga em blocos de pacientes (memoria limitada ao bloco):
+    CSVs no formato dos mocks, entrada do ETL 01, Parquet (zstd) e lote HL7 (FHS/BHS).
+    Mesma semente -> mesmos arquivos.
+    """
+    rng = np.random.default_rng(seed)
+    nlp = PharmacovigilanceNLP()
+    terms = {syn: (canonical, nlp.tox_terms[canonical]["risco"]) for syn, canonical in nlp.synonyms.items()}
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "pacientes": os.path.join(out_dir, "pacientes_mock.csv"),
+        "exames": os.path.join(out_dir, "exames_mock.csv"),
+        "notas": os.path.join(out_dir, "notas_mock.csv"),
+        "treino": os.path.join(out_dir, "treino_ia.csv"),
+        "etl_raw": os.path.join(out_dir, "dados_teste.csv"),
+        "hl7": os.path.join(out_dir, "hl7", "oru_lote.hl7"),
+    }
+    parquet_sink = _ParquetSink(os.path.join(out_dir, "parquet")) if parquet and pq is not None else None
+    if parquet and pq is None:
+        print("[AVISO] pyarrow nao instalado: saida Parquet desativada (pip install pyarrow).")
+    hl7_file = None
+    if hl7:
+        os.makedirs(os.path.dirname(paths["hl7"]), exist_ok=True)
+        hl7_file = open(paths["hl7"], "w", encoding="utf-8", newline="")
+        now = hl7_ts([START_DATE])[0]
+        hl7_file.write(f"FHS|^~\\&|TASY|LAB|ONCO|CDSS|{now}\rBHS|^~\\&|TASY|LAB|ONCO|CDSS|{now}\r")
+
+    print(f"[INFO] Gerando {n_patients} pacientes sinteticos em {out_dir} (semente {seed})...")
+    t0 = time.perf_counter()
+    counts = {"pacientes": 0, "exames": 0, "notas": 0, "hl7_msgs": 0}
+    train_done = 0
+    try:
+        for first in range(0, n_patients, chunk_patients):
+            n = min(chunk_patients, n_patients - first)
+            header = first == 0
+            mode = "w" if header else "a"
+
+            patients = make_patients(rng, 1_000_000 + first, n)
+            labs = make_labs(rng, patients, n_cycles)
+            notes = make_notes(rng, patients, terms, notes_per_patient)
+            raw = make_raw_etl(rng, patients)
+
+            patients.to_csv(paths["pacientes"], mode=mode, header=header, index=False)
+            labs.drop(columns="ciclo").to_csv(paths["exames"], mode=mode, header=header, index=False)
+            notes[["patient_id", "texto", "data", "evento_injetado"]].to_csv(
+                paths["notas"], mode=mode, header=header, index=False)
+            raw.to_csv(paths["etl_raw"], mode=mode, header=header, index=False)
+            if train_done < train_rows:
+                train = notes[["texto", "gravidade"]].head(train_rows - train_done)
+                train.to_csv(paths["treino"], mode=mode, header=header, index=False)
+                train_done += len(train)
+
+            if parquet_sink is not None:
+                parquet_sink.write("pacientes", patients)
+                parquet_sink.write("exames", labs)
+                parquet_sink.write("notas", notes)
+            if hl7_file is not None:
+                messages, n_msgs = labs_to_hl7(labs, counts["hl7_msgs"])
+                hl7_file.write("\r".join(messages) + "\r")
+                counts["hl7_msgs"] += n_msgs
+
+            counts["pacientes"] += n
+            counts["exames"] += len(labs)
+            counts["notas"] += len(notes)
+            elapsed = time.perf_counter() - t0
+            print(f"      {counts['pacientes']}/{n_patients} pacientes "
+                  f"({counts['pacientes'] / elapsed:.0f} pacientes/s)")
+    finally:
+        if parquet_sink is not None:
+            parquet_sink.close()
+        if hl7_file is not None:
+            hl7_file.write(f"BTS|{counts['hl7_msgs']}\rFTS|1\r")
+            hl7_file.close()
+
+    elapsed = time.perf_counter() - t0
+    peak = peak_memory_mb()
+    rows = counts["pacientes"] + counts["exames"] + counts["notas"]
+    print(f"[OK] {counts['pacientes']} pacientes, {counts['exames']} exames, {counts['notas']} notas, "
+          f"{counts['hl7_msgs']} mensagens HL7 em {elapsed:.1f}s ({rows / elapsed:.0f} linhas/s) | "
+          f"pico de memoria: {f'{peak:.0f} MB' if peak is not None else 'n/d'}")
+    return counts
+
 
-df_pacientes.to_csv(os.path.join(DATA_DIR, "pacientes_mock.csv"), index=False)
-pd.DataFrame(exames).to_csv(os.path.join(DATA_DIR, "exames_mock.csv"), index=False)
-pd.DataFrame(notas).to_csv(os.path.join(DATA_DIR, "notas_mock.csv"), index=False)
-print("[OK] Dados Mock gerados com sucesso.")
+if __name__ == "__main__":
+    # python src/data/generate_synthetic.py                     -> 5 mocks do dashboard
+    # python src/data/generate_synthetic.py --patients=1000000 [--out=data/synthetic] [--seed=42]
+    opts = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    if "patients" in opts:
+        generate_dataset(int(opts["patients"]), opts.get("out", SYNTHETIC_DIR), int(opts.get("seed", SEED)),
+                         chunk_patients=int(opts.get("chunk", CHUNK_PATIENTS)),
+                         parquet="--no-parquet" not in sys.argv, hl7="--no-hl7" not in sys.argv)
+    else:
+        generate_mocks()
@@ -1,40 +1,153 @@
 import pandas as pd
 import os
+import shutil
+import sys
+import time
+
+# Parquet e opcional: sem pyarrow o ETL grava apenas o CSV
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from src.monitoring.metrics import track
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.monitoring.metrics import track
 
 # Caminhos (Paths)
 RAW_PATH = "data/raw/dados_teste.csv"
 PROCESSED_PATH = "data/processed/dados_limpos.csv"
+# Saida colunar: dataset Parquet (zstd) particionado por grau de toxicidade renal
+PARQUET_DIR = "data/processed/dados_limpos_parquet"
+PARTITION_COLS = ["toxicidade_renal_grau"]
+
+CHUNK_ROWS = 200_000
+
+# Tipos explicitos (nomes ja normalizados); colunas desconhecidas seguem como texto
+DTYPES = {
+    "id_paciente": "Int64",
+    "dose_cisplatina": "string",
+    "toxicidade_renal": "string",
+}
+
+
+def normalize_columns(columns):
+    return [col.lower().strip() for col in columns]
+
+
+def transform_chunk(df):
+    """Parsing vetorizado: '75mg' -> 75.0 e 'grau_1' -> 1 (sem loops por linha)."""
+    df.columns = normalize_columns(df.columns)
+
+    if "dose_cisplatina" in df:
+        dose = df["dose_cisplatina"].str.extract(r"(\d+(?:[.,]\d+)?)", expand=False)
+        df["dose_cisplatina_mg"] = pd.to_numeric(dose.str.replace(",", ".", regex=False),
+                                                 errors="coerce").astype("float32")
+    if "toxicidade_renal" in df:
+        grau = df["toxicidade_renal"].str.extract(r"(\d+)", expand=False)
+        df["toxicidade_renal_grau"] = pd.to_numeric(grau, errors="coerce").astype("Int8")
+    return df
+
+
+def remove_outputs(processed_path=PROCESSED_PATH, parquet_dir=PARQUET_DIR):
+    """Apaga as saidas da execucao anterior: entrada vazia ou com erro nao deixa dados antigos."""
+    if os.path.exists(processed_path):
+        os.remove(processed_path)
+    if os.path.exists(parquet_dir):
+        shutil.rmtree(parquet_dir)
 
-def run_etl():
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    # ru_maxrss em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_etl(raw_path=RAW_PATH, processed_path=PROCESSED_PATH, parquet_dir=PARQUET_DIR,
+            chunk_rows=CHUNK_ROWS):
     print("🚀 Iniciando Pipeline de ETL...")
-    
+
     # 1. Verificação de Segurança
-    if not os.path.exists(RAW_PATH):
-        print(f"❌ Erro: Arquivo não encontrado em {RAW_PATH}")
+    if not os.path.exists(raw_path):
+        print(f"❌ Erro: Arquivo não encontrado em {raw_path}")
         return
 
-    # 2. Extração (Extract)
+    remove_outputs(processed_path, parquet_dir)
+
+    # 2. Extração (Extract) em blocos com tipos explícitos
     try:
-        df = pd.read_csv(RAW_PATH)
-        print(f"✅ Dados Carregados: {len(df)} registros encontrados.")
+        header = pd.read_csv(raw_path, nrows=0).columns
+        raw_dtypes = {raw: DTYPES.get(norm, "string")
+                      for raw, norm in zip(header, normalize_columns(header))}
+        reader = pd.read_csv(raw_path, dtype=raw_dtypes, chunksize=chunk_rows)
     except Exception as e:
         print(f"❌ Erro ao ler CSV: {e}")
         return
 
-    # 3. Transformação (Transform)
-    # Padronização simples para demonstrar o fluxo
+    if pq is None:
+        print("⚠️ pyarrow não instalado: saída Parquet desativada (pip install pyarrow).")
+
+    # 3. Transformação (Transform) + 4. Carga (Load), bloco a bloco
     print("🔄 Normalizando dados...")
-    df.columns = [col.lower().strip() for col in df.columns] # Padroniza colunas
-    
-    # Exemplo de regra de negócio: Filtrar apenas toxicidades
-    # (Num cenário real, aqui entraria a limpeza com 'ehrapy')
-    
-    # 4. Carga (Load)
-    df.to_csv(PROCESSED_PATH, index=False)
-    print(f"💾 Dados processados salvos em: {PROCESSED_PATH}")
+    t0 = time.perf_counter()
+    total = 0
+    sample = None
+    try:
+        for i, chunk in enumerate(reader):
+            with track("etl_transform", items=len(chunk)):
+                df = transform_chunk(chunk)
+            if sample is None:
+                sample = df.head()
+
+            # CSV mantido para o 02_load_to_sql (append por bloco)
+            with track("file_write", items=len(df), sink="csv"):
+                df.to_csv(processed_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+            if pq is not None:
+                with track("file_write", items=len(df), sink="parquet"):
+                    # linha_origem: a particao embaralha a ordem do arquivo; guarda a posicao original
+                    pq.write_to_dataset(
+                        pa.Table.from_pandas(df.assign(linha_origem=range(total, total + len(df))),
+                                             preserve_index=False),
+                        root_path=parquet_dir,
+                        partition_cols=[c for c in PARTITION_COLS if c in df],
+                        basename_template=f"part-{i:05d}-{{i}}.parquet",
+                        compression="zstd",
+                    )
+            total += len(df)
+    except ValueError as e:
+        # Tipos e formato sao validados ao ler cada bloco (ParserError tambem e ValueError)
+        print(f"❌ Erro ao ler CSV (bloco a partir da linha {total + 1}): {e}")
+        remove_outputs(processed_path, parquet_dir)
+        return
+    if total == 0:
+        # Entrada sem linhas: CSV so com o cabecalho (o ETL 02 carrega zero registros)
+        empty = transform_chunk(pd.read_csv(raw_path, dtype=raw_dtypes, nrows=0))
+        empty.to_csv(processed_path, index=False)
+        sample = empty
+
+    elapsed = time.perf_counter() - t0
+    rate = total / elapsed if elapsed > 0 else 0.0
+    peak = peak_memory_mb()
+    print(f"✅ Dados Carregados: {total} registros encontrados.")
+    print(f"💾 Dados processados salvos em: {processed_path}")
+    if pq is not None:
+        print(f"💾 Dataset Parquet (zstd, particionado): {parquet_dir}")
+    print(f"⏱️ {rate:.0f} linhas/s | pico de memória: "
+          f"{f'{peak:.0f} MB' if peak is not None else 'n/d'}")
     print("---------------------------------------")
     print("Amostra dos dados processados:")
-    print(df.head())
+    print(sample)
+
 
 if __name__ == "__main__":
     run_etl()
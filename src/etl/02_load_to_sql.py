@@ -1,68 +1,135 @@
 import sqlite3
 import pandas as pd
+import glob
 import os
+import sys
+import time
+
+try:
+    from src.monitoring.metrics import record
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from src.monitoring.metrics import record
 
 # Caminhos
 DB_PATH = "database/oncopharm.db"
-SCHEMA_PATH = "database/schemas/01_omop_oncology_episode.sql"
+SCHEMA_DIR = "database/schemas"
 CSV_PATH = "data/processed/dados_limpos.csv"
 
+# Carga em blocos: cada bloco e uma transacao (dados + checkpoint juntos)
+CHUNK_ROWS = 100_000
+
 def init_database():
     print("[INFO] Inicializando Banco de Dados OMOP (SQLite)...")
     
-    # 1. Conectar ao banco
+    # 1. Ler os esquemas SQL (em ordem: 01_, 02_, ...)
+    schema_files = sorted(glob.glob(os.path.join(SCHEMA_DIR, "*.sql")))
+    if not schema_files:
+        print(f"[ERRO] Nenhum arquivo de esquema encontrado em: {SCHEMA_DIR}")
+        return None
+
+    # 2. Conectar ao banco (WAL: leitores do dashboard nao bloqueiam a carga)
     conn = sqlite3.connect(DB_PATH)
-    
-    # 2. Ler e executar o esquema SQL
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+
+    # 3. Executar os esquemas (todos idempotentes: IF NOT EXISTS)
     # encoding='utf-8' e essencial para ler o arquivo SQL corretamente
-    try:
-        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
-            schema_sql = f.read()
-            conn.executescript(schema_sql)
-        print("[OK] Tabelas criadas.")
-    except FileNotFoundError:
-        print(f"[ERRO] Arquivo de esquema nao encontrado: {SCHEMA_PATH}")
-        return None
-        
+    for schema_path in schema_files:
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+    print(f"[OK] Tabelas criadas ({len(schema_files)} esquemas).")
+
     return conn
 
-def load_data(conn):
+def get_checkpoint(conn, source):
+    row = conn.execute("SELECT rows_done FROM etl_checkpoint WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else 0
+
+def checkpoint_source(csv_path):
+    """Chave do checkpoint: caminho + tamanho + mtime (o ETL 01 reescreve o CSV a cada execucao)."""
+    st = os.stat(csv_path)
+    return f"{csv_path}:{st.st_size}:{st.st_mtime_ns}"
+
+def build_episode_rows(chunk):
+    """Monta as tuplas do episodio de forma vetorizada (sem iterrows)."""
+    ids = chunk['id_paciente'].astype('int64').tolist()
+    source_value = (
+        "Dose: " + chunk['dose_cisplatina'].astype(str)
+        + " | Tox: " + chunk['toxicidade_renal'].astype(str)
+    ).tolist()
+    # (episode_id, person_id, source_value)
+    return list(zip(ids, ids, source_value))
+
+def load_data(conn, csv_path=CSV_PATH, chunk_rows=CHUNK_ROWS):
+    """
+    Carga incremental em blocos. Linhas ja presentes (mesmo episode_id) sao
+    ignoradas pelo INSERT OR IGNORE, e o checkpoint gravado na mesma transacao
+    de cada bloco permite retomar uma carga interrompida de onde parou (se o
+    arquivo nao mudou desde entao).
+    """
     if conn is None: return
 
     print("[INFO] Carregando dados do CSV para SQL...")
     
-    if not os.path.exists(CSV_PATH):
-        print(f"[ERRO] Arquivo {CSV_PATH} nao encontrado. Rode o ETL 01.")
+    if not os.path.exists(csv_path):
+        print(f"[ERRO] Arquivo {csv_path} nao encontrado. Rode o ETL 01.")
         return
 
-    df = pd.read_csv(CSV_PATH)
-    cursor = conn.cursor()
-    
-    for index, row in df.iterrows():
-        # Dados do episódio
-        episode_data = (
-            row['id_paciente'],      # episode_id
-            row['id_paciente'],      # person_id
-            32531,                   # episode_concept_id
-            '2025-12-06',            # episode_start_date
-            1,                       # episode_number
-            f"Dose: {row['dose_cisplatina']} | Tox: {row['toxicidade_renal']}" # source_value
-        )
-        
-        sql = """
-        INSERT INTO episode (
-            episode_id, person_id, episode_concept_id, 
-            episode_start_date, episode_number, episode_source_value,
-            episode_object_concept_id, episode_type_concept_id
-        ) VALUES (?, ?, ?, ?, ?, ?, 0, 0);
-        """
-        try:
-            cursor.execute(sql, episode_data)
-        except sqlite3.IntegrityError:
-            pass # Ignora duplicatas na carga inicial
-        
-    conn.commit()
-    print(f"[OK] {len(df)} registros processados.")
+    sql = """
+    INSERT OR IGNORE INTO episode (
+        episode_id, person_id, episode_concept_id,
+        episode_start_date, episode_number, episode_source_value,
+        episode_object_concept_id, episode_type_concept_id
+    ) VALUES (?, ?, 32531, '2025-12-06', 1, ?, 0, 0);
+    """
+
+    source = checkpoint_source(csv_path)
+    # Checkpoint de uma versao anterior do arquivo nao vale para a atual
+    with conn:
+        conn.execute("DELETE FROM etl_checkpoint WHERE substr(source, 1, ?) = ? AND source <> ?",
+                     (len(csv_path) + 1, csv_path + ":", source))
+    done = get_checkpoint(conn, source)
+    if done:
+        print(f"[INFO] Retomando do checkpoint: {done} linhas ja carregadas.")
+
+    # Pula as linhas ja carregadas (mantendo o cabecalho)
+    reader = pd.read_csv(
+        csv_path,
+        usecols=['id_paciente', 'dose_cisplatina', 'toxicidade_renal'],
+        dtype={'dose_cisplatina': 'string', 'toxicidade_renal': 'string'},
+        skiprows=(lambda i: 0 < i <= done) if done else None,
+        chunksize=chunk_rows,
+    )
+
+    t0 = time.perf_counter()
+    read = inserted = 0
+    for chunk in reader:
+        if chunk.empty:
+            continue
+        rows = build_episode_rows(chunk.dropna(subset=['id_paciente']))
+        chunk_t0 = time.perf_counter()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(sql, rows)
+            inserted += conn.total_changes - before
+            read += len(chunk)
+            conn.execute(
+                """INSERT INTO etl_checkpoint (source, rows_done, updated_at)
+                   VALUES (?, ?, datetime('now'))
+                   ON CONFLICT(source) DO UPDATE SET
+                       rows_done = excluded.rows_done, updated_at = excluded.updated_at""",
+                (source, done + read),
+            )
+        record("db_write", (time.perf_counter() - chunk_t0) * 1000, items=len(rows), sink="etl_episode")
+        elapsed = time.perf_counter() - t0
+        print(f"      -> {done + read} linhas | {read / elapsed:.0f} linhas/s")
+
+    # Carga completa: a proxima execucao le o arquivo inteiro (INSERT OR IGNORE deduplica)
+    with conn:
+        conn.execute("DELETE FROM etl_checkpoint WHERE source = ?", (source,))
+    print(f"[OK] {read} registros processados ({inserted} novos, {read - inserted} ja existentes).")
 
 def verify_data(conn):
     if conn is None: return
@@ -74,13 +141,16 @@ def verify_data(conn):
         print(f"Erro ao ler SQL: {e}")
 
 if __name__ == "__main__":
-    # Garante banco limpo
-    if os.path.exists(DB_PATH):
-        try:
-            os.remove(DB_PATH)
-        except:
-            pass
-        
+    # Carga incremental por padrao; --reset recria o banco do zero
+    if "--reset" in sys.argv:
+        # Remove tambem o WAL e a memoria compartilhada, senao o banco "novo" herda paginas antigas
+        for path in (DB_PATH, DB_PATH + "-wal", DB_PATH + "-shm"):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except:
+                    pass
+
     conn = init_database()
     load_data(conn)
     verify_data(conn)
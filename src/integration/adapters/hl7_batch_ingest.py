@@ -0,0 +1,206 @@
+import os
+import sys
+import time
+
+try:
+    from .hl7_tasy_mv import DB_PATH, GroupCommitWriter, hl7_datetime
+    from .omop_measurement import SQL_INSERT_MEASUREMENT, ensure_schema, measurement_row
+except ImportError:
+    # Execucao direta: python src/integration/adapters/hl7_batch_ingest.py <arquivo>
+    from hl7_tasy_mv import DB_PATH, GroupCommitWriter, hl7_datetime
+    from omop_measurement import SQL_INSERT_MEASUREMENT, ensure_schema, measurement_row
+
+from src.models.toxicity import renal_rules
+
+# Leitura incremental: o arquivo nunca e carregado inteiro na memoria
+CHUNK_SIZE = 4 * 1024 * 1024
+ENCODING = "utf-8"
+# Lotes grandes para backfill (um commit a cada BULK_BATCH_SIZE OBX)
+BULK_BATCH_SIZE = 20000
+PROGRESS_EVERY = 50000
+
+# Segmentos de envelope de lote (FHS/BHS ... BTS/FTS) sao descartados
+BATCH_ENVELOPE = {"FHS", "BHS", "BTS", "FTS"}
+
+
+def iter_segments(path, chunk_size=CHUNK_SIZE):
+    """Le o arquivo em blocos e devolve um segmento HL7 por vez (CR, LF ou CRLF)."""
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            data = (tail + chunk).replace(b"\n", b"\r")
+            parts = data.split(b"\r")
+            # O ultimo pedaco pode ser um segmento incompleto: fica para o proximo bloco
+            tail = parts.pop()
+            for part in parts:
+                # Remove eventual moldura MLLP residual
+                part = part.strip(b"\x0b\x1c \t")
+                if part:
+                    yield part.decode(ENCODING, errors="replace")
+        tail = tail.strip(b"\x0b\x1c \t")
+        if tail:
+            yield tail.decode(ENCODING, errors="replace")
+
+
+def iter_messages(path, chunk_size=CHUNK_SIZE):
+    """Agrupa os segmentos em mensagens (cada MSH inicia uma nova mensagem)."""
+    message = []
+    for segment in iter_segments(path, chunk_size):
+        tag = segment[:3]
+        if tag == "MSH":
+            if message:
+                yield message
+            message = [segment]
+        elif tag in BATCH_ENVELOPE:
+            if message:
+                yield message
+            message = []
+        elif message:
+            message.append(segment)
+    if message:
+        yield message
+
+
+class MeasurementAlertWriter(GroupCommitWriter):
+    """
+    Commit em grupo de measurement com os alertas renais na MESMA transacao
+    (como o SpoolDrainer): alerta so existe para exame gravado. Linha recusada ou
+    lote nao gravado descarta o estado renal do paciente (reidratado do banco).
+    """
+    def __init__(self, db_path=DB_PATH, batch_size=BULK_BATCH_SIZE, flush_interval=5.0, verbose=False):
+        super().__init__(db_path, SQL_INSERT_MEASUREMENT, batch_size=batch_size,
+                         flush_interval=flush_interval, verbose=verbose)
+        self.rules = renal_rules.RenalRulesEngine(conn=self.conn)
+        self.alerts = 0
+
+    def _write(self, rows):
+        alerts = self.rules.process_measurements(rows)
+        try:
+            with self.conn:
+                self.conn.executemany(self.sql, rows)
+                if alerts:
+                    self.conn.executemany(renal_rules.SQL_INSERT_RENAL_ALERT, alerts)
+        except Exception:
+            self.rules.forget({r[0] for r in rows})
+            raise
+        self.alerts += len(alerts)
+
+
+def _field(fields, i):
+    return fields[i] if len(fields) > i else ""
+
+
+def parse_observations(segments):
+    """
+    Extrai TODOS os OBX de uma mensagem ORU como registros estruturados.
+    Parser por split (sem hl7.parse) para manter a vazao do backfill.
+    """
+    msh = segments[0].split("|")
+    pid = None
+    records = []
+    for segment in segments[1:]:
+        tag = segment[:3]
+        if tag == "PID" and pid is None:
+            pid = segment.split("|")
+        elif tag == "OBX":
+            obx = segment.split("|")
+            code = _field(obx, 3).split("^")
+            records.append({
+                "message_id": _field(msh, 9),
+                "set_id": _field(obx, 1),
+                "value_type": _field(obx, 2),
+                "exam_code": code[0],
+                "exam_name": code[1] if len(code) > 1 else "",
+                "value": _field(obx, 5),
+                "unit": _field(obx, 6).split("^")[0],
+                "flag": _field(obx, 8),
+                "status": _field(obx, 11),
+                # MSH-7 como fallback quando o OBX-14 nao vem preenchido
+                "obs_datetime": _field(obx, 14) or _field(msh, 6),
+                "source_system": _field(msh, 2),
+            })
+    if pid is None:
+        raise ValueError("Mensagem sem segmento PID")
+    patient_id = _field(pid, 3).split("^")[0]
+    for rec in records:
+        rec["patient_id"] = patient_id
+    return records
+
+
+def iter_obx_records(path, chunk_size=CHUNK_SIZE, errors=None):
+    """Gera um registro por OBX de cada mensagem do arquivo de lote."""
+    for segments in iter_messages(path, chunk_size):
+        try:
+            yield from parse_observations(segments)
+        except ValueError as e:
+            if errors is not None:
+                errors.append((segments[0][:80], str(e)))
+
+
+def ingest_batch_file(path, db_path=DB_PATH, batch_size=BULK_BATCH_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    Ingestao em streaming de arquivos FHS/BHS: todos os OBX de todas as mensagens
+    vao para o banco em commits grandes. Reporta mensagens/s e OBX/s.
+    """
+    if not os.path.exists(path):
+        print(f"[ERRO] Arquivo HL7 nao encontrado: {path}")
+        return None
+    if not os.path.exists(db_path):
+        print("[ERRO] Banco de dados nao encontrado.")
+        return None
+
+    print(f"[INFO] Ingestao em lote HL7: {path}")
+    # Mesmas regras renais da ingestao em tempo real (o lote chega em ordem cronologica),
+    # avaliadas so sobre as linhas efetivamente gravadas
+    writer = MeasurementAlertWriter(db_path, batch_size=batch_size)
+    ensure_schema(writer.conn)
+    renal_rules.ensure_schema(writer.conn)
+    n_msgs = n_obx = n_err = 0
+    t0 = time.perf_counter()
+    try:
+        for segments in iter_messages(path, chunk_size):
+            n_msgs += 1
+            try:
+                records = parse_observations(segments)
+            except ValueError:
+                n_err += 1
+                continue
+            for rec in records:
+                row = measurement_row(rec["patient_id"], rec["exam_code"], rec["value"], rec["unit"],
+                                      hl7_datetime(rec["obs_datetime"]), rec["source_system"])
+                writer.add(row)
+            n_obx += len(records)
+            if n_msgs % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - t0
+                print(f"      -> {n_msgs} mensagens | {n_obx} OBX | {n_msgs / elapsed:.0f} msg/s")
+    finally:
+        unsaved = writer.close()
+
+    elapsed = time.perf_counter() - t0
+    report = {
+        "messages": n_msgs,
+        "obx": n_obx,
+        "errors": n_err,
+        "seconds": round(elapsed, 3),
+        "messages_per_s": round(n_msgs / elapsed, 1) if elapsed > 0 else 0.0,
+        "obx_per_s": round(n_obx / elapsed, 1) if elapsed > 0 else 0.0,
+        "renal_alerts": writer.alerts,
+        "rows_rejected": writer.stats["rejected"],
+        "rows_unsaved": unsaved,
+    }
+    print(f"[OK] {n_msgs} mensagens / {n_obx} OBX em {elapsed:.2f}s "
+          f"({report['messages_per_s']:.0f} msg/s | {report['obx_per_s']:.0f} OBX/s) | {n_err} rejeitadas | "
+          f"{report['renal_alerts']} alertas renais")
+    if report["rows_rejected"] or unsaved:
+        print(f"[ERRO] {report['rows_rejected']} linhas recusadas pelo banco, {unsaved} nao gravadas.")
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python src/integration/adapters/hl7_batch_ingest.py <arquivo_lote.hl7> [db_path]")
+        sys.exit(1)
+    ingest_batch_file(sys.argv[1], *sys.argv[2:3])
@@ -2,73 +2,294 @@ import hl7
 import sqlite3
 import datetime
 import os
+import time
+import atexit
+import sys
+import threading
+
+try:
+    from .omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+    from .ingest_spool import SpooledIngest
+except ImportError:
+    # Execucao direta: python src/integration/adapters/hl7_tasy_mv.py
+    from omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+    from ingest_spool import SpooledIngest
+
+try:
+    from src.monitoring.metrics import record
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.monitoring.metrics import record
 
 # Caminho do banco
 DB_PATH = "database/oncopharm.db"
 
+# Commit em grupo: grava quando o lote enche OU quando o intervalo expira
+BATCH_SIZE = 200
+FLUSH_INTERVAL_S = 1.0
+# Linhas em memoria enquanto o banco estiver travado; acima disso add() falha (sem crescer sem limite)
+MAX_BUFFER_ROWS = 100_000
+# Tentativas finais no close() antes de reportar as linhas nao gravadas
+CLOSE_RETRIES = 3
+
+
+def hl7_datetime(ts):
+    """Converte um timestamp HL7 (AAAAMMDD[HHMM[SS]]) em ISO; usa agora se ausente."""
+    ts = (ts or "").strip()
+    if len(ts) >= 8 and ts[:8].isdigit():
+        hh, mm, ss = ts[8:10] or "00", ts[10:12] or "00", ts[12:14] or "00"
+        return f"{ts[:4]}-{ts[4:6]}-{ts[6:8]} {hh}:{mm}:{ss}"
+    return datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+class GroupCommitWriter:
+    """
+    Escritor SQLite com conexao persistente (modo WAL) e commit em grupo.
+    As linhas ficam em buffer e sao gravadas em uma unica transacao por lote,
+    evitando um fsync por mensagem e o erro "database is locked".
+    Banco travado (OperationalError): o lote volta ao buffer, limitado a
+    max_buffer. Linha invalida (restricao, tipo): o lote e regravado linha a
+    linha e so as culpadas vao para 'rejected'.
+    """
+    def __init__(self, db_path=DB_PATH, sql=SQL_INSERT_MEASUREMENT,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL_S, verbose=True,
+                 max_buffer=MAX_BUFFER_ROWS):
+        self.db_path = db_path
+        self.max_buffer = max_buffer
+        self.sql = sql
+        self.verbose = verbose
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+
+        self.stats = {"batches": 0, "rows": 0, "rejected": 0, "last_batch_ms": 0.0, "last_rows_per_s": 0.0}
+        # (linha, erro) recusadas pelo banco; linhas que nem o close() conseguiu gravar
+        self.rejected = []
+        self.unsaved = []
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = False
+
+        # Thread de flush por tempo (garante latencia maxima mesmo com pouco trafego)
+        self._thread = threading.Thread(target=self._flush_loop, name="group-commit", daemon=True)
+        self._thread.start()
+        # Flush garantido no encerramento do processo
+        atexit.register(self.close)
+
+    def add(self, row):
+        """Enfileira uma linha; grava imediatamente se o lote atingir o tamanho."""
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self._flush_locked()
+                if len(self._buffer) >= self.max_buffer:
+                    raise sqlite3.OperationalError(
+                        f"Commit em grupo: {len(self._buffer)} linhas pendentes e o banco nao aceita gravacao.")
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+
+        t0 = time.perf_counter()
+        try:
+            self._write(rows)
+        except sqlite3.OperationalError as e:
+            # Banco travado/ocupado: devolve o lote ao buffer para nova tentativa no proximo flush
+            self._buffer = rows + self._buffer
+            record("db_write", (time.perf_counter() - t0) * 1000, "error", len(rows), sink="group_commit")
+            print(f"[ERRO] Falha no commit em grupo ({len(rows)} linhas): {e}")
+            return 0
+        except sqlite3.Error as e:
+            record("db_write", (time.perf_counter() - t0) * 1000, "error", len(rows), sink="group_commit")
+            print(f"[AVISO] Lote recusado ({e}); regravando linha a linha.")
+            return self._isolate_locked(rows)
+        elapsed = time.perf_counter() - t0
+        record("db_write", elapsed * 1000, items=len(rows), sink="group_commit")
+
+        self.stats["batches"] += 1
+        self.stats["rows"] += len(rows)
+        self.stats["last_batch_ms"] = elapsed * 1000
+        self.stats["last_rows_per_s"] = len(rows) / elapsed if elapsed > 0 else float("inf")
+        if self.verbose:
+            print(f"[DB] Lote {self.stats['batches']}: {len(rows)} linhas em "
+                  f"{self.stats['last_batch_ms']:.1f} ms ({self.stats['last_rows_per_s']:.0f} linhas/s)")
+        return len(rows)
+
+    def _write(self, rows):
+        """Uma transacao com as linhas (subclasses gravam dados derivados na mesma transacao)."""
+        with self.conn:
+            self.conn.executemany(self.sql, rows)
+
+    def _isolate_locked(self, rows):
+        """Grava linha a linha: as validas entram, as recusadas vao para 'rejected'."""
+        saved = 0
+        for i, row in enumerate(rows):
+            try:
+                self._write([row])
+                saved += 1
+            except sqlite3.OperationalError as e:
+                # Banco travou no meio: o restante volta ao buffer
+                self._buffer = rows[i:] + self._buffer
+                print(f"[ERRO] Falha no commit em grupo ({len(rows) - i} linhas): {e}")
+                break
+            except sqlite3.Error as e:
+                self.rejected.append((row, str(e)))
+                self.stats["rejected"] += 1
+                print(f"[ERRO] Linha recusada pelo banco ({e}): {row}")
+        self.stats["rows"] += saved
+        return saved
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """
+        Grava o que restou (com algumas novas tentativas) e fecha a conexao.
+        Devolve quantas linhas nao puderam ser gravadas (ficam em 'unsaved').
+        """
+        if self._closed:
+            return len(self.unsaved)
+        self._closed = True
+        self._stop.set()
+        self._thread.join()
+        delay = self.flush_interval
+        for attempt in range(CLOSE_RETRIES):
+            self.flush()
+            if not self._buffer or attempt == CLOSE_RETRIES - 1:
+                break
+            time.sleep(delay)
+            delay *= 2
+        with self._lock:
+            self.unsaved, self._buffer = self._buffer, []
+        if self.unsaved:
+            print(f"[ERRO] Commit em grupo encerrado com {len(self.unsaved)} linhas NAO gravadas.")
+        self.conn.close()
+        atexit.unregister(self.close)
+        return len(self.unsaved)
+
+
 class HospitalInterfaceEngine:
-    def __init__(self, db_path=DB_PATH):
+    # Diretorio do spool ao lado do banco (database/spool/hl7)
+    SPOOL_NAME = "hl7"
+
+    def __init__(self, db_path=DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL_S,
+                 verbose=True):
         self.db_path = db_path
+        self.verbose = verbose
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Spool duravel + worker que grava no banco (measurement e alertas renais)
+        self.ingest = None
 
     def parse_oru_message(self, hl7_string):
         """
         Traduz mensagens HL7 (Tipo ORU^R01 - Resultado de Exame)
         """
+        t0 = time.perf_counter()
         try:
             h = hl7.parse(hl7_string)
-            
+
             # Extração de Dados
+            msh_segment = h.segment('MSH')
+            sistema_origem = str(msh_segment[3])
+            msg_ts = str(msh_segment[7])
+
             pid_segment = h.segment('PID')
-            patient_id_ext = str(pid_segment[3]) 
-            
-            obx_segment = h.segment('OBX')
-            exame_nome = str(obx_segment[3])
-            resultado_valor = str(obx_segment[5])
-            unidade = str(obx_segment[6])
-            
-            # CORRECAO: Print sem emojis
-            print(f"[HL7] Recebido do Tasy: Paciente {patient_id_ext} | {exame_nome}: {resultado_valor} {unidade}")
-            
-            # Persistir no OMOP (SQL)
-            self._save_to_sql(patient_id_ext, exame_nome, resultado_valor, unidade)
-            return {"status": "success", "patient": patient_id_ext, "result": resultado_valor}
+            patient_id_ext = str(pid_segment[3]).split('^')[0]
+
+            # Um ORU pode trazer um painel inteiro (creatinina, ureia, hemograma...)
+            try:
+                obx_segments = h.segments('OBX')
+            except KeyError:
+                # python-hl7 levanta KeyError quando o segmento nao existe
+                obx_segments = []
+            resultados, rows = [], []
+            for obx_segment in obx_segments:
+                exame_nome = str(obx_segment[3]).split('^')[0]
+                resultado_valor = str(obx_segment[5])
+                unidade = str(obx_segment[6]).split('^')[0]
+                obs_ts = str(obx_segment[14]) if len(obx_segment) > 14 else ""
+                obs_ts = obs_ts or msg_ts
+
+                # CORRECAO: Print sem emojis
+                if self.verbose:
+                    print(f"[HL7] Recebido do Tasy: Paciente {patient_id_ext} | {exame_nome}: {resultado_valor} {unidade}")
+
+                rows.append(measurement_row(patient_id_ext, exame_nome, resultado_valor, unidade,
+                                            hl7_datetime(obs_ts), sistema_origem))
+                resultados.append(resultado_valor)
+
+            if not resultados:
+                # ORU valido mas sem OBX: nada a gravar; resposta explicita (o MLLP devolve AR)
+                record("hl7_parse", (time.perf_counter() - t0) * 1000, "error", source=sistema_origem)
+                print(f"[AVISO] Mensagem ORU sem OBX (paciente {patient_id_ext}); nenhum resultado gravado.")
+                return {"status": "no_results", "patient": patient_id_ext, "observations": 0,
+                        "msg": "Mensagem ORU sem segmento OBX"}
+
+            # Persistir no OMOP (SQL): a mensagem inteira vira um registro do spool
+            self._save_to_sql(rows)
+
+            response = {"status": "success", "patient": patient_id_ext, "result": resultados[0],
+                        "observations": len(resultados)}
+            record("hl7_parse", (time.perf_counter() - t0) * 1000, items=len(resultados), source=sistema_origem)
+            return response
 
         except Exception as e:
+            record("hl7_parse", (time.perf_counter() - t0) * 1000, "error")
             # CORRECAO: Print sem emojis
             print(f"[ERRO] Falha ao processar HL7: {e}")
             return {"status": "error", "msg": str(e)}
 
-    def _save_to_sql(self, patient_id, concept, value, unit):
-        """Insere o dado externo na tabela 'episode' do nosso banco."""
-        if not os.path.exists(self.db_path):
-            print("[ERRO] Banco de dados nao encontrado.")
-            return
-
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Descrição amigável para o farmacêutico ver no dashboard
-        source_desc = f"{concept} = {value} {unit}"
-        
-        sql = """
-        INSERT INTO episode (
-            person_id, episode_concept_id, episode_start_date, 
-            episode_number, episode_source_value, 
-            episode_object_concept_id, episode_type_concept_id
-        ) VALUES (?, 32531, ?, 99, ?, 0, 0);
+    def _save_to_sql(self, rows):
         """
-        
-        try:
-            cursor.execute(sql, (patient_id, datetime.date.today(), source_desc))
-            conn.commit()
-            print("      -> Salvo no Prontuario SQL.")
-        except Exception as e:
-            print(f"      -> Erro de banco: {e}")
-        finally:
-            conn.close()
+        Grava as linhas de 'measurement' no spool em disco (append sequencial); o worker
+        de drenagem leva ao banco em lote. Banco travado ou ausente nao perde o resultado.
+        """
+        if not rows:
+            return None
+        if self.ingest is None:
+            self.ingest = SpooledIngest(self.db_path, self.SPOOL_NAME, self.batch_size,
+                                        self.flush_interval, self.verbose)
+        return self.ingest.append(rows)
+
+    def sync(self, timeout=None):
+        """Espera o fsync de tudo que ja foi aceito (antes de enviar o ACK)."""
+        if self.ingest is not None:
+            return self.ingest.sync(timeout=timeout)
+        return True
+
+    def flush(self):
+        """Espera o que ja foi aceito chegar ao banco."""
+        if self.ingest is not None:
+            self.ingest.flush()
+
+    def close(self):
+        """Drena o spool para o banco e encerra o worker (o que sobrar e retomado na proxima execucao)."""
+        if self.ingest is not None:
+            self.ingest.close()
+            self.ingest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 if __name__ == "__main__":
     # Teste rápido
     msg_teste = "MSH|^~\&|TASY|LAB|ONCO|CDSS|20251206||ORU^R01|123|P|2.3\rPID|1||99999^^^TASY||TESTE^INTEGRACAO\rOBR|1|||HEMOG^Hemoglobina\rOBX|1|NM|HEMOG||9.5|g/dL|||L||F"
-    engine = HospitalInterfaceEngine()
-    engine.parse_oru_message(msg_teste)
+    with HospitalInterfaceEngine() as engine:
+        engine.parse_oru_message(msg_teste)
@@ -0,0 +1,669 @@
+import asyncio
+import atexit
+import glob
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sem trava entre processos
+    fcntl = None
+
+try:
+    from .omop_measurement import SQL_INSERT_MEASUREMENT, ensure_schema
+except ImportError:
+    # Execucao direta: python src/integration/adapters/ingest_spool.py
+    from omop_measurement import SQL_INSERT_MEASUREMENT, ensure_schema
+
+try:
+    from src.monitoring.metrics import record
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.monitoring.metrics import record
+from src.models.toxicity import renal_rules
+
+# Spool duravel da ingestao: todo resultado aceito vai primeiro para um arquivo
+# append-only em disco; o banco e alimentado depois, por um worker, a partir dele.
+# Um processo por diretorio de spool (MLLP e API usam diretorios distintos).
+SPOOL_DIRNAME = "spool"
+SEGMENT_BYTES = 64 * 1024 * 1024
+SEGMENT_SUFFIX = ".spool"
+# Registro: tamanho do payload, CRC32 do payload, numero de sequencia + payload JSON
+HEADER = struct.Struct("<IIQ")
+# fsync em grupo: as escritas que chegam durante um fsync entram no proximo.
+# Um atraso > 0 junta mais escritas por fsync (disco lento) ao custo de latencia
+FSYNC_DELAY_S = 0.0
+
+# Worker de drenagem: lote por transacao, espera maxima e nova tentativa com espera exponencial
+DRAIN_BATCH = 200
+DRAIN_INTERVAL_S = 1.0
+RETRY_BASE_S = 0.5
+RETRY_MAX_S = 30.0
+CLOSE_TIMEOUT_S = 30.0
+# Marca d'agua (ultima sequencia gravada) em etl_checkpoint, na mesma transacao dos dados
+CHECKPOINT_SCHEMA_PATH = "database/schemas/02_etl_checkpoint.sql"
+CHECKPOINT_PREFIX = "spool:"
+SQL_UPSERT_CHECKPOINT = """
+INSERT INTO etl_checkpoint (source, rows_done, updated_at) VALUES (?, ?, ?)
+ON CONFLICT(source) DO UPDATE SET rows_done = excluded.rows_done, updated_at = excluded.updated_at;
+"""
+# Falhas transitorias (banco travado, ausente, sem espaco) tentam de novo sem limite.
+# As demais (restricao, esquema, registro invalido) isolam o registro e, apos
+# DEAD_LETTER_ATTEMPTS tentativas, o movem para o arquivo de rejeitados do spool.
+TRANSIENT_ERRORS = ("locked", "busy", "unable to open", "disk i/o", "disk is full", "readonly", "nao encontrado")
+DEAD_LETTER_ATTEMPTS = 5
+DEAD_LETTER_FILENAME = "dead_letter.jsonl"
+LOCK_FILENAME = ".lock"
+
+
+def spool_dir(db_path, name):
+    """Diretorio do spool ao lado do banco (ex.: database/spool/hl7)."""
+    return os.path.join(os.path.dirname(db_path) or ".", SPOOL_DIRNAME, name)
+
+
+def _segment_path(directory, first_seq):
+    return os.path.join(directory, f"{first_seq:020d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory):
+    """[(primeira sequencia, caminho)] em ordem."""
+    out = []
+    for path in glob.glob(os.path.join(directory, "*" + SEGMENT_SUFFIX)):
+        name = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+        if name.isdigit():
+            out.append((int(name), path))
+    return sorted(out)
+
+
+def read_records(f, limit=None):
+    """
+    Le registros a partir da posicao atual de f ate 'limit' (bytes) ou ate o fim.
+    Para no primeiro registro incompleto ou corrompido. Gera (seq, payload, offset final).
+    """
+    while True:
+        start = f.tell()
+        if limit is not None and start + HEADER.size > limit:
+            return
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            f.seek(start)
+            return
+        size, crc, seq = HEADER.unpack(header)
+        if limit is not None and start + HEADER.size + size > limit:
+            f.seek(start)
+            return
+        data = f.read(size)
+        if len(data) < size or zlib.crc32(data) != crc:
+            f.seek(start)
+            return
+        yield seq, json.loads(data), f.tell()
+
+
+def is_transient(error):
+    """Erro que passa sozinho (nova tentativa) x erro do proprio registro (rejeitado apos N tentativas)."""
+    if isinstance(error, OSError):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        msg = str(error).lower()
+        return any(marker in msg for marker in TRANSIENT_ERRORS)
+    return False
+
+
+def _lock_directory(directory):
+    """Trava exclusiva do diretorio: um unico processo escreve e drena cada spool."""
+    fd = os.open(os.path.join(directory, LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError(f"Spool {directory} em uso por outro processo.")
+    return fd
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _resolve(future, error=None):
+    if not future.done():
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+
+class IngestSpool:
+    """
+    Arquivo append-only em segmentos. append() so faz uma escrita sequencial
+    (sem fsync); uma thread faz o fsync em grupo e libera quem espera a
+    durabilidade (wait_durable / wait_durable_async). Na abertura, um registro
+    final incompleto (queda no meio da escrita) e descartado. O diretorio fica
+    travado (flock) enquanto o spool estiver aberto.
+    """
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, fsync_delay=FSYNC_DELAY_S):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock_fd = _lock_directory(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync_delay = fsync_delay
+        self._cond = threading.Condition()
+        # Serializa fsync e rotacao de segmento (o fsync roda fora de _cond)
+        self._io_lock = threading.Lock()
+        self._waiters = []
+        self._error = None
+        self._closed = False
+        self._generation = 0
+
+        self.last_seq = self._recover()
+        # Ultima sequencia encontrada na abertura (pendencias de uma execucao anterior)
+        self.recovered_seq = self.last_seq
+        self.durable_seq = self.last_seq
+        self.durable_pos = (self._path, self._size)
+
+        self._thread = threading.Thread(target=self._fsync_loop, name="spool-fsync", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _recover(self):
+        segments = list_segments(self.directory)
+        if not segments:
+            self._open_segment(1)
+            return 0
+        first_seq, path = segments[-1]
+        last_seq, end = first_seq - 1, 0
+        with open(path, "rb") as f:
+            for seq, _, offset in read_records(f):
+                last_seq, end = seq, offset
+        if end < os.path.getsize(path):
+            print(f"[AVISO] Spool {path}: registro final incompleto descartado "
+                  f"({os.path.getsize(path) - end} bytes).")
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        self._open_segment(first_seq, path)
+        return last_seq
+
+    def _open_segment(self, first_seq, path=None):
+        self._path = path or _segment_path(self.directory, first_seq)
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        self._size = os.fstat(self._fd).st_size
+
+    def _rotate_locked(self):
+        with self._io_lock:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._open_segment(self.last_seq + 1)
+            self._generation += 1
+        self._mark_durable_locked(self.last_seq, (self._path, 0))
+
+    def append(self, payload):
+        """Grava um registro (objeto JSON) e devolve sua sequencia; nao espera o fsync."""
+        data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise RuntimeError("Spool encerrado.")
+            if self._size >= self.segment_bytes:
+                self._rotate_locked()
+            seq = self.last_seq + 1
+            frame = HEADER.pack(len(data), zlib.crc32(data), seq) + data
+            _write_all(self._fd, frame)
+            self.last_seq = seq
+            self._size += len(frame)
+            self._cond.notify_all()
+        return seq
+
+    def wait_durable(self, seq=None, timeout=None):
+        """Bloqueia ate a sequencia (padrao: a ultima gravada) estar em disco."""
+        with self._cond:
+            seq = self.last_seq if seq is None else seq
+            done = self._cond.wait_for(lambda: self.durable_seq >= seq or self._error is not None, timeout)
+            if self._error is not None:
+                raise self._error
+        return done
+
+    async def wait_durable_async(self, seq):
+        """Versao asyncio de wait_durable: nao ocupa thread enquanto espera o fsync."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            if self.durable_seq >= seq:
+                return
+            self._waiters.append((seq, loop, future))
+        await future
+
+    def _mark_durable_locked(self, seq, pos):
+        if seq > self.durable_seq:
+            self.durable_seq, self.durable_pos = seq, pos
+        pending = []
+        for waiter in self._waiters:
+            if waiter[0] <= self.durable_seq:
+                waiter[1].call_soon_threadsafe(_resolve, waiter[2])
+            else:
+                pending.append(waiter)
+        self._waiters = pending
+        self._cond.notify_all()
+
+    def _fsync_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.durable_seq < self.last_seq or self._closed)
+                if self.durable_seq >= self.last_seq:
+                    return
+            if self.fsync_delay:
+                time.sleep(self.fsync_delay)
+            with self._cond:
+                seq, pos, generation = self.last_seq, (self._path, self._size), self._generation
+            try:
+                with self._io_lock:
+                    # Segmento trocado nesse meio tempo: a rotacao ja fez o fsync
+                    if generation == self._generation:
+                        os.fsync(self._fd)
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    for _, loop, future in self._waiters:
+                        loop.call_soon_threadsafe(_resolve, future, e)
+                    self._waiters = []
+                    self._cond.notify_all()
+                print(f"[ERRO] fsync do spool falhou: {e}")
+                return
+            with self._cond:
+                self._mark_durable_locked(seq, pos)
+
+    def release(self, seq):
+        """Apaga os segmentos inteiramente gravados no banco (todas as sequencias <= seq)."""
+        segments = list_segments(self.directory)
+        for (first, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= seq and path != self._path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Ainda aberto pelo leitor (Windows): sai na proxima liberacao
+                    pass
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._io_lock:
+            if self._error is None:
+                os.fsync(self._fd)
+            os.close(self._fd)
+        with self._cond:
+            self._mark_durable_locked(self.last_seq, (self._path, self._size))
+        os.close(self._lock_fd)
+        atexit.unregister(self.close)
+
+
+class SpoolDrainer:
+    """
+    Worker que esvazia o spool no banco. Cada lote grava measurement, os alertas
+    das regras renais e a marca d'agua (etl_checkpoint) na MESMA transacao: apos
+    uma queda, a drenagem recomeca do ultimo lote confirmado, sem perder nem
+    duplicar resultados. Banco travado/ausente = nova tentativa com espera exponencial;
+    registro que falha por si so (is_transient falso) e isolado e, apos
+    DEAD_LETTER_ATTEMPTS tentativas, vai para dead_letter.jsonl sem travar a fila.
+    """
+    def __init__(self, spool, db_path, name, batch_size=DRAIN_BATCH, interval=DRAIN_INTERVAL_S, verbose=True):
+        self.spool = spool
+        self.db_path = db_path
+        self.name = name
+        self.source = CHECKPOINT_PREFIX + name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.verbose = verbose
+        self.conn = None
+        self.rules = None
+        self.applied_seq = None
+        self.stats = {"batches": 0, "records": 0, "rows": 0, "alerts": 0, "retries": 0,
+                      "dead_letter": 0, "last_error": None}
+        self.dead_letter_path = os.path.join(spool.directory, DEAD_LETTER_FILENAME)
+        self._file = None
+        self._first_seq = None
+        self._pending = []
+        # Falha permanente num lote: reaplica um registro por vez ate esta sequencia
+        self._isolate_until = None
+        self._failures = {}
+        self._urgent = 0
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._loop, name=f"spool-drain-{name}", daemon=True)
+        self._thread.start()
+
+    # --- Banco ---
+    def _connect(self):
+        if not os.path.exists(self.db_path):
+            raise sqlite3.OperationalError(f"Banco de dados nao encontrado: {self.db_path}")
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            ensure_schema(conn)
+            renal_rules.ensure_schema(conn)
+            if os.path.exists(CHECKPOINT_SCHEMA_PATH):
+                with open(CHECKPOINT_SCHEMA_PATH, 'r', encoding='utf-8') as f:
+                    conn.executescript(f.read())
+            row = conn.execute("SELECT rows_done FROM etl_checkpoint WHERE source = ?", (self.source,)).fetchone()
+        except Exception:
+            conn.close()
+            raise
+        self.conn = conn
+        self.rules = renal_rules.RenalRulesEngine(conn=conn)
+        checkpoint = int(row[0]) if row else 0
+        if checkpoint > self.spool.durable_seq:
+            # Marca d'agua alem do fim do spool: o diretorio foi recriado e a numeracao recomecou
+            print(f"[AVISO] Spool {self.name}: marca d'agua {checkpoint} > ultima sequencia "
+                  f"{self.spool.durable_seq}; spool novo, drenando desde o inicio.")
+            checkpoint = 0
+        if self.applied_seq is None or checkpoint > self.applied_seq:
+            if self.applied_seq is None and checkpoint < self.spool.recovered_seq:
+                print(f"[INFO] Spool {self.name}: retomando apos a sequencia {checkpoint} "
+                      f"({self.spool.recovered_seq - checkpoint} registro(s) pendente(s)).")
+            with self._cond:
+                self.applied_seq = checkpoint
+                self._cond.notify_all()
+            self._pending = []
+            self._close_file()
+
+    def _disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = self.rules = None
+
+    # --- Leitura do spool (so a parte ja em disco) ---
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = self._first_seq = None
+
+    def _open_at(self, seq):
+        """Abre o segmento que contem 'seq' e pula os registros ja gravados."""
+        self._close_file()
+        segments = [s for s in list_segments(self.spool.directory) if s[0] <= seq] or \
+            list_segments(self.spool.directory)[:1]
+        if not segments:
+            return False
+        self._first_seq, path = segments[-1]
+        self._file = open(path, "rb")
+        while True:
+            offset = self._file.tell()
+            item = next(read_records(self._file), None)
+            if item is None or item[0] >= seq:
+                self._file.seek(offset)
+                return True
+
+    def _read(self, max_records):
+        with self.spool._cond:
+            durable_path, durable_offset = self.spool.durable_pos
+        out = []
+        if self._file is None and not self._open_at(self.applied_seq + 1):
+            return out
+        while len(out) < max_records:
+            path = self._file.name
+            limit = durable_offset if path == durable_path else None
+            for seq, payload, _ in read_records(self._file, limit):
+                out.append((seq, payload))
+                if len(out) >= max_records:
+                    return out
+            if path == durable_path:
+                break
+            # Fim de um segmento antigo: segue para o proximo
+            later = [s for s in list_segments(self.spool.directory) if s[0] > self._first_seq]
+            if not later:
+                break
+            self._close_file()
+            self._first_seq, next_path = later[0]
+            self._file = open(next_path, "rb")
+        return out
+
+    # --- Gravacao ---
+    def _checkpoint(self, seq):
+        self.conn.execute(SQL_UPSERT_CHECKPOINT,
+                          (self.source, seq, datetime.now().isoformat(sep=" ", timespec="seconds")))
+
+    def _advance(self, seq):
+        with self._cond:
+            self.applied_seq = seq
+            self._cond.notify_all()
+        self.spool.release(seq)
+
+    def _apply(self, records):
+        rows = []
+        last_seq = records[-1][0]
+        t0 = time.perf_counter()
+        try:
+            for _, payload in records:
+                if payload.get("t") == "measurement":
+                    rows.extend(tuple(r) for r in payload["rows"])
+                else:
+                    print(f"[AVISO] Spool {self.name}: registro de tipo desconhecido ignorado ({payload.get('t')}).")
+            alerts = self.rules.process_measurements(rows)
+            with self.conn:
+                self.conn.executemany(SQL_INSERT_MEASUREMENT, rows)
+                if alerts:
+                    self.conn.executemany(renal_rules.SQL_INSERT_RENAL_ALERT, alerts)
+                self._checkpoint(last_seq)
+        except Exception:
+            # O estado renal ja avancou com linhas que nao foram gravadas: reidrata na nova tentativa
+            self.rules.forget({r[0] for r in rows if r})
+            record("db_write", (time.perf_counter() - t0) * 1000, "error", len(rows), sink=f"spool_{self.name}")
+            raise
+        elapsed = time.perf_counter() - t0
+        record("db_write", elapsed * 1000, items=len(rows), sink=f"spool_{self.name}")
+
+        self.stats["batches"] += 1
+        self.stats["records"] += len(records)
+        self.stats["rows"] += len(rows)
+        self.stats["alerts"] += len(alerts)
+        if self.verbose:
+            for alert in alerts:
+                print(f"[ALERTA] Paciente {alert[0]}: KDIGO estagio {alert[2]} ({alert[3]}) | "
+                      f"creatinina {alert[4]} mg/dL | CrCl {alert[8] if alert[8] is not None else '-'}")
+            print(f"[DB] Lote {self.stats['batches']}: {len(rows)} linhas em {elapsed * 1000:.1f} ms "
+                  f"(spool {self.name} ate a sequencia {last_seq})")
+        self._advance(last_seq)
+
+    def _dead_letter(self, record_, error):
+        """Grava o registro rejeitado (com o erro) e avanca a marca d'agua por cima dele."""
+        seq, payload = record_
+        line = json.dumps({"seq": seq, "spool": self.name, "error": f"{type(error).__name__}: {error}",
+                           "at": datetime.now().isoformat(sep=" ", timespec="seconds"), "payload": payload},
+                          ensure_ascii=False, default=str)
+        # Antes da marca d'agua: uma queda entre os dois repete a linha, nunca perde o registro
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with self.conn:
+            self._checkpoint(seq)
+        self.stats["dead_letter"] += 1
+        print(f"[ERRO] Spool {self.name}: registro {seq} rejeitado apos {DEAD_LETTER_ATTEMPTS} tentativas "
+              f"({error}); movido para {self.dead_letter_path}.")
+        self._advance(seq)
+
+    def _on_permanent(self, batch, error):
+        """Falha do proprio dado: isola o registro culpado; True = tentar de novo ja."""
+        if len(batch) > 1:
+            self._isolate_until = batch[-1][0]
+            print(f"[AVISO] Spool {self.name}: lote rejeitado ({error}); reaplicando registro a registro.")
+            return True
+        seq = batch[0][0]
+        self._failures[seq] = self._failures.get(seq, 0) + 1
+        if self._failures[seq] < DEAD_LETTER_ATTEMPTS:
+            return False
+        self._dead_letter(batch[0], error)
+        self._failures.pop(seq, None)
+        self._pending = self._pending[1:]
+        return True
+
+    def _loop(self):
+        delay = RETRY_BASE_S
+        while True:
+            # Espera dado em disco; junta ate batch_size registros ou o intervalo expirar
+            with self.spool._cond:
+                self.spool._cond.wait_for(
+                    lambda: self._stop.is_set() or self._pending or self.applied_seq is None
+                    or self.spool.durable_seq > self.applied_seq, self.interval)
+                if not self._stop.is_set() and self.applied_seq is not None and not self._pending:
+                    self.spool._cond.wait_for(
+                        lambda: self._stop.is_set() or self._urgent
+                        or self.spool.durable_seq - self.applied_seq >= self.batch_size, self.interval)
+            batch = None
+            try:
+                if self.conn is None:
+                    self._connect()
+                if not self._pending:
+                    self._pending = self._read(self.batch_size)
+                if self._pending:
+                    batch = self._pending
+                    if self._isolate_until is not None and batch[0][0] <= self._isolate_until:
+                        batch = batch[:1]
+                    else:
+                        self._isolate_until = None
+                    self._apply(batch)
+                    self._pending = self._pending[len(batch):]
+                    self._failures.pop(batch[-1][0], None)
+                    delay = RETRY_BASE_S
+                    continue
+            except Exception as e:
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                if batch is not None and self.conn is not None and not is_transient(e):
+                    try:
+                        if self._on_permanent(batch, e):
+                            delay = RETRY_BASE_S
+                            continue
+                    except Exception as e2:
+                        e = e2
+                        self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                self.stats["retries"] += 1
+                print(f"[ERRO] Spool {self.name}: falha ao gravar no banco ({e}); nova tentativa em {delay:.1f}s.")
+                self._disconnect()
+                if self._stop.wait(delay):
+                    return
+                delay = min(delay * 2, RETRY_MAX_S)
+                continue
+            if self._stop.is_set():
+                return
+
+    def wait_applied(self, seq, timeout=None):
+        """Bloqueia ate a sequencia estar gravada no banco (sem esperar o lote encher)."""
+        with self.spool._cond:
+            self._urgent += 1
+            self.spool._cond.notify_all()
+        try:
+            with self._cond:
+                return self._cond.wait_for(lambda: self.applied_seq is not None and self.applied_seq >= seq,
+                                           timeout)
+        finally:
+            with self.spool._cond:
+                self._urgent -= 1
+
+    def close(self, timeout=CLOSE_TIMEOUT_S):
+        """Drena o que estiver em disco (ate 'timeout'); o resto fica no spool para a proxima execucao."""
+        target = self.spool.last_seq
+        self.spool.wait_durable(target, timeout)
+        if not self.wait_applied(target, timeout):
+            print(f"[AVISO] Spool {self.name}: {target - (self.applied_seq or 0)} registro(s) "
+                  f"ficam no spool para a proxima execucao.")
+        self._stop.set()
+        with self.spool._cond:
+            self.spool._cond.notify_all()
+        self._thread.join()
+        self._close_file()
+        self._disconnect()
+
+
+class SpooledIngest:
+    """
+    Caminho de ingestao duravel: append no spool (recibo rapido, independente do
+    banco) + worker que drena para o SQLite. Usado pelo MLLP/HL7 e pela API.
+    """
+    def __init__(self, db_path, name, batch_size=DRAIN_BATCH, flush_interval=DRAIN_INTERVAL_S,
+                 verbose=True, directory=None):
+        self.spool = IngestSpool(directory or spool_dir(db_path, name))
+        self.drainer = SpoolDrainer(self.spool, db_path, name, batch_size, flush_interval, verbose)
+        self._closed = False
+        atexit.register(self.close)
+
+    def append(self, rows):
+        """Linhas de measurement (measurement_row) -> sequencia no spool."""
+        return self.spool.append({"t": "measurement", "rows": rows})
+
+    def sync(self, seq=None, timeout=None):
+        return self.spool.wait_durable(seq, timeout)
+
+    async def sync_async(self, seq):
+        await self.spool.wait_durable_async(seq)
+
+    def flush(self, timeout=CLOSE_TIMEOUT_S):
+        """Espera o que ja foi aceito chegar ao banco."""
+        seq = self.spool.last_seq
+        self.spool.wait_durable(seq, timeout)
+        return self.drainer.wait_applied(seq, timeout)
+
+    def requeue_dead_letter(self):
+        """Devolve os registros rejeitados ao spool (apos corrigir a causa); devolve quantos."""
+        path = self.drainer.dead_letter_path
+        if not os.path.exists(path):
+            return 0
+        done = f"{path}.{datetime.now():%Y%m%d_%H%M%S}"
+        os.replace(path, done)
+        n = 0
+        with open(done, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self.spool.append(json.loads(line)["payload"])
+                    n += 1
+        return n
+
+    def backlog(self):
+        """Registros aceitos ainda nao gravados no banco."""
+        return self.spool.last_seq - (self.drainer.applied_seq or 0)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.drainer.close()
+        self.spool.close()
+        atexit.unregister(self.close)
+
+
+if __name__ == "__main__":
+    # Uso: python src/integration/adapters/ingest_spool.py [db_path] [nome] [--requeue]
+    # Drena um spool deixado por um processo encerrado (ex.: banco indisponivel na hora);
+    # --requeue devolve antes os registros rejeitados (dead_letter.jsonl) ao spool
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    db_path = args[0] if args else "database/oncopharm.db"
+    names = args[1:2] or [os.path.basename(d) for d in glob.glob(spool_dir(db_path, "*"))]
+    for name in names:
+        try:
+            ingest = SpooledIngest(db_path, name, verbose=False)
+        except RuntimeError as e:
+            print(f"[AVISO] {e}")
+            continue
+        if "--requeue" in sys.argv:
+            print(f"[INFO] Spool {name}: {ingest.requeue_dead_letter()} registro(s) rejeitado(s) devolvido(s).")
+        print(f"[INFO] Spool {name}: {ingest.backlog()} registro(s) pendente(s).")
+        ingest.close()
+        print(f"[OK] Spool {name}: {ingest.drainer.stats['rows']} linhas gravadas, "
+              f"{ingest.drainer.stats['alerts']} alertas renais, "
+              f"{ingest.drainer.stats['dead_letter']} rejeitado(s).")
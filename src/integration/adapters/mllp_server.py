@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .hl7_tasy_mv import HospitalInterfaceEngine
+except ImportError:
+    # Execucao direta: python src/integration/adapters/mllp_server.py
+    from hl7_tasy_mv import HospitalInterfaceEngine
+
+# Listener MLLP (Minimal Lower Layer Protocol) para feeds HL7 v2 do Tasy/MV
+MLLP_HOST = "0.0.0.0"
+MLLP_PORT = 2575
+ENCODING = "utf-8"
+
+# Moldura MLLP: <VT> mensagem <FS><CR>
+START_BLOCK = b"\x0b"
+END_BLOCK = b"\x1c\x0d"
+
+MAX_MESSAGE_BYTES = 1024 * 1024
+IDLE_TIMEOUT_S = 300
+# Fila entre as conexoes e a persistencia: quando enche, as conexoes param de ler (backpressure)
+QUEUE_SIZE = 1000
+# Mensagens processadas por ida ao executor de persistencia
+PERSIST_BATCH = 100
+# Espera maxima pelo fsync do spool antes de responder AE (o remetente reenvia)
+SYNC_TIMEOUT_S = 10
+
+
+def frame(message):
+    """Empacota uma mensagem HL7 na moldura MLLP."""
+    return START_BLOCK + message.encode(ENCODING) + END_BLOCK
+
+
+def unframe(data):
+    """Remove a moldura MLLP e devolve a mensagem HL7 como texto."""
+    start = data.find(START_BLOCK)
+    if start >= 0:
+        data = data[start + 1:]
+    if data.endswith(END_BLOCK):
+        data = data[:-len(END_BLOCK)]
+    return data.decode(ENCODING, errors="replace")
+
+
+def build_ack(hl7_string, ack_code="AA", text=""):
+    """
+    Monta o ACK HL7 (MSA) para a mensagem recebida.
+    AA = aceita, AE = erro de processamento, AR = rejeitada.
+    """
+    msh = hl7_string.split("\r", 1)[0].split("|")
+    if msh[0].strip() != "MSH":
+        msh = []
+
+    def field(i, default=""):
+        return msh[i] if len(msh) > i else default
+
+    control_id = field(9)
+    ts = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    ack = (f"MSH|^~\\&|{field(4, 'ONCO')}|{field(5, 'CDSS')}|{field(2)}|{field(3)}|{ts}||"
+           f"ACK^R01|ACK{control_id}|{field(10, 'P')}|{field(11, '2.3')}\r"
+           f"MSA|{ack_code}|{control_id}")
+    if text:
+        ack += f"|{text.replace('|', ' ').replace(chr(13), ' ')}"
+    return ack
+
+
+class MLLPServer:
+    """
+    Servidor asyncio MLLP: muitas conexoes simultaneas, ACK/NAK por mensagem.
+    Cada conexao tem sua propria task; a persistencia roda em uma thread
+    dedicada alimentada por uma fila limitada, de modo que um cliente lento
+    nao trava os demais e a leitura pausa quando o banco fica para tras.
+    """
+    def __init__(self, engine=None, host=MLLP_HOST, port=MLLP_PORT, queue_size=QUEUE_SIZE):
+        self.engine = engine or HospitalInterfaceEngine(verbose=False)
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.stats = {"connections": 0, "active": 0, "messages": 0, "acks": 0, "naks": 0}
+        self.server = None
+        self._queue = None
+        self._worker = None
+        self._executor = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mllp-persist")
+        self._worker = asyncio.create_task(self._persist_worker())
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                 limit=MAX_MESSAGE_BYTES)
+        # Porta real (util quando port=0 em testes locais)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"[INFO] Listener MLLP ativo em {self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._queue is not None:
+            await self._queue.join()
+        if self._worker is not None:
+            self._worker.cancel()
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self.engine.close)
+            self._executor.shutdown()
+        print(f"[INFO] Listener MLLP encerrado. {self.stats}")
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self.stats["connections"] += 1
+        self.stats["active"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(reader.readuntil(END_BLOCK), IDLE_TIMEOUT_S)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    # Mensagem maior que o limite: rejeita e encerra a conexao
+                    writer.write(frame(build_ack("", "AR", "Mensagem excede o tamanho maximo")))
+                    await writer.drain()
+                    self.stats["naks"] += 1
+                    break
+
+                message = unframe(data)
+                done = loop.create_future()
+                # Bloqueia apenas esta conexao se a persistencia estiver atrasada
+                await self._queue.put((message, done))
+                ack = await done
+
+                writer.write(frame(ack))
+                await writer.drain()
+        except Exception as e:
+            print(f"[ERRO] Conexao MLLP {peer}: {e}")
+        finally:
+            self.stats["active"] -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _persist_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            while len(items) < PERSIST_BATCH and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            try:
+                acks = await loop.run_in_executor(self._executor, self._process_batch,
+                                                  [m for m, _ in items])
+            except Exception as e:
+                acks = [build_ack(m, "AE", str(e)) for m, _ in items]
+            for (_, done), ack in zip(items, acks):
+                if not done.done():
+                    done.set_result(ack)
+                self._queue.task_done()
+
+    def _process_batch(self, messages):
+        """Roda na thread de persistencia: parse + append no spool duravel (fsync em grupo)."""
+        codes = []
+        for message in messages:
+            self.stats["messages"] += 1
+            if not message.startswith("MSH"):
+                codes.append(("AR", "Segmento MSH ausente"))
+                continue
+            result = self.engine.parse_oru_message(message)
+            if result.get("status") == "success":
+                codes.append(("AA", ""))
+            elif result.get("status") == "no_results":
+                # Reenviar nao adianta: rejeitada, nao erro de processamento
+                codes.append(("AR", result.get("msg", "")))
+            else:
+                codes.append(("AE", result.get("msg", "")))
+        # ACK so depois do fsync do spool: um fsync para o lote inteiro.
+        # Sem fsync confirmado (erro ou tempo esgotado) nada e aceito: AE e o remetente reenvia
+        try:
+            durable = self.engine.sync(timeout=SYNC_TIMEOUT_S)
+            erro = "Tempo esgotado aguardando gravacao em disco"
+        except Exception as e:
+            durable, erro = False, f"Falha ao gravar em disco: {e}"
+        if not durable:
+            print(f"[ERRO] MLLP: lote de {len(messages)} mensagem(ns) sem fsync confirmado ({erro}).")
+            codes = [("AE", erro) if code == "AA" else (code, text) for code, text in codes]
+        acks = []
+        for message, (code, text) in zip(messages, codes):
+            self.stats["acks" if code == "AA" else "naks"] += 1
+            acks.append(build_ack(message, code, text))
+        return acks
+
+
+async def send_mllp(messages, host="127.0.0.1", port=MLLP_PORT):
+    """
+    Cliente MLLP simples (teste local): envia as mensagens em sequencia
+    numa unica conexao e devolve os ACKs recebidos.
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_MESSAGE_BYTES)
+    acks = []
+    try:
+        for message in messages:
+            writer.write(frame(message))
+            await writer.drain()
+            acks.append(unframe(await reader.readuntil(END_BLOCK)))
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return acks
+
+
+if __name__ == "__main__":
+    # Teste local: em outro terminal,
+    #   python -c "import asyncio; from mllp_server import send_mllp; print(asyncio.run(send_mllp([...])))"
+    server = MLLPServer()
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        server.engine.close()
+        print("[INFO] Listener MLLP encerrado.")
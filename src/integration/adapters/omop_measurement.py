@@ -0,0 +1,136 @@
+import datetime
+import os
+import re
+import sqlite3
+import sys
+
+DB_PATH = "database/oncopharm.db"
+SCHEMA_PATH = "database/schemas/03_omop_measurement.sql"
+
+# Tipo "EHR" (OMOP Type Concept)
+EHR_TYPE_CONCEPT_ID = 32817
+
+# Codigos de exame da origem -> conceitos OMOP (LOINC padrao). Desconhecidos = 0
+CONCEPT_MAP = {
+    "CREAT": 3016723,   # Creatinine [Mass/volume] in Serum or Plasma
+    "UREA":  3013682,   # Urea nitrogen [Mass/volume] in Serum or Plasma
+    "HEMOG": 3000963,   # Hemoglobin [Mass/volume] in Blood
+    "HB":    3000963,
+    "PLT":   3024929,   # Platelets [#/volume] in Blood
+    "K":     3023103,   # Potassium [Moles/volume] in Serum or Plasma
+}
+
+# Formato antigo em episode.episode_source_value:
+#   "CREAT = 1.9 mg/dL" (HL7)  |  "API (SAP): CREAT = 1.4 mg/dL" (REST)
+LEGACY_RESULT_RE = re.compile(r"^(?:API \((?P<src>[^)]*)\): )?(?P<code>[^=\s]+) = (?P<value>\S+)\s*(?P<unit>.*)$")
+# episode_number usado pelos adaptadores para marcar resultados de exame
+LEGACY_RESULT_EPISODE_NUMBER = 99
+MIGRATION_CHUNK = 50_000
+
+SQL_INSERT_MEASUREMENT = f"""
+INSERT INTO measurement (
+    person_id, measurement_concept_id, measurement_date, measurement_datetime,
+    measurement_type_concept_id, value_as_number, value_source_value,
+    unit_source_value, measurement_source_value, source_system
+) VALUES (?, ?, ?, ?, {EHR_TYPE_CONCEPT_ID}, ?, ?, ?, ?, ?);
+"""
+
+
+def ensure_schema(conn, schema_path=SCHEMA_PATH):
+    """Cria a tabela measurement se ainda nao existir (idempotente)."""
+    if os.path.exists(schema_path):
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+
+
+def to_number(value):
+    try:
+        return float(str(value).strip().replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def measurement_row(patient_id, code, value, unit, obs_datetime=None, source_system=None):
+    """Linha para SQL_INSERT_MEASUREMENT (obs_datetime em ISO 'AAAA-MM-DD HH:MM:SS')."""
+    if not obs_datetime:
+        obs_datetime = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+    return (
+        patient_id, CONCEPT_MAP.get(code.upper(), 0), obs_datetime[:10], obs_datetime,
+        to_number(value), str(value), unit, code, source_system,
+    )
+
+
+def latest_value(conn, person_id, code):
+    """Ultimo resultado do exame: (valor, unidade, data/hora) ou None."""
+    return conn.execute(
+        """SELECT value_as_number, unit_source_value, measurement_datetime
+           FROM measurement
+           WHERE person_id = ? AND measurement_source_value = ?
+           ORDER BY measurement_datetime DESC LIMIT 1""",
+        (person_id, code),
+    ).fetchone()
+
+
+def trend(conn, person_id, code, days=30, until=None):
+    """Serie (data/hora, valor) dos ultimos N dias, em ordem cronologica."""
+    until = until or datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+    since = (datetime.datetime.fromisoformat(until) - datetime.timedelta(days=days)).isoformat(sep=" ")
+    return conn.execute(
+        """SELECT measurement_datetime, value_as_number
+           FROM measurement
+           WHERE person_id = ? AND measurement_source_value = ?
+             AND measurement_datetime BETWEEN ? AND ?
+           ORDER BY measurement_datetime""",
+        (person_id, code, since, until),
+    ).fetchall()
+
+
+def migrate_episode_results(conn, chunk=MIGRATION_CHUNK):
+    """
+    Move os resultados de exame gravados como texto em episode_source_value
+    para a tabela measurement. Cada bloco e uma transacao (insere + remove),
+    entao a migracao pode ser interrompida e executada de novo com seguranca.
+    """
+    ensure_schema(conn)
+    moved = skipped = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            """SELECT episode_id, person_id, episode_start_date, episode_source_value
+               FROM episode
+               WHERE episode_number = ? AND episode_id > ?
+               ORDER BY episode_id LIMIT ?""",
+            (LEGACY_RESULT_EPISODE_NUMBER, last_id, chunk),
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        batch, ids = [], []
+        for episode_id, person_id, start_date, source_value in rows:
+            m = LEGACY_RESULT_RE.match(source_value or "")
+            if m is None:
+                skipped += 1
+                continue
+            batch.append(measurement_row(person_id, m["code"], m["value"], m["unit"].strip(),
+                                         f"{str(start_date)[:10]} 00:00:00", m["src"] or "HL7"))
+            ids.append((episode_id,))
+
+        with conn:
+            conn.executemany(SQL_INSERT_MEASUREMENT, batch)
+            conn.executemany("DELETE FROM episode WHERE episode_id = ?", ids)
+        moved += len(batch)
+
+    print(f"[OK] Migracao episode -> measurement: {moved} resultados movidos, {skipped} ignorados.")
+    return moved
+
+
+if __name__ == "__main__":
+    # Uso: python src/integration/adapters/omop_measurement.py [db_path]
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    if not os.path.exists(db_path):
+        print("[ERRO] Banco de dados nao encontrado.")
+        sys.exit(1)
+    conn = sqlite3.connect(db_path)
+    migrate_episode_results(conn)
+    conn.close()
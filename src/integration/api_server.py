@@ -1,9 +1,52 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-import sqlite3
+from contextlib import asynccontextmanager
+from typing import List
+import asyncio
 import datetime
+import threading
+import time
 
-app = FastAPI(title="OncoPharm Integration Hub", version="1.0")
+from .adapters.ingest_spool import SpooledIngest
+from .adapters.omop_measurement import measurement_row
+from ..monitoring import metrics
+
+DB_PATH = "database/oncopharm.db"
+
+# Recibo = append no spool em disco + fsync em grupo; o banco e alimentado por um worker
+# (database/spool/api), entao a latencia nao depende de trava ou indisponibilidade do SQLite
+SPOOL_NAME = "api"
+DRAIN_BATCH = 500
+DRAIN_INTERVAL_S = 0.5
+MAX_BATCH_SIZE = 5000
+
+
+_ingest = None
+_ingest_lock = threading.Lock()
+
+
+def get_ingest():
+    global _ingest
+    with _ingest_lock:
+        if _ingest is None:
+            _ingest = SpooledIngest(DB_PATH, SPOOL_NAME, DRAIN_BATCH, DRAIN_INTERVAL_S, verbose=False)
+    return _ingest
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _ingest
+    # Log de tempos em logs/timings_api_server.jsonl
+    metrics.configure("api_server")
+    yield
+    if _ingest is not None:
+        # Drena o spool antes de sair (o que sobrar e retomado na proxima subida)
+        await asyncio.get_running_loop().run_in_executor(None, _ingest.close)
+        _ingest = None
+
+
+app = FastAPI(title="OncoPharm Integration Hub", version="1.0", lifespan=lifespan)
 
 # Modelo de Dados (JSON esperado)
 class LabResult(BaseModel):
@@ -13,36 +56,79 @@ class LabResult(BaseModel):
     unit: str
     source_system: str  # Ex: "SAP", "Totvs", "AppTriagem"
 
-DB_PATH = "database/oncopharm.db"
+
+async def _spool_results(results):
+    """Grava os resultados no spool e espera o fsync (em grupo com as demais requisicoes)."""
+    now = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+    # Formata para a tabela OMOP measurement (valor numérico + unidade)
+    rows = [
+        measurement_row(r.patient_id, r.exam_code, r.value, r.unit, now, r.source_system)
+        for r in results
+    ]
+    loop = asyncio.get_running_loop()
+    # Criacao do spool (trava do diretorio + recuperacao) e append (write, fsync na
+    # rotacao de segmento) sao bloqueantes: rodam fora do event loop
+    ingest = _ingest or await loop.run_in_executor(None, get_ingest)
+    with metrics.track("spool_write", items=len(rows), sink="api"):
+        seq = await loop.run_in_executor(None, ingest.append, rows)
+        await ingest.sync_async(seq)
+    return len(rows)
+
 
 @app.post("/api/v1/integrate/lab-result")
 async def receive_lab_result(data: LabResult):
     """
     Endpoint genérico para receber exames de qualquer sistema externo.
     """
+    t0 = time.perf_counter()
+    status = "ok"
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Formata para o padrão OMOP da nossa tabela episode
-        source_desc = f"API ({data.source_system}): {data.exam_code} = {data.value} {data.unit}"
-        
-        sql = """
-        INSERT INTO episode (
-            person_id, episode_concept_id, episode_start_date, 
-            episode_number, episode_source_value, 
-            episode_object_concept_id, episode_type_concept_id
-        ) VALUES (?, 32531, ?, 99, ?, 0, 0);
-        """
-        
-        cursor.execute(sql, (data.patient_id, datetime.date.today(), source_desc))
-        conn.commit()
-        conn.close()
-        
+        await _spool_results([data])
         return {"status": "received", "details": f"Dados de {data.source_system} integrados."}
-        
+
+    except Exception as e:
+        status = "error"
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        metrics.record("api_request", ms, status, 1, route="lab-result")
+
+
+@app.post("/api/v1/integrate/lab-results")
+async def receive_lab_results(data: List[LabResult]):
+    """
+    Endpoint em lote: vários exames por requisição, um único registro no spool.
+    """
+    if len(data) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Lote excede {MAX_BATCH_SIZE} resultados.")
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        n = await _spool_results(data) if data else 0
+        return {"status": "received", "count": n}
+
     except Exception as e:
+        status = "error"
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        metrics.record("api_request", ms, status, len(data), route="lab-results")
+
+
+@app.get("/api/v1/integrate/stats")
+def ingest_stats():
+    """Contadores e latência p50/p95/p99 (ms) por estágio e rota (registro de metrics) e fila do spool."""
+    out = metrics.snapshot()
+    if _ingest is not None:
+        out["spool"] = {"backlog": _ingest.backlog(), **_ingest.drainer.stats}
+    return out
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Contadores e histogramas de latencia por estagio (formato Prometheus)."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/")
 def health_check():
@@ -1,7 +1,42 @@
-from adapters.hl7_tasy_mv import HospitalInterfaceEngine
+try:
+    from .adapters.hl7_tasy_mv import HospitalInterfaceEngine
+    from .adapters.mllp_server import MLLP_PORT, MAX_MESSAGE_BYTES, END_BLOCK, frame, unframe
+except ImportError:
+    # Execucao direta: python src/integration/simulate_tasy.py
+    from adapters.hl7_tasy_mv import HospitalInterfaceEngine
+    from adapters.mllp_server import MLLP_PORT, MAX_MESSAGE_BYTES, END_BLOCK, frame, unframe
+import asyncio
+import datetime
+import sys
 import time
 import random
 
+import numpy as np
+
+# --- Gerador de carga (--load): alvo, taxa e concorrencia configuraveis ---
+API_URL = "http://127.0.0.1:8000/api/v1/integrate/lab-result"
+LOAD_RATE = 100          # mensagens/s alvo
+LOAD_CONCURRENCY = 8     # conexoes MLLP / requisicoes HTTP simultaneas
+LOAD_DURATION_S = 10
+LOAD_PATIENTS = 1000
+FIRST_PATIENT_ID = 1001
+# Tempo maximo para esvaziar a fila depois do fim da janela de envio
+DRAIN_TIMEOUT_S = 30
+REQUEST_TIMEOUT_S = 10
+# Degrau considerado saturado: vazao < 95% do alvo ou p99 acima do limite
+SATURATION_RATIO = 0.95
+SATURATION_P99_MS = 1000
+
+# Exames sorteados: codigo -> (nome, unidade, faixa, limite superior normal, peso no mix)
+EXAM_MIX = {
+    "CREAT": ("Creatinina Serica", "mg/dL", (0.6, 3.5), 1.5, 0.5),
+    "UREA":  ("Ureia Serica", "mg/dL", (15.0, 120.0), 45.0, 0.15),
+    "HB":    ("Hemoglobina", "g/dL", (7.0, 16.0), 16.0, 0.15),
+    "PLT":   ("Plaquetas", "10^3/uL", (20.0, 450.0), 400.0, 0.1),
+    "K":     ("Potassio Serico", "mmol/L", (3.0, 6.5), 5.1, 0.1),
+}
+
+
 def run_simulation():
     engine = HospitalInterfaceEngine()
     
@@ -32,5 +67,246 @@ def run_simulation():
         
         time.sleep(5)
 
+
+def parse_mix(spec):
+    """'CREAT:0.7,K:0.3' -> pesos por exame (apenas codigos conhecidos)."""
+    mix = {}
+    for item in spec.split(","):
+        code, _, weight = item.partition(":")
+        code = code.strip().upper()
+        if code not in EXAM_MIX:
+            raise ValueError(f"Exame desconhecido no mix: {code} (opcoes: {', '.join(EXAM_MIX)})")
+        mix[code] = float(weight or 1)
+    return mix
+
+
+class LabResultFactory:
+    """Resultados sinteticos com populacao e mix de exames configuraveis (semente fixa)."""
+    def __init__(self, n_patients=LOAD_PATIENTS, mix=None, seed=42):
+        mix = mix or {code: spec[4] for code, spec in EXAM_MIX.items()}
+        self.codes = list(mix)
+        self.weights = [mix[c] for c in self.codes]
+        self.patients = range(FIRST_PATIENT_ID, FIRST_PATIENT_ID + n_patients)
+        self.rng = random.Random(seed)
+        self.seq = 0
+
+    def next(self):
+        self.seq += 1
+        code = self.rng.choices(self.codes, self.weights)[0]
+        name, unit, (low, high), upper, _ = EXAM_MIX[code]
+        value = round(self.rng.uniform(low, high), 2)
+        return {"seq": self.seq, "patient_id": self.rng.choice(self.patients), "exam_code": code,
+                "exam_name": name, "value": value, "unit": unit, "flag": "H" if value > upper else "N"}
+
+    @staticmethod
+    def to_hl7(r):
+        ts = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        return (f"MSH|^~\\&|TASY|LAB|ONCO|CDSS|{ts}||ORU^R01|LOAD{r['seq']:09d}|P|2.3\r"
+                f"PID|1||{r['patient_id']}||PACIENTE^SIMULADO\r"
+                f"OBR|1|||{r['exam_code']}^{r['exam_name']}\r"
+                f"OBX|1|NM|{r['exam_code']}^{r['exam_name']}||{r['value']}|{r['unit']}||{r['flag']}|||F|||{ts}")
+
+    @staticmethod
+    def to_json(r):
+        return {"patient_id": r["patient_id"], "exam_code": r["exam_code"], "value": r["value"],
+                "unit": r["unit"], "source_system": "LOADGEN"}
+
+
+class _MLLPSender:
+    """Uma conexao MLLP persistente por worker; reconecta apos erro de rede."""
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def send(self, result):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port,
+                                                                     limit=MAX_MESSAGE_BYTES)
+        try:
+            self.writer.write(frame(LabResultFactory.to_hl7(result)))
+            await self.writer.drain()
+            ack = unframe(await asyncio.wait_for(self.reader.readuntil(END_BLOCK), REQUEST_TIMEOUT_S))
+        except Exception:
+            await self.close()
+            raise
+        # MSA|AA|<controle>: qualquer outro codigo conta como erro
+        msa = next((s for s in ack.split("\r") if s.startswith("MSA")), "").split("|")
+        return len(msa) > 1 and msa[1] == "AA"
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+
+class _RESTSender:
+    def __init__(self, client, url):
+        self.client, self.url = client, url
+
+    async def send(self, result):
+        response = await self.client.post(self.url, json=LabResultFactory.to_json(result))
+        return response.status_code == 200
+
+    async def close(self):
+        pass
+
+
+async def run_load(target="mllp", rate=LOAD_RATE, concurrency=LOAD_CONCURRENCY, duration=LOAD_DURATION_S,
+                   n_patients=LOAD_PATIENTS, mix=None, host="127.0.0.1", port=MLLP_PORT, url=API_URL, seed=42):
+    """
+    Carga em malha aberta: as mensagens sao agendadas a 'rate'/s independentemente das
+    respostas e consumidas por 'concurrency' workers. A latencia ponta a ponta conta a
+    partir do horario agendado (inclui a espera na fila quando o servidor nao acompanha)
+    ate o ACK HL7 ou a resposta HTTP, ambos enviados apos o fsync do spool duravel
+    (a gravacao no SQLite acontece depois, no worker de drenagem).
+    """
+    factory = LabResultFactory(n_patients, mix, seed)
+    queue = asyncio.Queue()
+    latencies, service = [], []
+    counts = {"sent": 0, "ok": 0, "errors": 0, "exceptions": 0}
+    client = None
+    if target == "rest":
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("httpx nao instalado. Rode: pip install httpx")
+        client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S,
+                                   limits=httpx.Limits(max_connections=concurrency))
+
+    def make_sender():
+        return _RESTSender(client, url) if target == "rest" else _MLLPSender(host, port)
+
+    n_total = int(rate * duration)
+
+    async def producer(t0):
+        for i in range(n_total):
+            due = t0 + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait((due, factory.next()))
+        for _ in range(concurrency):
+            queue.put_nowait(None)
+
+    async def worker():
+        sender = make_sender()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                due, result = item
+                start = time.perf_counter()
+                counts["sent"] += 1
+                try:
+                    ok = await sender.send(result)
+                except Exception:
+                    ok = False
+                    counts["exceptions"] += 1
+                end = time.perf_counter()
+                if ok:
+                    counts["ok"] += 1
+                    latencies.append((end - due) * 1000)
+                    service.append((end - start) * 1000)
+                else:
+                    counts["errors"] += 1
+        finally:
+            await sender.close()
+
+    t0 = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await producer(t0)
+        _, pending = await asyncio.wait(workers, timeout=DRAIN_TIMEOUT_S)
+        for task in pending:
+            task.cancel()
+    finally:
+        if client is not None:
+            await client.aclose()
+    elapsed = time.perf_counter() - t0
+
+    def pct(values, q):
+        return round(float(np.percentile(values, q)), 2) if values else None
+
+    return {
+        "target": target,
+        "rate_alvo": rate,
+        "concurrency": concurrency,
+        "sent": counts["sent"],
+        "ok": counts["ok"],
+        "errors": counts["errors"],
+        "exceptions": counts["exceptions"],
+        # Agendadas e nunca enviadas (fila nao esvaziou a tempo; sem as sentinelas de parada)
+        "backlog": n_total - counts["sent"],
+        "elapsed_s": round(elapsed, 2),
+        "throughput": round(counts["ok"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": pct(latencies, 50),
+        "p95_ms": pct(latencies, 95),
+        "p99_ms": pct(latencies, 99),
+        "max_ms": round(max(latencies), 2) if latencies else None,
+        "service_p50_ms": pct(service, 50),
+    }
+
+
+def is_saturated(report):
+    return (report["throughput"] < SATURATION_RATIO * report["rate_alvo"] or report["errors"] > 0
+            or report["p99_ms"] is None or report["p99_ms"] > SATURATION_P99_MS)
+
+
+def print_load_report(report):
+    status = "SATURADO" if is_saturated(report) else "ok"
+    print(f"[{'AVISO' if status == 'SATURADO' else 'OK'}] {report['target'].upper()} alvo {report['rate_alvo']} msg/s "
+          f"x {report['concurrency']} conexoes: {report['throughput']} msg/s | "
+          f"p50 {report['p50_ms']} ms | p95 {report['p95_ms']} ms | p99 {report['p99_ms']} ms | "
+          f"max {report['max_ms']} ms | erros {report['errors']} ({report['exceptions']} de rede) | "
+          f"backlog {report['backlog']} | {status}")
+
+
+def run_sweep(rates, **kwargs):
+    """Degraus crescentes de taxa ate saturar: devolve os relatorios e a ultima taxa sustentada."""
+    reports, sustained = [], None
+    for rate in rates:
+        report = asyncio.run(run_load(rate=rate, **kwargs))
+        print_load_report(report)
+        reports.append(report)
+        if is_saturated(report):
+            break
+        sustained = rate
+    if sustained is None:
+        print(f"[AVISO] Saturado ja no primeiro degrau ({rates[0]} msg/s).")
+    else:
+        print(f"[INFO] Maior taxa sustentada: {sustained} msg/s "
+              f"(p99 <= {SATURATION_P99_MS} ms, vazao >= {SATURATION_RATIO:.0%} do alvo, sem erros)")
+    return reports, sustained
+
+
 if __name__ == "__main__":
-    run_simulation()
+    # python src/integration/simulate_tasy.py                       -> simulador generico (1 exame a cada 5 s)
+    # python src/integration/simulate_tasy.py --load --target=mllp|rest --rate=200 --concurrency=8
+    #     [--duration=10] [--patients=1000] [--mix=CREAT:0.7,K:0.3] [--host=..] [--port=2575] [--url=..]
+    #     [--rates=100,200,400,800]  (degraus ate saturar)
+    if "--load" not in sys.argv:
+        run_simulation()
+    else:
+        opts = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+        kwargs = {
+            "target": opts.get("target", "mllp"),
+            "concurrency": int(opts.get("concurrency", LOAD_CONCURRENCY)),
+            "duration": float(opts.get("duration", LOAD_DURATION_S)),
+            "n_patients": int(opts.get("patients", LOAD_PATIENTS)),
+            "mix": parse_mix(opts["mix"]) if "mix" in opts else None,
+            "host": opts.get("host", "127.0.0.1"),
+            "port": int(opts.get("port", MLLP_PORT)),
+            "url": opts.get("url", API_URL),
+        }
+        if kwargs["target"] not in ("mllp", "rest"):
+            print("[ERRO] --target deve ser mllp ou rest")
+            sys.exit(1)
+        if "rates" in opts:
+            run_sweep([float(r) for r in opts["rates"].split(",")], **kwargs)
+        else:
+            print_load_report(asyncio.run(run_load(rate=float(opts.get("rate", LOAD_RATE)), **kwargs)))
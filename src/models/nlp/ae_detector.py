@@ -1,7 +1,40 @@
+import csv
 import re
+import sys
+import time
+import unicodedata
+
+# Palavras (unicode): acentos fazem parte do token, como no \b do regex original
+WORD_RE = re.compile(r"\w+")
+# Marcador de fim de termo no trie
+END = ""
+
+
+def _build_accent_table():
+    """Tabela 1:1 de caracteres acentuados -> base (preserva offsets do texto)."""
+    table = {}
+    for code in range(0xC0, 0x250):
+        ch = chr(code)
+        base = unicodedata.normalize("NFKD", ch)[0]
+        if base != ch and len(base) == 1 and base.isascii():
+            table[code] = base
+    return table
+
+
+ACCENT_TABLE = _build_accent_table()
+
+
+def normalize(text):
+    """Minusculas + remocao de acentos, mantendo o mesmo comprimento quando possivel."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Raro (ex: 'İ'); usa minusculas caractere a caractere para manter offsets
+        lowered = "".join(c.lower()[0] for c in text)
+    return lowered.translate(ACCENT_TABLE)
+
 
 class PharmacovigilanceNLP:
-    def __init__(self):
+    def __init__(self, dictionary_path=None):
         # Dicionário simplificado de termos CTCAE (Toxicidade)
         # Na prática, isso seria um modelo LLM ou ontologia médica
         self.tox_terms = {
@@ -12,6 +45,70 @@ class PharmacovigilanceNLP:
             "neuropatia":  {"grau": "G1",    "risco": "Baixo", "acao": "Monitorar Dose Acumulada"},
             "sangramento": {"grau": "G3",    "risco": "Alto",  "acao": "URGENTE: Coagulograma"}
         }
+        # Sinonimo (normalizado) -> termo canonico
+        self.synonyms = {term: term for term in self.tox_terms}
+
+        # Modo vocabulario grande: dicionario CTCAE/MedDRA em portugues (CSV)
+        if dictionary_path:
+            self.load_dictionary(dictionary_path)
+        self._build_trie()
+
+    def load_dictionary(self, path):
+        """
+        Carrega um dicionario CSV com colunas: termo, sinonimos (separados por ';'),
+        grau, risco, acao. Substitui o dicionario embutido.
+        """
+        self.tox_terms, self.synonyms = {}, {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                term = row["termo"].strip().lower()
+                self.tox_terms[term] = {"grau": row.get("grau", ""), "risco": row.get("risco", ""),
+                                        "acao": row.get("acao", "")}
+                self.synonyms[term] = term
+                for syn in (row.get("sinonimos") or "").split(";"):
+                    if syn.strip():
+                        self.synonyms[syn.strip().lower()] = term
+        self._build_trie()
+
+    def _build_trie(self):
+        """Trie de tokens normalizados: termos de varias palavras viram caminhos no trie."""
+        self._trie = {}
+        for synonym, term in self.synonyms.items():
+            tokens = WORD_RE.findall(normalize(synonym))
+            if not tokens:
+                continue
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[END] = term
+
+    def find_matches(self, text):
+        """
+        Passada unica sobre o texto (sem acento/caixa): retorna
+        [(inicio, fim, termo_canonico)] com o casamento mais longo a partir da esquerda.
+        """
+        tokens = [(m.start(), m.end(), m.group()) for m in WORD_RE.finditer(normalize(text))]
+        matches = []
+        trie = self._trie
+        i, n = 0, len(tokens)
+        while i < n:
+            node = trie.get(tokens[i][2])
+            best = None
+            j = i
+            while node is not None:
+                if END in node:
+                    best = (j, node[END])
+                j += 1
+                if j >= n:
+                    break
+                node = node.get(tokens[j][2])
+            if best is None:
+                i += 1
+                continue
+            last, term = best
+            matches.append((tokens[i][0], tokens[last][1], term))
+            i = last + 1
+        return matches
 
     def analyze_text(self, text):
         """
@@ -20,24 +117,80 @@ class PharmacovigilanceNLP:
         """
         if not text:
             return []
-            
-        text_lower = text.lower()
-        detected_events = []
-        
-        for term, info in self.tox_terms.items():
-            # Busca regex simples (palavra inteira)
-            if re.search(r'\b' + re.escape(term) + r'\b', text_lower):
-                detected_events.append({
+
+        detected_events = {}
+        for start, end, term in self.find_matches(text):
+            event = detected_events.get(term)
+            if event is None:
+                info = self.tox_terms[term]
+                event = detected_events[term] = {
                     "termo": term.capitalize(),
                     "grau_provavel": info['grau'],
                     "risco": info['risco'],
-                    "sugestao": info['acao']
-                })
-                
-        return detected_events
+                    "sugestao": info['acao'],
+                    "ocorrencias": [],
+                }
+            event["ocorrencias"].append({"inicio": start, "fim": end, "trecho": text[start:end]})
+
+        return list(detected_events.values())
+
+    def analyze_batch(self, notes):
+        """
+        Analisa muitas notas. Com pandas.Series devolve uma Series (mesmo indice);
+        com qualquer iteravel devolve um gerador (memoria constante).
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            pd = None
+        if pd is not None and isinstance(notes, pd.Series):
+            return pd.Series([self.analyze_text(t) if isinstance(t, str) else [] for t in notes],
+                             index=notes.index, name="eventos_adversos")
+        return (self.analyze_text(t) for t in notes)
+
+
+def benchmark(n_notes=200_000, vocab_size=5_000):
+    """Compara o matcher de passada unica com o regex por termo (amostra menor)."""
+    import random
+
+    rng = random.Random(42)
+    nlp = PharmacovigilanceNLP()
+    for k in range(vocab_size):
+        term = f"toxicidade sintetica {k}" if k % 3 == 0 else f"termo{k}"
+        nlp.tox_terms[term] = {"grau": "G1", "risco": "Baixo", "acao": "-"}
+        nlp.synonyms[term] = term
+    nlp._build_trie()
+
+    words = ("paciente refere evolui com leve intensa sem queixas dor apos ciclo de "
+             "cisplatina mantendo atividades").split()
+    vocab = list(nlp.synonyms)
+    notes = []
+    for _ in range(n_notes):
+        note = [rng.choice(words) for _ in range(30)]
+        note.insert(rng.randrange(30), rng.choice(vocab))
+        notes.append(" ".join(note).capitalize() + ". Febre e Diarréia não relatadas.")
+
+    t0 = time.perf_counter()
+    total = sum(len(r) for r in nlp.analyze_batch(notes))
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] Passada unica: {n_notes} notas, {len(nlp.synonyms)} termos -> "
+          f"{n_notes / elapsed:.0f} notas/s ({total} eventos)")
+
+    # Linha de base: um re.search por termo (custo linear no vocabulario)
+    sample = notes[:200]
+    t0 = time.perf_counter()
+    for text in sample:
+        text_lower = text.lower()
+        for term in nlp.tox_terms:
+            re.search(r'\b' + re.escape(term) + r'\b', text_lower)
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] Regex por termo (linha de base): {len(sample) / elapsed:.0f} notas/s")
 
 # Teste rápido
 if __name__ == "__main__":
-    nlp = PharmacovigilanceNLP()
-    texto = "Paciente refere febre noturna e leve rash nos braços."
-    print(nlp.analyze_text(texto))
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        nlp = PharmacovigilanceNLP()
+        texto = "Paciente refere febre noturna e leve rash nos braços."
+        print(nlp.analyze_text(texto))
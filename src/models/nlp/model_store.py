@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+# Artefatos versionados (gerados offline; o dashboard apenas carrega do disco)
+ARTIFACT_DIR = "data/models"
+MODEL_VERSION = "v1"
+TRAIN_PATH = "data/processed/treino_ia.csv"
+
+SEVERITY_PATH = os.path.join(ARTIFACT_DIR, f"severidade_rf_{MODEL_VERSION}.joblib")
+SEVERITY_META = os.path.join(ARTIFACT_DIR, f"severidade_rf_{MODEL_VERSION}.json")
+NER_MODEL_ID = "d4data/biomedical-ner-all"
+NER_DIR = os.path.join(ARTIFACT_DIR, f"ner_biomedical_{MODEL_VERSION}")
+
+# Dados de treino na memória se não achar arquivo (mesmo fallback do dashboard)
+FALLBACK_TRAIN = {
+    "texto": ["Dor leve", "Dor intensa e vomitos", "Neutropenia febril", "Sem queixas"],
+    "gravidade": ["Grau 1 (Leve)", "Grau 3/4 (Grave)", "Grau 3/4 (Grave)", "Grau 0"],
+}
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+_VERSION_CACHE = {}
+
+
+def severity_version(path=SEVERITY_PATH, train_path=TRAIN_PATH):
+    """
+    Versao usada como chave do cache de pontuacao: MODEL_VERSION + hash do artefato
+    (ou do CSV de treino, quando o modelo e treinado em memoria). Retreinar invalida o cache.
+    """
+    source = path if os.path.exists(path) else train_path
+    if not os.path.exists(source):
+        return f"{MODEL_VERSION}-fallback"
+    st = os.stat(source)
+    key = (source, st.st_mtime_ns, st.st_size)
+    if key not in _VERSION_CACHE:
+        _VERSION_CACHE[key] = f"{MODEL_VERSION}-{_sha256(source)[:12]}"
+    return _VERSION_CACHE[key]
+
+
+def fit_severity_model(train_path=TRAIN_PATH):
+    """TF-IDF + Random Forest de gravidade (CTCAE) a partir do CSV de treino."""
+    import pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import make_pipeline
+
+    df = pd.read_csv(train_path) if os.path.exists(train_path) else pd.DataFrame(FALLBACK_TRAIN)
+    rf = make_pipeline(TfidfVectorizer(), RandomForestClassifier(n_estimators=50, random_state=42))
+    rf.fit(df['texto'], df['gravidade'])
+    return rf, len(df)
+
+
+def train_severity_model(train_path=TRAIN_PATH, out_path=SEVERITY_PATH, meta_path=SEVERITY_META):
+    """Etapa OFFLINE: treina e serializa o classificador com metadados de versao."""
+    import joblib
+    import sklearn
+
+    rf, n_rows = fit_severity_model(train_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    joblib.dump(rf, out_path, compress=3)
+    meta = {
+        "version": MODEL_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "sklearn_version": sklearn.__version__,
+        "train_rows": n_rows,
+        "train_sha256": _sha256(train_path) if os.path.exists(train_path) else None,
+        "classes": [str(c) for c in rf.classes_],
+        "score_version": severity_version(out_path),
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Modelo de gravidade salvo: {out_path} ({n_rows} exemplos)")
+    return meta
+
+
+def export_ner_model(model_id=NER_MODEL_ID, out_dir=NER_DIR):
+    """Etapa OFFLINE: baixa o modelo NER uma vez e salva localmente."""
+    from transformers import pipeline
+
+    ner = pipeline("ner", model=model_id, aggregation_strategy="simple")
+    ner.save_pretrained(out_dir)
+    print(f"[OK] Modelo NER salvo: {out_dir}")
+
+
+def load_severity_model(path=SEVERITY_PATH, meta_path=SEVERITY_META):
+    """Carrega o classificador serializado; sem artefato, treina em memoria (lento)."""
+    if os.path.exists(path):
+        import joblib
+        import sklearn
+
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("sklearn_version") != sklearn.__version__:
+                print(f"[AVISO] Artefato treinado com sklearn {meta.get('sklearn_version')}, "
+                      f"ambiente usa {sklearn.__version__}. Rode: python src/models/nlp/model_store.py")
+        return joblib.load(path)
+
+    print(f"[AVISO] Artefato {path} ausente; treinando em memoria. Rode: python src/models/nlp/model_store.py")
+    return fit_severity_model()[0]
+
+
+def load_ner_model(model_dir=NER_DIR, model_id=NER_MODEL_ID):
+    """Pipeline NER a partir do diretorio local (sem rede); fallback para o Hub."""
+    from transformers import pipeline
+
+    source = model_dir if os.path.isdir(model_dir) else model_id
+    return pipeline("ner", model=source, tokenizer=source, aggregation_strategy="simple")
+
+
+if __name__ == "__main__":
+    # Treino/exportacao offline dos artefatos usados pelo dashboard
+    t0 = time.perf_counter()
+    train_severity_model()
+    try:
+        export_ner_model()
+    except Exception as e:
+        print(f"[ERRO] Falha ao exportar o modelo NER: {e}")
+    print(f"[OK] Artefatos gerados em {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+try:
+    from src.models.nlp.model_store import severity_version, load_severity_model, load_ner_model
+except ImportError:
+    # Execucao direta: python src/models/nlp/note_scoring.py
+    from model_store import severity_version, load_severity_model, load_ner_model
+
+try:
+    from src.monitoring.metrics import track
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.monitoring.metrics import track
+
+DB_PATH = "database/oncopharm.db"
+BATCH_SIZE = 32
+POLL_INTERVAL_S = 10
+# Marca d'agua (ultimo note_id processado) na tabela etl_checkpoint
+CHECKPOINT_SOURCE = "note_nlp_score"
+
+
+def text_hash(text):
+    return hashlib.sha256((text or "").strip().encode("utf-8")).hexdigest()
+
+
+def _to_json(entities):
+    # Scores do pipeline HF vem como numpy.float32
+    return json.dumps(entities, ensure_ascii=False,
+                      default=lambda o: o.item() if hasattr(o, "item") else str(o))
+
+
+def score_texts(texts, rf, ner=None, batch_size=BATCH_SIZE):
+    """
+    Pontua uma lista de notas: UMA passada de predict_proba (a classe e o argmax,
+    a confianca o maximo) e NER em lote. Retorna [(gravidade, confianca, entidades)].
+    """
+    if not texts:
+        return []
+    with track("nlp_inference", items=len(texts), model="rf"):
+        proba = rf.predict_proba(texts)
+    classes = rf.classes_
+    best = proba.argmax(axis=1)
+    if ner is not None:
+        with track("nlp_inference", items=len(texts), model="ner"):
+            entities = ner(list(texts), batch_size=batch_size)
+    else:
+        entities = [[] for _ in texts]
+    return [(str(classes[i]), float(proba[row, i]), ents)
+            for row, (i, ents) in enumerate(zip(best, entities))]
+
+
+def lookup_scores(conn, hashes, model_version=None):
+    """Resultados ja calculados: {hash: {'g', 'c', 'e'}} (versao padrao: artefato atual)."""
+    model_version = model_version or severity_version()
+    found = {}
+    hashes = list(hashes)
+    for start in range(0, len(hashes), 500):
+        part = hashes[start:start + 500]
+        rows = conn.execute(
+            f"""SELECT text_hash, gravidade, confianca, entidades_json FROM note_nlp_score
+                WHERE model_version = ? AND text_hash IN ({','.join('?' * len(part))})""",
+            [model_version, *part],
+        ).fetchall()
+        for h, g, c, e in rows:
+            found[h] = {"g": g, "c": c, "e": json.loads(e) if e else []}
+    return found
+
+
+def save_scores(conn, hashes, results, model_version=None):
+    model_version = model_version or severity_version()
+    now = datetime.now().isoformat(sep=" ", timespec="seconds")
+    with conn:
+        conn.executemany(
+            """INSERT OR REPLACE INTO note_nlp_score
+               (text_hash, model_version, gravidade, confianca, entidades_json, scored_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [(h, model_version, g, c, _to_json(e), now) for h, (g, c, e) in zip(hashes, results)],
+        )
+
+
+def score_pending_notes(conn, rf, ner=None, batch_size=BATCH_SIZE):
+    """
+    Processa as notas novas (note_id acima da marca d'agua) em lotes. Textos ja
+    presentes no cache (mesmo hash) nao sao pontuados de novo.
+    """
+    row = conn.execute("SELECT rows_done FROM etl_checkpoint WHERE source = ?",
+                       (CHECKPOINT_SOURCE,)).fetchone()
+    last_id = row[0] if row else 0
+    version = severity_version()
+    scored = reused = 0
+    while True:
+        notes = conn.execute(
+            "SELECT note_id, note_text FROM note WHERE note_id > ? ORDER BY note_id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not notes:
+            break
+
+        # Deduplica dentro do lote e contra o cache persistido
+        by_hash = {}
+        for _, text in notes:
+            by_hash.setdefault(text_hash(text), text)
+        cached = lookup_scores(conn, by_hash, version)
+        pending = [(h, t) for h, t in by_hash.items() if h not in cached]
+        if pending:
+            results = score_texts([t for _, t in pending], rf, ner, batch_size)
+            save_scores(conn, [h for h, _ in pending], results, version)
+        scored += len(pending)
+        reused += len(notes) - len(pending)
+
+        last_id = notes[-1][0]
+        with conn:
+            conn.execute(
+                """INSERT INTO etl_checkpoint (source, rows_done, updated_at)
+                   VALUES (?, ?, datetime('now'))
+                   ON CONFLICT(source) DO UPDATE SET
+                       rows_done = excluded.rows_done, updated_at = excluded.updated_at""",
+                (CHECKPOINT_SOURCE, last_id),
+            )
+    return scored, reused
+
+
+def run_worker(db_path=DB_PATH, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL_S, once=False):
+    """Worker em segundo plano: pontua as notas novas periodicamente."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    tables = {t for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {"note", "note_nlp_score", "etl_checkpoint"} <= tables:
+        print("[ERRO] Esquema ausente no banco. Rode: python src/etl/02_load_to_sql.py")
+        conn.close()
+        return
+    rf, version = load_severity_model(), severity_version()
+    try:
+        ner = load_ner_model()
+    except Exception as e:
+        print(f"[AVISO] NER indisponivel ({e}); pontuando apenas gravidade.")
+        ner = None
+
+    print(f"[INFO] Worker de pontuacao NLP iniciado (lote={batch_size}).")
+    while True:
+        if severity_version() != version:
+            # Modelo retreinado: recarrega para nao gravar resultados antigos sob a nova versao
+            rf, version = load_severity_model(), severity_version()
+            print(f"[INFO] Modelo de gravidade recarregado ({version}).")
+        t0 = time.perf_counter()
+        scored, reused = score_pending_notes(conn, rf, ner, batch_size)
+        if scored or reused:
+            elapsed = time.perf_counter() - t0
+            print(f"[OK] {scored} notas pontuadas, {reused} do cache "
+                  f"({(scored + reused) / elapsed:.1f} notas/s)")
+        if once:
+            break
+        time.sleep(poll_interval)
+    conn.close()
+
+
+def benchmark(texts, rf, ner=None, batch_sizes=(1, 8, 32, 128)):
+    """Vazao (notas/s) da pontuacao para diferentes tamanhos de lote."""
+    report = {}
+    for bs in batch_sizes:
+        t0 = time.perf_counter()
+        for start in range(0, len(texts), bs):
+            score_texts(texts[start:start + bs], rf, ner, bs)
+        elapsed = time.perf_counter() - t0
+        report[bs] = len(texts) / elapsed if elapsed > 0 else float("inf")
+        print(f"      lote={bs:4d}: {report[bs]:.1f} notas/s")
+    return report
+
+
+if __name__ == "__main__":
+    # python src/models/nlp/note_scoring.py [--once | --bench] [db_path]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    db_path = args[0] if args else DB_PATH
+    if "--bench" in sys.argv:
+        conn = sqlite3.connect(db_path)
+        texts = [t for (t,) in conn.execute("SELECT note_text FROM note LIMIT 2000")]
+        conn.close()
+        try:
+            ner = load_ner_model()
+        except Exception:
+            ner = None
+        print(f"[INFO] Benchmark de pontuacao: {len(texts)} notas (NER {'ativo' if ner else 'inativo'})")
+        benchmark(texts, load_severity_model(), ner)
+    else:
+        run_worker(db_path, once="--once" in sys.argv)
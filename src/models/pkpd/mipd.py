@@ -0,0 +1,408 @@
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.models.pkpd.simulacao_cisplatina import simulate_pk_one_compartment
+    from src.models.pkpd.monte_carlo_pta import (
+        CRCL_REF, OMEGA_CL, OMEGA_V, TOXIC_THRESHOLD_MG_L, cockcroft_gault, typical_parameters,
+    )
+except ImportError:
+    # Execucao direta: python src/models/pkpd/mipd.py
+    from simulacao_cisplatina import simulate_pk_one_compartment
+    from monte_carlo_pta import (
+        CRCL_REF, OMEGA_CL, OMEGA_V, TOXIC_THRESHOLD_MG_L, cockcroft_gault, typical_parameters,
+    )
+
+try:
+    from src.monitoring.metrics import track
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.monitoring.metrics import track
+
+DB_PATH = "database/oncopharm.db"
+SCHEMA_PATH = "database/schemas/06_pk_fit.sql"
+MODEL_VERSION = "mipd-v1"
+# Marca d'agua (ultimo measurement_id considerado) na tabela etl_checkpoint
+CHECKPOINT_SOURCE = "pk_fit"
+POLL_INTERVAL_S = 10
+
+# Codigos em measurement: creatinina (covariavel) e nivel plasmatico de cisplatina (mg/L)
+CREAT_CODE = "CREAT"
+CONC_CODE = "CISPL"
+# Erro residual combinado (proporcional + aditivo)
+SIGMA_PROP = 0.15
+SIGMA_ADD = 0.05
+# Apenas niveis colhidos ate 72h apos a ultima dose entram no ajuste
+OBS_WINDOW_H = 72.0
+
+# Sem dado no cadastro: valores de referencia
+DEFAULTS = {"idade": 60.0, "peso_kg": 70.0, "bsa_m2": 1.8, "creatinina": 0.9}
+DOSE_MG_M2 = 75.0
+DOSE_GRID_MG = np.arange(10.0, 205.0, 5.0)
+# Alvo: AUC do paciente de referencia (CrCl normal, mesmo peso/BSA) com a dose padrao
+AUC_TOL = 0.05
+# Janela da simulacao exibida no dashboard (mesma de run_simulation)
+HOURS = 24
+DOSE_RE = re.compile(r"Dose:\s*([\d.,]+)")
+
+MAX_ITER = 50
+TOL = 1e-6
+IN_CHUNK = 500
+
+
+def ensure_schema(conn, schema_path=SCHEMA_PATH):
+    """Cria a tabela pk_fit se ainda nao existir (idempotente)."""
+    if os.path.exists(schema_path):
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+
+
+def map_estimate(dose, cl_typ, v_typ, t_obs, y_obs, mask, eta0=None, max_iter=MAX_ITER, tol=TOL):
+    """
+    Estimativa MAP de (eta_CL, eta_V) para P pacientes ao mesmo tempo
+    (Levenberg-Marquardt vetorizado, priori log-normal do modelo populacional).
+    t_obs/y_obs/mask: (P, M) com as observacoes preenchidas a esquerda.
+    Retorna (eta (P, 2), iteracoes (P,)).
+    """
+    dose, cl_typ, v_typ = (np.asarray(x, dtype=float)[:, None] for x in (dose, cl_typ, v_typ))
+    y = np.where(mask, y_obs, 0.0)
+    t = np.where(mask, t_obs, 0.0)
+    w = np.where(mask, 1.0 / ((SIGMA_PROP * y) ** 2 + SIGMA_ADD ** 2), 0.0)
+    omega_inv = np.array([1.0 / OMEGA_CL ** 2, 1.0 / OMEGA_V ** 2])
+
+    def predict(eta):
+        cl = cl_typ * np.exp(eta[:, :1])
+        v = v_typ * np.exp(eta[:, 1:])
+        return simulate_pk_one_compartment(dose, cl, v, t=t)[1], cl / v
+
+    def objective(eta, f):
+        return (w * (y - f) ** 2).sum(axis=1) + (eta ** 2 * omega_inv).sum(axis=1)
+
+    n = len(dose)
+    eta = np.zeros((n, 2)) if eta0 is None else np.array(eta0, dtype=float)
+    f, k = predict(eta)
+    obj = objective(eta, f)
+    lam = np.full(n, 1e-3)
+    iters = np.zeros(n, dtype=int)
+    active = np.ones(n, dtype=bool)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        # Derivadas da predicao em relacao a eta_CL e eta_V
+        d_cl = -f * k * t
+        d_v = f * (k * t - 1.0)
+        r = y - f
+        h11 = (w * d_cl * d_cl).sum(axis=1) + omega_inv[0]
+        h22 = (w * d_v * d_v).sum(axis=1) + omega_inv[1]
+        h12 = (w * d_cl * d_v).sum(axis=1)
+        g1 = (w * d_cl * r).sum(axis=1) - omega_inv[0] * eta[:, 0]
+        g2 = (w * d_v * r).sum(axis=1) - omega_inv[1] * eta[:, 1]
+        a, d = h11 * (1.0 + lam), h22 * (1.0 + lam)
+        det = a * d - h12 * h12
+        step = np.stack([(d * g1 - h12 * g2) / det, (a * g2 - h12 * g1) / det], axis=1)
+        step[~active] = 0.0
+
+        trial = eta + step
+        f_new, k_new = predict(trial)
+        obj_new = objective(trial, f_new)
+        better = active & (obj_new <= obj)
+        eta[better], f[better], k[better], obj[better] = trial[better], f_new[better], k_new[better], obj_new[better]
+        lam = np.where(better, lam / 10.0, lam * 10.0)
+        iters[active] += 1
+        converged = np.abs(step).max(axis=1) < tol
+        active &= ~converged & (lam < 1e10)
+    return eta, iters
+
+
+def recommend_dose(cl, v, dose_padrao, auc_alvo, threshold=TOXIC_THRESHOLD_MG_L, hours=HOURS):
+    """
+    Busca vetorizada na grade de doses (P x D de uma vez): maior dose (ate a padrao)
+    cuja AUC prevista nao passa da AUC alvo. Retorna (dose (P,), tempo previsto acima
+    do limiar (P,)); no modelo de 1 compartimento ambos sao exatos (AUC = dose / CL,
+    tempo acima = ln(C0 / limiar) / k, limitado a janela).
+    """
+    cl, v, dose_padrao, auc_alvo = (np.asarray(x, dtype=float)[:, None] for x in (cl, v, dose_padrao, auc_alvo))
+    _, c0 = simulate_pk_one_compartment(DOSE_GRID_MG[None, :], cl, v, t=0.0)   # (P, D)
+    auc = c0 * v / cl
+    above = np.clip(np.log(np.maximum(c0, 1e-12) / threshold) * v / cl, 0.0, hours)
+    ok = (auc <= auc_alvo * (1.0 + AUC_TOL)) & (DOSE_GRID_MG[None, :] <= dose_padrao)
+    # AUC cresce com a dose: a ultima dose valida e a maior
+    best = np.maximum(ok.sum(axis=1) - 1, 0)
+    rows = np.arange(len(best))
+    return DOSE_GRID_MG[best], above[rows, best]
+
+
+def _select_in(conn, sql, ids, params=()):
+    """Executa 'sql' (com {ids}) em blocos de IDs, concatenando as linhas."""
+    rows = []
+    for start in range(0, len(ids), IN_CHUNK):
+        part = ids[start:start + IN_CHUNK]
+        rows += conn.execute(sql.format(ids=",".join("?" * len(part))), [*params, *part]).fetchall()
+    return rows
+
+
+def load_inputs(conn, person_ids):
+    """Covariaveis, ultima dose, niveis plasmaticos e ajuste anterior de cada paciente."""
+    ids = [int(p) for p in person_ids]
+    persons = pd.DataFrame(
+        _select_in(conn, "SELECT person_id, idade, peso_kg, bsa_m2, gender_source_value FROM person "
+                         "WHERE person_id IN ({ids})", ids),
+        columns=["person_id", "idade", "peso_kg", "bsa_m2", "sexo"],
+    ).set_index("person_id")
+    creat = dict((pid, v) for pid, v, _ in _select_in(
+        conn, """SELECT person_id, value_as_number, MAX(measurement_datetime) FROM measurement
+                 WHERE measurement_source_value = ? AND value_as_number IS NOT NULL
+                   AND person_id IN ({ids}) GROUP BY person_id""", ids, (CREAT_CODE,)))
+    doses = {pid: (src, dt) for pid, src, dt in _select_in(
+        conn, """SELECT person_id, episode_source_value,
+                        MAX(COALESCE(episode_start_datetime, episode_start_date)) FROM episode
+                 WHERE episode_number = 1 AND person_id IN ({ids}) GROUP BY person_id""", ids)}
+    conc = pd.DataFrame(
+        _select_in(conn, """SELECT person_id, measurement_datetime, value_as_number FROM measurement
+                            WHERE measurement_source_value = ? AND value_as_number IS NOT NULL
+                              AND person_id IN ({ids})""", ids, (CONC_CODE,)),
+        columns=["person_id", "datetime", "valor"],
+    )
+    previous = {pid: (cl, v) for pid, cl, v in _select_in(
+        conn, "SELECT person_id, cl_L_h, vd_L FROM pk_fit WHERE model_version = ? AND person_id IN ({ids})",
+        ids, (MODEL_VERSION,))}
+    return persons, creat, doses, conc, previous
+
+
+def fit_patients(conn, person_ids, warm_start=True):
+    """
+    Reestima os pacientes informados (todos juntos, vetorizado), escolhe a dose e
+    grava em pk_fit. Com warm_start parte dos parametros do ajuste anterior.
+    Retorna DataFrame indexado por person_id.
+    """
+    ensure_schema(conn)
+    persons, creat, doses, conc, previous = load_inputs(conn, person_ids)
+    if persons.empty:
+        return pd.DataFrame()
+    pids = persons.index.to_numpy()
+    n = len(pids)
+
+    idade = persons["idade"].fillna(DEFAULTS["idade"]).to_numpy(float)
+    peso = persons["peso_kg"].fillna(DEFAULTS["peso_kg"]).to_numpy(float)
+    bsa = persons["bsa_m2"].fillna(DEFAULTS["bsa_m2"]).to_numpy(float)
+    feminino = persons["sexo"].fillna("").str.upper().str.startswith("F").to_numpy()
+    creatinina = np.array([creat.get(p) or DEFAULTS["creatinina"] for p in pids], dtype=float)
+    crcl = cockcroft_gault(idade, peso, creatinina, feminino)
+    cl_typ, v_typ = typical_parameters(peso, bsa, crcl)
+
+    # Dose de referencia: ultima dose registrada (episode) ou 75 mg/m2
+    dose_padrao = bsa * DOSE_MG_M2
+    dose_dt = np.full(n, np.datetime64("NaT"), dtype="datetime64[s]")
+    for i, p in enumerate(pids):
+        if p in doses:
+            src, dt = doses[p]
+            m = DOSE_RE.search(src or "")
+            if m:
+                dose_padrao[i] = float(m.group(1).replace(",", "."))
+            if dt:
+                dose_dt[i] = np.datetime64(pd.Timestamp(dt), "s")
+
+    # Niveis plasmaticos -> horas apos a dose, matriz (P, M) com mascara
+    index = {p: i for i, p in enumerate(pids)}
+    if not conc.empty:
+        # Niveis de pacientes sem cadastro em person (HL7/API) ficam fora do ajuste
+        conc = conc.assign(i=conc["person_id"].map(index)).dropna(subset=["i"])
+        conc["i"] = conc["i"].astype(int)
+        conc["h"] = (pd.to_datetime(conc["datetime"]).to_numpy("datetime64[s]")
+                     - dose_dt[conc["i"].to_numpy()]) / np.timedelta64(1, "h")
+        conc = conc[(conc["h"] > 0) & (conc["h"] <= OBS_WINDOW_H)]
+    n_obs = np.bincount(conc["i"], minlength=n) if not conc.empty else np.zeros(n, dtype=int)
+    m = max(int(n_obs.max()), 1)
+    t_obs, y_obs = np.zeros((n, m)), np.zeros((n, m))
+    mask = np.zeros((n, m), dtype=bool)
+    if not conc.empty:
+        conc = conc.sort_values(["i", "h"])
+        col = conc.groupby("i").cumcount().to_numpy()
+        row = conc["i"].to_numpy()
+        t_obs[row, col], y_obs[row, col], mask[row, col] = conc["h"], conc["valor"], True
+
+    # Warm start: parametros individuais anteriores expressos na priori atual (nova creatinina)
+    eta0 = None
+    if warm_start and previous:
+        prev = np.array([previous.get(p, (np.nan, np.nan)) for p in pids], dtype=float)
+        eta0 = np.nan_to_num(np.log(prev / np.stack([cl_typ, v_typ], axis=1)))
+    with track("pk_simulation", items=n, kind="mipd_fit"):
+        eta, iters = map_estimate(dose_padrao, cl_typ, v_typ, t_obs, y_obs, mask, eta0)
+        cl = cl_typ * np.exp(eta[:, 0])
+        v = v_typ * np.exp(eta[:, 1])
+        auc_alvo = dose_padrao / typical_parameters(peso, bsa, CRCL_REF)[0]
+        dose_rec, horas = recommend_dose(cl, v, dose_padrao, auc_alvo)
+
+    result = pd.DataFrame({
+        "person_id": pids, "model_version": MODEL_VERSION, "eta_cl": eta[:, 0], "eta_v": eta[:, 1],
+        "cl_L_h": cl, "vd_L": v, "crcl_ml_min": crcl,
+        "creatinina_mg_dl": [creat.get(p) for p in pids], "n_obs": n_obs, "iteracoes": iters,
+        "dose_padrao_mg": dose_padrao, "auc_alvo_mg_h_L": auc_alvo, "dose_recomendada_mg": dose_rec,
+        "tempo_acima_h": horas,
+        "fitted_at": datetime.now().isoformat(sep=" ", timespec="seconds"),
+    })
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO pk_fit ({', '.join(result.columns)}) "
+            f"VALUES ({', '.join('?' * len(result.columns))})",
+            result.astype(object).where(result.notna(), None).itertuples(index=False, name=None),
+        )
+    return result.set_index("person_id")
+
+
+def load_fits(conn, person_ids, refit_stale=True):
+    """
+    Ajustes salvos em pk_fit (versao atual do modelo), sem reestimar. Com
+    refit_stale, reajusta so quem nao tem ajuste ou tem creatinina/nivel
+    plasmatico mais novo que o ajuste (normalmente o worker ja fez isso).
+    Retorna DataFrame indexado por person_id.
+    """
+    ensure_schema(conn)
+    ids = [int(p) for p in person_ids]
+    columns = [c[1] for c in conn.execute("PRAGMA table_info(pk_fit)")]
+    fits = pd.DataFrame(
+        _select_in(conn, f"SELECT {', '.join(columns)} FROM pk_fit "
+                         "WHERE model_version = ? AND person_id IN ({ids})", ids, (MODEL_VERSION,)),
+        columns=columns,
+    ).set_index("person_id")
+    if not refit_stale:
+        return fits
+    latest = dict(_select_in(
+        conn, """SELECT person_id, MAX(measurement_datetime) FROM measurement
+                 WHERE measurement_source_value IN (?, ?) AND person_id IN ({ids}) GROUP BY person_id""",
+        ids, (CREAT_CODE, CONC_CODE)))
+    fitted = fits["fitted_at"].to_dict()
+    stale = [p for p in ids if p not in fitted or (latest.get(p) and str(latest[p]) > str(fitted[p]))]
+    if not stale:
+        return fits
+    refit = fit_patients(conn, stale)
+    return pd.concat([fits.drop(index=refit.index, errors="ignore"), refit[fits.columns]])
+
+
+def update_pending(conn, warm_start=True):
+    """
+    Reajusta apenas os pacientes com creatinina ou nivel plasmatico novo
+    (measurement_id acima da marca d'agua). Retorna o numero de pacientes.
+    """
+    row = conn.execute("SELECT rows_done FROM etl_checkpoint WHERE source = ?",
+                       (CHECKPOINT_SOURCE,)).fetchone()
+    last_id = row[0] if row else 0
+    max_id = conn.execute("SELECT MAX(measurement_id) FROM measurement").fetchone()[0] or 0
+    if max_id <= last_id:
+        return 0
+    pids = [p for (p,) in conn.execute(
+        """SELECT DISTINCT person_id FROM measurement
+           WHERE measurement_id > ? AND measurement_id <= ? AND measurement_source_value IN (?, ?)""",
+        (last_id, max_id, CREAT_CODE, CONC_CODE))]
+    if pids:
+        fit_patients(conn, pids, warm_start)
+    with conn:
+        conn.execute(
+            """INSERT INTO etl_checkpoint (source, rows_done, updated_at)
+               VALUES (?, ?, datetime('now'))
+               ON CONFLICT(source) DO UPDATE SET
+                   rows_done = excluded.rows_done, updated_at = excluded.updated_at""",
+            (CHECKPOINT_SOURCE, max_id),
+        )
+    return len(pids)
+
+
+def run_worker(db_path=DB_PATH, poll_interval=POLL_INTERVAL_S, once=False):
+    """Worker em segundo plano: reajusta a enfermaria a cada creatinina/nivel novo."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    tables = {t for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {"person", "measurement", "episode", "etl_checkpoint"} <= tables:
+        print("[ERRO] Esquema ausente no banco. Rode: python src/etl/02_load_to_sql.py")
+        conn.close()
+        return
+    ensure_schema(conn)
+
+    print("[INFO] Worker MIPD iniciado.")
+    while True:
+        t0 = time.perf_counter()
+        n = update_pending(conn)
+        if n:
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"[OK] {n} pacientes reajustados em {ms:.0f} ms ({ms / n:.2f} ms/paciente)")
+        if once:
+            break
+        time.sleep(poll_interval)
+    conn.close()
+
+
+def benchmark(n_patients=5_000, seed=42):
+    """Enfermaria sintetica: ajuste inicial (frio) e reajuste apos nova creatinina (warm start)."""
+    try:
+        from src.integration.adapters.omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+    except ImportError:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+        from src.integration.adapters.omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(":memory:")
+    for path in sorted(os.listdir("database/schemas")):
+        with open(os.path.join("database/schemas", path), encoding="utf-8") as f:
+            conn.executescript(f.read())
+
+    pids = np.arange(1, n_patients + 1)
+    peso = 70 * rng.lognormal(0, 0.15, n_patients)
+    bsa = np.sqrt(168 * peso / 3600)
+    cl_true = 3.0 * rng.lognormal(0, OMEGA_CL, n_patients)
+    v_true = 20.0 * rng.lognormal(0, OMEGA_V, n_patients)
+    conn.executemany("INSERT INTO person (person_id, gender_source_value, idade, peso_kg, bsa_m2) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     [(int(p), "F" if p % 2 else "M", int(rng.integers(30, 80)), float(w), float(b))
+                      for p, w, b in zip(pids, peso, bsa)])
+    conn.executemany("""INSERT INTO episode (person_id, episode_concept_id, episode_start_date,
+                            episode_start_datetime, episode_number, episode_source_value,
+                            episode_object_concept_id, episode_type_concept_id)
+                        VALUES (?, 32531, '2025-12-06', '2025-12-06 08:00:00', 1, ?, 0, 0)""",
+                     [(int(p), f"Dose: {75 * b:.0f}mg | Tox: 0") for p, b in zip(pids, bsa)])
+    rows = [measurement_row(int(p), CREAT_CODE, round(float(c), 2), "mg/dL", "2025-12-06 07:00:00")
+            for p, c in zip(pids, 0.9 * rng.lognormal(0, 0.25, n_patients))]
+    for h in (1.0, 4.0, 12.0):
+        _, c = simulate_pk_one_compartment(75 * bsa, cl_true, v_true, t=h)
+        c = c * rng.lognormal(0, SIGMA_PROP, n_patients)
+        rows += [measurement_row(int(p), CONC_CODE, round(float(x), 3), "mg/L",
+                                 f"2025-12-06 {8 + int(h):02d}:00:00") for p, x in zip(pids, c)]
+    conn.executemany(SQL_INSERT_MEASUREMENT, rows)
+
+    t0 = time.perf_counter()
+    update_pending(conn)
+    cold = time.perf_counter() - t0
+    it_cold = conn.execute("SELECT AVG(iteracoes) FROM pk_fit").fetchone()[0]
+    fit = pd.read_sql_query("SELECT cl_L_h FROM pk_fit ORDER BY person_id", conn)["cl_L_h"].to_numpy()
+    erro = np.median(np.abs(fit / cl_true - 1))
+
+    # Nova creatinina para toda a enfermaria -> reajuste incremental
+    conn.executemany(SQL_INSERT_MEASUREMENT,
+                     [measurement_row(int(p), CREAT_CODE, round(float(c), 2), "mg/dL", "2025-12-07 07:00:00")
+                      for p, c in zip(pids, 0.95 * rng.lognormal(0, 0.25, n_patients))])
+    t0 = time.perf_counter()
+    update_pending(conn)
+    warm = time.perf_counter() - t0
+    it_warm = conn.execute("SELECT AVG(iteracoes) FROM pk_fit").fetchone()[0]
+    print(f"[OK] Ajuste inicial: {n_patients} pacientes em {cold * 1000:.0f} ms "
+          f"({cold * 1000 / n_patients:.3f} ms/paciente, {it_cold:.1f} iteracoes) | erro mediano CL {erro:.1%}")
+    print(f"[OK] Reajuste (warm start): {warm * 1000:.0f} ms "
+          f"({warm * 1000 / n_patients:.3f} ms/paciente, {it_warm:.1f} iteracoes)")
+    conn.close()
+
+
+if __name__ == "__main__":
+    # python src/models/pkpd/mipd.py [--once | --bench] [db_path]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        run_worker(args[0] if args else DB_PATH, once="--once" in sys.argv)
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from .pk_engine import CL_L_H, V1_L, TOXIC_THRESHOLD_MG_L, concentrations
+except ImportError:
+    from pk_engine import CL_L_H, V1_L, TOXIC_THRESHOLD_MG_L, concentrations
+
+try:
+    from src.monitoring.metrics import record
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.monitoring.metrics import record
+
+# Modelo populacional: parametros tipicos (pk_engine) com covariaveis e
+# variabilidade interindividual log-normal (eta ~ N(0, omega^2))
+OMEGA_CL = 0.30
+OMEGA_V = 0.20
+THETA_CRCL = 0.75       # expoente de CL em (CrCl / 100 mL/min)
+THETA_PESO = 0.75       # alometria de CL em (peso / 70 kg)
+CRCL_REF = 100.0
+PESO_REF = 70.0
+BSA_REF = 1.8
+
+# Alvo: tempo acima do limiar toxico na janela simulada (mesma de run_simulation)
+HOURS = 24
+N_TIMES = 200
+MAX_HOURS_ABOVE = 6.0
+
+CHUNK_SIZE = 5_000
+DOSES_MG = (50.0, 75.0, 100.0, 125.0, 150.0)
+
+
+def cockcroft_gault(idade, peso_kg, creatinina_mg_dl, feminino):
+    """Clearance de creatinina estimado (mL/min)."""
+    crcl = (140.0 - idade) * peso_kg / (72.0 * creatinina_mg_dl)
+    return np.where(feminino, crcl * 0.85, crcl)
+
+
+def typical_parameters(peso_kg, bsa_m2, crcl_ml_min):
+    """CL (L/h) e V (L) tipicos para as covariaveis (sem variabilidade interindividual)."""
+    crcl = np.clip(crcl_ml_min, 10.0, 200.0)
+    cl = CL_L_H * (crcl / CRCL_REF) ** THETA_CRCL * (peso_kg / PESO_REF) ** THETA_PESO
+    v = V1_L * (bsa_m2 / BSA_REF)
+    return cl, v
+
+
+def sample_population(n, rng, covariates=None):
+    """
+    Pacientes virtuais: covariaveis (peso, BSA, CrCl) e parametros individuais CL/V.
+    Com 'covariates' (dict com peso_kg, bsa_m2, crcl_ml_min) as covariaveis sao
+    fixas e apenas a variabilidade interindividual e amostrada.
+    """
+    if covariates:
+        peso = np.full(n, float(covariates["peso_kg"]))
+        bsa = np.full(n, float(covariates["bsa_m2"]))
+        crcl = np.full(n, float(covariates["crcl_ml_min"]))
+    else:
+        peso = PESO_REF * rng.lognormal(0.0, 0.18, n)
+        altura_cm = rng.normal(168.0, 9.0, n)
+        bsa = np.sqrt(altura_cm * peso / 3600.0)  # Mosteller
+        idade = rng.uniform(30.0, 80.0, n)
+        creatinina = 0.9 * rng.lognormal(0.0, 0.25, n)
+        crcl = cockcroft_gault(idade, peso, creatinina, rng.random(n) < 0.5)
+    crcl = np.clip(crcl, 10.0, 200.0)
+
+    cl, v = typical_parameters(peso, bsa, crcl)
+    cl = cl * np.exp(rng.normal(0.0, OMEGA_CL, n))
+    v = v * np.exp(rng.normal(0.0, OMEGA_V, n))
+    return {"peso_kg": peso, "bsa_m2": bsa, "crcl_ml_min": crcl, "cl": cl, "v1": v}
+
+
+def _simulate_chunk(task):
+    """Processo de trabalho: simula um bloco e devolve apenas contagens (pouco IPC)."""
+    seed, n, doses, tinf, covariates, threshold, max_hours_above = task
+    rng = np.random.default_rng(seed)
+    pop = sample_population(n, rng, covariates)
+    t = np.linspace(0, HOURS, N_TIMES)
+    # Modelo linear na dose: curva unitaria uma vez por paciente, escalada por dose
+    unit = concentrations(t, 1.0, pop["cl"], pop["v1"], tinf=tinf)    # (n, T)
+    doses = np.asarray(doses, dtype=float)[None, :, None]
+    mid = (unit[:, 1:] + unit[:, :-1]) / 2.0
+    time_above = ((mid[:, None, :] * doses) > threshold).astype(float) @ np.diff(t)
+    return {
+        "n": n,
+        "ok_time": (time_above <= max_hours_above).sum(axis=0),
+        "ok_cmax": (unit.max(axis=-1)[:, None] * doses[..., 0] < threshold).sum(axis=0),
+    }
+
+
+def simulate_pta(n_patients=1_000_000, doses=DOSES_MG, tinf=0.0, covariates=None, seed=42,
+                 workers=None, chunk_size=CHUNK_SIZE, threshold=TOXIC_THRESHOLD_MG_L,
+                 max_hours_above=MAX_HOURS_ABOVE):
+    """
+    Probabilidade de atingir o alvo (PTA) por dose, em blocos distribuidos num pool
+    de processos. Cada bloco recebe sua propria semente (SeedSequence.spawn), entao o
+    resultado e o mesmo para qualquer numero de processos.
+    """
+    workers = workers or os.cpu_count() or 1
+    sizes = [chunk_size] * (n_patients // chunk_size)
+    if n_patients % chunk_size:
+        sizes.append(n_patients % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, n, tuple(doses), tinf, covariates, threshold, max_hours_above)
+             for s, n in zip(seeds, sizes)]
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        parts = list(map(_simulate_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, tasks))
+    elapsed = time.perf_counter() - t0
+
+    n_total = sum(p["n"] for p in parts)
+    record("pk_simulation", elapsed * 1000, items=n_total * len(doses), kind="pta", workers=workers)
+    return {
+        "doses_mg": list(doses),
+        "n": n_total,
+        "pta_time_above": sum(p["ok_time"] for p in parts) / n_total,
+        "pta_cmax": sum(p["ok_cmax"] for p in parts) / n_total,
+        "workers": workers,
+        "elapsed_s": elapsed,
+        "sims_per_s": n_total * len(doses) / elapsed,
+    }
+
+
+def print_pta(res, max_hours_above=MAX_HOURS_ABOVE, threshold=TOXIC_THRESHOLD_MG_L):
+    print(f"[OK] {res['n']} pacientes virtuais em {res['elapsed_s']:.2f}s "
+          f"({res['workers']} processos, {res['sims_per_s']:.0f} simulacoes/s)")
+    for dose, p_time, p_cmax in zip(res["doses_mg"], res["pta_time_above"], res["pta_cmax"]):
+        print(f"     {dose:6.1f} mg | P(<= {max_hours_above:g}h acima de {threshold} mg/L) = {p_time:6.1%}"
+              f" | P(Cmax < {threshold}) = {p_cmax:6.1%}")
+
+
+def benchmark(n_patients=200_000):
+    """Simulacoes/s em funcao do numero de processos (mesma semente, mesmo PTA)."""
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, cores // 2 or 1, cores})
+    base = None
+    for workers in counts:
+        res = simulate_pta(n_patients, workers=workers)
+        base = base or res["sims_per_s"]
+        print(f"[OK] {workers:3d} processos: {res['sims_per_s']:12.0f} simulacoes/s "
+              f"(x{res['sims_per_s'] / base:.2f}) | PTA 75 mg = {res['pta_time_above'][1]:.2%}")
+
+
+if __name__ == "__main__":
+    # python src/models/pkpd/monte_carlo_pta.py [n_pacientes] [--bench]
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        args = [a for a in sys.argv[1:] if not a.startswith("--")]
+        print_pta(simulate_pta(int(args[0]) if args else 1_000_000))
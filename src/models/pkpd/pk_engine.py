@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+import numpy as np
+
+try:
+    from src.monitoring.metrics import track
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.monitoring.metrics import track
+
+# Parametros populacionais da cisplatina (mesmos de simulate_pk_one_compartment)
+CL_L_H = 3.0
+V1_L = 20.0
+TOXIC_THRESHOLD_MG_L = 1.5
+
+
+def exponentials(cl, v1, q=0.0, v2=1.0):
+    """
+    Constantes macro do modelo de 1 ou 2 compartimentos (IV, eliminacao central).
+    Retorna (coeficientes, taxas) com a ultima dimensao = 2 exponenciais, tal que a
+    resposta a um bolus unitario e C(t) = (1/V1) * sum(a_i * exp(-lambda_i * t)).
+    Com q = 0 o modelo degenera no de 1 compartimento (a = [1, 0], lambda = [k, 0]);
+    se isso vale para todos os elementos, so a exponencial nao nula e devolvida.
+    """
+    cl, v1, q, v2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (cl, v1, q, v2)))
+    k10 = cl / v1
+    k12 = q / v1
+    k21 = q / v2
+    s = k10 + k12 + k21
+    disc = np.sqrt(np.maximum(s * s - 4.0 * k10 * k21, 0.0))
+    alpha = (s + disc) / 2.0
+    beta = (s - disc) / 2.0
+    span = np.where(alpha - beta > 0, alpha - beta, 1.0)
+    a = np.stack([(alpha - k21) / span, (k21 - beta) / span], axis=-1)
+    lam = np.stack([alpha, beta], axis=-1)
+    if not np.any(q > 0):
+        return a[..., :1], lam[..., :1]
+    return a, lam
+
+
+def _unit_response(lam, s, tinf):
+    """
+    Resposta de cada exponencial a uma dose unitaria iniciada ha 's' horas,
+    em bolus (tinf = 0) ou infusao de duracao tinf. Zero antes da dose.
+    """
+    started = s >= 0
+    s = np.maximum(s, 0.0)
+    bolus = np.exp(-lam * s)
+
+    t_safe = np.where(tinf > 0, tinf, 1.0)
+    during = np.minimum(s, tinf)
+    after = s - during
+    lam_t = lam * t_safe
+    small = lam_t < 1e-9
+    # Limite lambda -> 0 (exponencial "nula" do modelo de 1 compartimento)
+    infusion = np.where(
+        small,
+        during / t_safe,
+        -np.expm1(-lam * during) * np.exp(-lam * after) / np.where(small, 1.0, lam_t),
+    )
+    return np.where(started, np.where(tinf > 0, infusion, bolus), 0.0)
+
+
+def concentrations(t, dose, cl, v1, q=0.0, v2=1.0, tinf=0.0, tau=24.0, n_doses=1):
+    """
+    Concentracao plasmatica (mg/L) por superposicao de doses, totalmente vetorizada.
+
+    Parametros de paciente (cl, v1, q, v2) e de esquema (dose, tinf, tau, n_doses)
+    sao arrays com formatos broadcastable entre si (ex: pacientes (P, 1) x esquemas
+    (1, R)); t e o vetor de tempos (T,). Retorna array com formato broadcast + (T,).
+
+    As doses anteriores a ultima iniciada ja terminaram a infusao (tinf <= tau), entao
+    sua soma e uma serie geometrica em forma fechada: o custo nao depende do numero
+    de ciclos.
+    """
+    t = np.asarray(t, dtype=float)
+    a, lam = exponentials(cl, v1, q, v2)                       # (..., E)
+    dose, tinf, tau, n_doses, v1 = (np.asarray(x, dtype=float) for x in (dose, tinf, tau, n_doses, v1))
+
+    # Eixos finais: (..., T, E)
+    a, lam = a[..., None, :], lam[..., None, :]
+    tinf, tau, n_doses = tinf[..., None, None], tau[..., None, None], n_doses[..., None, None]
+    tt = t[:, None]
+
+    # Doses ja iniciadas em t e tempo desde a ultima delas
+    started = np.clip(np.floor(tt / tau) + 1, 0, n_doses)
+    last = np.maximum(started - 1, 0)
+    s_last = tt - last * tau
+
+    current = _unit_response(lam, np.where(started > 0, s_last, -1.0), tinf)
+    # Doses anteriores: g(tinf) * exp(-lambda * (s_last - tinf)) * sum_{i=1..last} r^i
+    # r^last e 1 - r pelo expoente (expm1): sem log(r), que vira -inf quando r subfluxa
+    # para 0, e sem cancelamento quando r ~ 1; lambda * tau = 0 (r = 1) soma 'last' doses
+    x = lam * tau
+    zero = x == 0
+    geometric = np.where(zero, last, np.exp(-x) * np.expm1(-x * last) / np.expm1(np.where(zero, -1.0, -x)))
+    previous = _unit_response(lam, tinf, tinf) * np.exp(-lam * (s_last - tinf)) * geometric
+
+    per_unit = (a * (current + previous)).sum(axis=-1)          # (..., T)
+    return (dose / v1)[..., None] * per_unit
+
+
+def summarize(t, conc, threshold=TOXIC_THRESHOLD_MG_L):
+    """AUC (trapezios), Cmax, Tmax e tempo acima do limiar, ao longo do ultimo eixo."""
+    t = np.asarray(t, dtype=float)
+    dt = np.diff(t)
+    mid = (conc[..., 1:] + conc[..., :-1]) / 2.0
+    return {
+        "auc_mg_h_L": (mid * dt).sum(axis=-1),
+        "cmax_mg_L": conc.max(axis=-1),
+        "tmax_h": t[conc.argmax(axis=-1)],
+        "time_above_h": ((mid > threshold) * dt).sum(axis=-1),
+    }
+
+
+def simulate_ward(patients, regimens, t):
+    """
+    Simula TODOS os pacientes x TODOS os esquemas de uma vez.
+    patients: dict de arrays (P,) com 'cl', 'v1' e opcionalmente 'q', 'v2'.
+    regimens: dict de arrays (R,) com 'dose', 'tinf', 'tau', 'n_doses'.
+    Retorna (conc (P, R, T), resumo com arrays (P, R)).
+    """
+    p = {k: np.asarray(v, dtype=float)[:, None] for k, v in patients.items()}
+    r = {k: np.asarray(v, dtype=float)[None, :] for k, v in regimens.items()}
+    with track("pk_simulation", items=p["cl"].shape[0] * r["dose"].shape[1], kind="ward"):
+        conc = concentrations(
+            t, r["dose"], p["cl"], p["v1"], p.get("q", 0.0), p.get("v2", 1.0),
+            r.get("tinf", 0.0), r.get("tau", 24.0), r.get("n_doses", 1),
+        )
+        return conc, summarize(t, conc)
+
+
+if __name__ == "__main__":
+    # Benchmark: enfermaria inteira, 3 esquemas, 6 ciclos, 2 compartimentos
+    rng = np.random.default_rng(42)
+    n = 300
+    patients = {
+        "cl": CL_L_H * rng.lognormal(0, 0.3, n), "v1": V1_L * rng.lognormal(0, 0.2, n),
+        "q": np.full(n, 1.5), "v2": np.full(n, 40.0),
+    }
+    regimens = {  # 75 mg a cada 21 dias, 40 mg semanal, 100 mg a cada 21 dias
+        "dose": [75.0, 40.0, 100.0], "tinf": [1.0, 1.0, 2.0],
+        "tau": [504.0, 168.0, 504.0], "n_doses": [6, 6, 6],
+    }
+    t = np.linspace(0, 6 * 504, 2000)
+    t0 = time.perf_counter()
+    conc, resumo = simulate_ward(patients, regimens, t)
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"[OK] {n} pacientes x {len(regimens['dose'])} esquemas x {len(t)} tempos em {ms:.1f} ms")
+    print(f"     AUC media por esquema: {resumo['auc_mg_h_L'].mean(axis=0).round(1)}")
+    print(f"     Tempo acima de {TOXIC_THRESHOLD_MG_L} mg/L (h): {resumo['time_above_h'].mean(axis=0).round(2)}")
@@ -1,34 +1,69 @@
+import glob
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
 
-# Configurações Visuais Profissionais
-plt.style.use('bmh')
-plt.rcParams.update({'font.size': 12, 'figure.autolayout': True})
-
 INPUT_FILE = "data/processed/dados_limpos.csv"
+# Saida colunar do ETL 01 (dose ja convertida para numero)
+INPUT_PARQUET = "data/processed/dados_limpos_parquet"
 OUTPUT_IMG = "simulacao_pk.png"
 
-def simulate_pk_one_compartment(dose_mg, clearance_L_h=3.0, vd_L=20.0, hours=24):
+def simulate_pk_one_compartment(dose_mg, clearance_L_h=3.0, vd_L=20.0, hours=24, t=None):
+    # Aceita arrays (broadcast): usado tambem como modelo estrutural do MIPD
     k = clearance_L_h / vd_L
-    t = np.linspace(0, hours, 200)
+    if t is None:
+        t = np.linspace(0, hours, 200)
     conc = (dose_mg / vd_L) * np.exp(-k * t)
     return t, conc
 
+def load_first_dose():
+    """Dose (mg) e paciente do primeiro registro processado pelo ETL."""
+    if not os.path.exists(INPUT_FILE) and os.path.exists(INPUT_PARQUET):
+        # O dataset e particionado por grau de toxicidade: a ordem do arquivo de origem
+        # nao sobrevive entre particoes. Le so o primeiro bloco do ETL (part-00000-*) e
+        # ordena pela posicao original (linha_origem; datasets antigos: id_paciente).
+        files = sorted(glob.glob(os.path.join(INPUT_PARQUET, "**", "part-00000-*.parquet"), recursive=True))
+        df = pd.concat([pd.read_parquet(f) for f in files])
+        df = df.sort_values('linha_origem' if 'linha_origem' in df else 'id_paciente', kind='stable')
+        return float(df['dose_cisplatina_mg'].iloc[0]), df['id_paciente'].iloc[0]
+    # CSV do ETL: mesma ordem do arquivo de origem, e so a primeira linha e lida
+    df = pd.read_csv(INPUT_FILE, nrows=1)
+    if 'dose_cisplatina_mg' in df:
+        return float(df['dose_cisplatina_mg'].iloc[0]), df['id_paciente'].iloc[0]
+    dose_str = df.iloc[0]['dose_cisplatina']
+    return float(dose_str.replace('mg', '').strip()), df.iloc[0]['id_paciente']
+
+def plot_pk_curve(t, cp, dose_val, pid, out_path=OUTPUT_IMG, dpi=300):
+    """Grafico PK (matplotlib importado so aqui; o MIPD usa apenas o modelo)."""
+    import matplotlib.pyplot as plt
+
+    # Configurações Visuais Profissionais (sem alterar o estilo global do processo)
+    with plt.style.context('bmh'), plt.rc_context({'font.size': 12, 'figure.autolayout': True}):
+        fig = plt.figure(figsize=(10, 6), dpi=dpi)
+        plt.plot(t, cp, label=f'Cisplatina {dose_val}mg (IV)', color='#2E86C1', linewidth=3)
+        plt.fill_between(t, cp, alpha=0.1, color='#2E86C1')
+        plt.axhline(y=1.5, color='#E74C3C', linestyle='--', linewidth=2, label='Limiar Toxico')
+
+        plt.title(f'Perfil Farmacocinetico: Paciente {pid}', fontsize=14, fontweight='bold', pad=20)
+        plt.xlabel('Tempo apos infusao (horas)', fontsize=12)
+        plt.ylabel('Concentracao Plasmatica (mg/L)', fontsize=12)
+        plt.legend(frameon=True, facecolor='white', framealpha=1, fontsize=10)
+        plt.grid(True, which='major', linestyle='--', alpha=0.7)
+        plt.minorticks_on()
+
+        fig.savefig(out_path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
 def run_simulation():
     # CORRECAO: Removido emoji do print
     print("[INFO] Gerando Grafico PK em Alta Definicao (300 DPI)...")
     
-    if not os.path.exists(INPUT_FILE):
+    if not os.path.exists(INPUT_FILE) and not os.path.exists(INPUT_PARQUET):
         dose_val = 75.0
         pid = "Simulado"
     else:
         try:
-            df = pd.read_csv(INPUT_FILE)
-            dose_str = df.iloc[0]['dose_cisplatina']
-            dose_val = float(dose_str.replace('mg', '').strip())
-            pid = df.iloc[0]['id_paciente']
+            dose_val, pid = load_first_dose()
         except:
             dose_val = 75.0
             pid = "Simulado"
@@ -36,19 +71,7 @@ def run_simulation():
     t, cp = simulate_pk_one_compartment(dose_val)
 
     # Plotagem HD
-    plt.figure(figsize=(10, 6), dpi=300)
-    plt.plot(t, cp, label=f'Cisplatina {dose_val}mg (IV)', color='#2E86C1', linewidth=3)
-    plt.fill_between(t, cp, alpha=0.1, color='#2E86C1')
-    plt.axhline(y=1.5, color='#E74C3C', linestyle='--', linewidth=2, label='Limiar Toxico')
-    
-    plt.title(f'Perfil Farmacocinetico: Paciente {pid}', fontsize=14, fontweight='bold', pad=20)
-    plt.xlabel('Tempo apos infusao (horas)', fontsize=12)
-    plt.ylabel('Concentracao Plasmatica (mg/L)', fontsize=12)
-    plt.legend(frameon=True, facecolor='white', framealpha=1, fontsize=10)
-    plt.grid(True, which='major', linestyle='--', alpha=0.7)
-    plt.minorticks_on()
-    
-    plt.savefig(OUTPUT_IMG, dpi=300, bbox_inches='tight')
+    plot_pk_curve(t, cp, dose_val, pid, OUTPUT_IMG)
     print(f"[OK] Grafico PK salvo: {OUTPUT_IMG}")
 
 if __name__ == "__main__":
@@ -1,20 +1,8 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-# Tenta importar scikit-survival, se falhar, avisa
-try:
-    from sksurv.linear_model import CoxPHSurvivalAnalysis
-    from sksurv.util import Surv
-except ImportError:
-    print("[ERRO] scikit-survival nao instalado. Rode: pip install scikit-survival")
-    exit()
 
 import os
 
-# Configurações Visuais Profissionais
-plt.style.use('bmh')
-plt.rcParams.update({'font.size': 12})
-
 OUTPUT_IMG = "curva_sobrevivencia_toxicidade.png"
 
 def generate_synthetic_cohort(n=200):
@@ -30,16 +18,43 @@ def generate_synthetic_cohort(n=200):
     data['dias_observacao'] = tempo_ate_evento
     return data
 
+def plot_survival_curve(days, pred_surv, out_path=OUTPUT_IMG, dpi=300):
+    """Curva livre de toxicidade (uma linha por paciente) na grade de dias."""
+    import matplotlib.pyplot as plt
+
+    # Configurações Visuais Profissionais (sem alterar o estilo global do processo)
+    with plt.style.context('bmh'), plt.rc_context({'font.size': 12}):
+        fig = plt.figure(figsize=(10, 6), dpi=dpi)
+
+        for surv in pred_surv:
+            plt.step(days, surv, where="post", color='#8E44AD', linewidth=3, label='Prob. Livre de Toxicidade')
+            plt.fill_between(days, surv, step="post", alpha=0.1, color='#8E44AD')
+
+        plt.title(f'Previsao de Sobrevida Livre de Eventos (30 dias)', fontsize=14, fontweight='bold', pad=20)
+        plt.ylabel('Probabilidade (%)', fontsize=12)
+        plt.xlabel('Dias do Ciclo', fontsize=12)
+        plt.ylim(0, 1.05)
+        plt.grid(True, linestyle='--', alpha=0.5)
+        plt.legend(loc='lower left', frameon=True, facecolor='white')
+
+        fig.savefig(out_path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
 def run_toxicity_model():
     # CORRECAO: Removido emoji
     print("[INFO] Gerando Grafico de Risco em Alta Definicao (300 DPI)...")
     
-    train_data = generate_synthetic_cohort()
-    X = train_data[['dose_mg', 'variante_genetica', 'idade']]
-    y = Surv.from_dataframe('teve_toxicidade', 'dias_observacao', train_data)
-    
-    estimator = CoxPHSurvivalAnalysis()
-    estimator.fit(X, y)
+    # Modelo ajustado offline (risk_scoring.py --train); sem artefato, ajusta em memoria
+    try:
+        from src.models.toxicity.risk_scoring import load_cox_model, survival_matrix
+    except ImportError:
+        from risk_scoring import load_cox_model, survival_matrix
+    try:
+        model = load_cox_model()
+    except ImportError:
+        # Tenta importar scikit-survival, se falhar, avisa
+        print("[ERRO] scikit-survival nao instalado. Rode: pip install scikit-survival")
+        return
 
     paciente_teste = pd.DataFrame({
         'dose_mg': [75.0],
@@ -47,22 +62,8 @@ def run_toxicity_model():
         'idade': [65]
     })
     
-    pred_surv = estimator.predict_survival_function(paciente_teste)
-    
-    plt.figure(figsize=(10, 6), dpi=300)
-    
-    for fn in pred_surv:
-        plt.step(fn.x, fn.y, where="post", color='#8E44AD', linewidth=3, label='Prob. Livre de Toxicidade')
-        plt.fill_between(fn.x, fn.y, step="post", alpha=0.1, color='#8E44AD')
-        
-    plt.title(f'Previsao de Sobrevida Livre de Eventos (30 dias)', fontsize=14, fontweight='bold', pad=20)
-    plt.ylabel('Probabilidade (%)', fontsize=12)
-    plt.xlabel('Dias do Ciclo', fontsize=12)
-    plt.ylim(0, 1.05)
-    plt.grid(True, linestyle='--', alpha=0.5)
-    plt.legend(loc='lower left', frameon=True, facecolor='white')
-    
-    plt.savefig(OUTPUT_IMG, dpi=300, bbox_inches='tight')
+    pred_surv = survival_matrix(model, paciente_teste)
+    plot_survival_curve(model['day_grid'], pred_surv, OUTPUT_IMG)
     print(f"[OK] Grafico de Risco salvo: {OUTPUT_IMG}")
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+import numpy as np
+
+try:
+    from src.models.pkpd.monte_carlo_pta import cockcroft_gault
+    from src.monitoring.metrics import REGISTRY, record
+except ImportError:
+    # Execucao direta: raiz do repositorio fora do sys.path
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+    from src.models.pkpd.monte_carlo_pta import cockcroft_gault
+    from src.monitoring.metrics import REGISTRY, record
+
+DB_PATH = "database/oncopharm.db"
+SCHEMA_PATH = "database/schemas/07_renal_alert.sql"
+
+# Regras KDIGO (LRA pela creatinina) avaliadas a cada resultado, no caminho da ingestao
+CREAT_CODE = "CREAT"
+UMOL_L_POR_MG_DL = 88.42
+BASAL_JANELA_H = 7 * 24          # basal = menor creatinina dos 7 dias anteriores
+DELTA_JANELA_H = 48              # aumento absoluto em 48h
+DELTA_MG_DL = 0.3
+RAZAO_ESTAGIO = ((3.0, 3), (2.0, 2), (1.5, 1))
+ESTAGIO3_ABS_MG_DL = 4.0
+# Cisplatina: CrCl (Cockcroft-Gault) abaixo de 60 mL/min pede revisao de dose
+CRCL_LIMITE_ML_MIN = 60.0
+# Pacientes mantidos em memoria (LRU); os demais sao reidratados do banco quando voltarem
+MAX_PACIENTES = 200_000
+# Metrica de alertas emitidos (por estagio)
+ALERTS_TOTAL = "oncopharm_renal_alerts_total"
+
+SQL_INSERT_RENAL_ALERT = """
+INSERT INTO renal_alert (
+    person_id, alert_datetime, estagio_kdigo, criterio, creatinina_mg_dl, basal_mg_dl,
+    razao_basal, delta_48h_mg_dl, crcl_ml_min, crcl_baixo, source_system, created_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def ensure_schema(conn, schema_path=SCHEMA_PATH):
+    """Cria a tabela renal_alert se ainda nao existir (idempotente)."""
+    if os.path.exists(schema_path):
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+
+
+def to_hours(obs_datetime):
+    """ISO 'AAAA-MM-DD HH:MM:SS' -> horas desde 1970 (escala das janelas)."""
+    return (datetime.fromisoformat(obs_datetime) - _EPOCH).total_seconds() / 3600.0
+
+
+def to_mg_dl(value, unit):
+    """Creatinina em mg/dL (aceita umol/L)."""
+    if unit and unit.lower().replace("µ", "u").startswith("umol"):
+        return value / UMOL_L_POR_MG_DL
+    return value
+
+
+class _JanelaMinimo:
+    """Minimo de uma janela deslizante no tempo (deque monotonica: O(1) amortizado)."""
+    __slots__ = ("horas", "itens")
+
+    def __init__(self, horas):
+        self.horas = horas
+        self.itens = deque()
+
+    def minimo(self, t):
+        itens = self.itens
+        while itens and itens[0][0] < t - self.horas:
+            itens.popleft()
+        return itens[0][1] if itens else None
+
+    def push(self, t, valor):
+        itens = self.itens
+        while itens and itens[-1][1] >= valor:
+            itens.pop()
+        itens.append((t, valor))
+
+
+class _EstadoRenal:
+    """Estado compacto por paciente: janelas de 7 dias e 48h, ultimo valor e alerta vigente."""
+    __slots__ = ("basal", "delta", "ultimo_t", "ultimo_valor", "estagio", "crcl_baixo", "demografia")
+
+    def __init__(self, demografia=None):
+        self.basal = _JanelaMinimo(BASAL_JANELA_H)
+        self.delta = _JanelaMinimo(DELTA_JANELA_H)
+        self.ultimo_t = None
+        self.ultimo_valor = None
+        self.estagio = 0
+        self.crcl_baixo = False
+        self.demografia = demografia  # (idade, peso_kg, feminino) ou None
+
+    def push(self, t, valor):
+        self.basal.push(t, valor)
+        self.delta.push(t, valor)
+        self.ultimo_t, self.ultimo_valor = t, valor
+
+
+def classify(valor, basal, minimo_48h):
+    """Estagio KDIGO e o criterio que o definiu (O(1), sem historico)."""
+    estagio, criterio = 0, None
+    razao = valor / basal if basal else None
+    if razao is not None:
+        for limite, est in RAZAO_ESTAGIO:
+            if razao >= limite:
+                estagio, criterio = est, "KDIGO_RAZAO"
+                break
+        if estagio < 3 and valor >= ESTAGIO3_ABS_MG_DL and valor - basal >= DELTA_MG_DL:
+            estagio, criterio = 3, "KDIGO_ABS"
+    delta = valor - minimo_48h if minimo_48h is not None else None
+    if estagio == 0 and delta is not None and delta >= DELTA_MG_DL:
+        estagio, criterio = 1, "KDIGO_48H"
+    return estagio, criterio, razao, delta
+
+
+class RenalRulesEngine:
+    """
+    Motor incremental de nefrotoxicidade: cada creatinina atualiza o estado do
+    paciente em O(1) e so gera linha em renal_alert quando o estado muda.
+    Na primeira vez que um paciente aparece o estado e aquecido do banco
+    (cadastro e, com aquecer=True, 7 dias de creatinina e ultimo alerta),
+    em consultas pelo indice. Seguro entre threads (pool da API).
+    """
+    def __init__(self, db_path=None, conn=None, max_pacientes=MAX_PACIENTES, aquecer=True):
+        self.conn = conn
+        if conn is None and db_path is not None:
+            self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._own_conn = conn is None and db_path is not None
+        self.max_pacientes = max_pacientes
+        self.aquecer = aquecer
+        self.estados = OrderedDict()
+        self.stats = {"resultados": 0, "alertas": 0, "hidratados": 0, "fora_de_ordem": 0}
+        self._lock = threading.Lock()
+
+    # --- Estado por paciente ---
+    def _hidratar(self, person_id, obs_datetime):
+        if self.conn is None:
+            return _EstadoRenal()
+        try:
+            pessoa = self.conn.execute(
+                "SELECT idade, peso_kg, gender_source_value FROM person WHERE person_id = ?", (person_id,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # Banco sem cadastro (so measurement/renal_alert): regras KDIGO sem CrCl
+            pessoa = None
+        demografia = None
+        if pessoa and pessoa[0] is not None and pessoa[1] is not None:
+            demografia = (float(pessoa[0]), float(pessoa[1]), str(pessoa[2] or "").upper().startswith("F"))
+        estado = _EstadoRenal(demografia)
+        self.stats["hidratados"] += 1
+        if not self.aquecer:
+            return estado
+
+        inicio = datetime.fromisoformat(obs_datetime) - timedelta(hours=BASAL_JANELA_H)
+        historico = self.conn.execute(
+            """SELECT measurement_datetime, value_as_number, unit_source_value
+               FROM measurement
+               WHERE person_id = ? AND measurement_source_value = ?
+                 AND measurement_datetime >= ? AND measurement_datetime < ?
+               ORDER BY measurement_datetime""",
+            (person_id, CREAT_CODE, inicio.isoformat(sep=" ", timespec="seconds"), obs_datetime),
+        ).fetchall()
+        for dt, valor, unidade in historico:
+            if valor is not None:
+                estado.push(to_hours(dt), to_mg_dl(valor, unidade))
+
+        ultimo = self.conn.execute(
+            """SELECT estagio_kdigo, crcl_baixo FROM renal_alert WHERE person_id = ?
+               ORDER BY alert_datetime DESC, alert_id DESC LIMIT 1""", (person_id,)
+        ).fetchone()
+        if ultimo:
+            estado.estagio, estado.crcl_baixo = int(ultimo[0]), bool(ultimo[1])
+        return estado
+
+    def _estado(self, person_id, obs_datetime):
+        estado = self.estados.get(person_id)
+        if estado is not None:
+            self.estados.move_to_end(person_id)
+            return estado
+        estado = self.estados[person_id] = self._hidratar(person_id, obs_datetime)
+        if len(self.estados) > self.max_pacientes:
+            self.estados.popitem(last=False)
+        return estado
+
+    # --- Avaliacao ---
+    def process(self, person_id, code, value, unit, obs_datetime, source_system=None):
+        """
+        Avalia um resultado. Devolve a linha para SQL_INSERT_RENAL_ALERT quando o
+        estado renal do paciente muda, senao None (demais exames: retorno imediato).
+        """
+        if value is None or str(code).upper() != CREAT_CODE:
+            return None
+        valor = to_mg_dl(float(value), unit)
+        if valor <= 0:
+            return None
+        try:
+            person_id = int(person_id)
+        except (TypeError, ValueError):
+            return None
+        t = to_hours(obs_datetime)
+
+        with self._lock:
+            self.stats["resultados"] += 1
+            estado = self._estado(person_id, obs_datetime)
+            if estado.ultimo_t is not None and t < estado.ultimo_t:
+                # Resultado atrasado: nao reabre as janelas (ja avancaram no tempo)
+                self.stats["fora_de_ordem"] += 1
+                return None
+            basal = estado.basal.minimo(t)
+            estagio, criterio, razao, delta = classify(valor, basal, estado.delta.minimo(t))
+            estado.push(t, valor)
+
+            crcl = None
+            if estado.demografia is not None:
+                idade, peso, feminino = estado.demografia
+                crcl = float(cockcroft_gault(idade, peso, valor, feminino))
+            crcl_baixo = crcl is not None and crcl < CRCL_LIMITE_ML_MIN
+
+            if (estagio, crcl_baixo) == (estado.estagio, estado.crcl_baixo):
+                return None
+            estado.estagio, estado.crcl_baixo = estagio, crcl_baixo
+            self.stats["alertas"] += 1
+
+        if criterio is None:
+            criterio = "CRCL_BAIXO" if crcl_baixo else "NORMALIZADO"
+        REGISTRY.inc(ALERTS_TOTAL, estagio=estagio, criterio=criterio)
+        return (
+            person_id, obs_datetime, estagio, criterio, round(valor, 3),
+            round(basal, 3) if basal is not None else None,
+            round(razao, 3) if razao is not None else None,
+            round(delta, 3) if delta is not None else None,
+            round(crcl, 1) if crcl is not None else None, int(crcl_baixo), source_system,
+            datetime.now().isoformat(sep=" ", timespec="seconds"),
+        )
+
+    def process_measurement(self, row):
+        """Avalia uma linha de SQL_INSERT_MEASUREMENT (omop_measurement.measurement_row)."""
+        return self.process(row[0], row[7], row[4], row[6], row[3], row[8])
+
+    def process_measurements(self, rows):
+        """Avalia varias linhas de measurement; devolve so as linhas de alerta."""
+        alertas = []
+        for row in rows:
+            alerta = self.process_measurement(row)
+            if alerta is not None:
+                alertas.append(alerta)
+        return alertas
+
+    def forget(self, person_ids):
+        """Descarta o estado em memoria (ex.: lote nao gravado); volta do banco no proximo resultado."""
+        with self._lock:
+            for person_id in person_ids:
+                try:
+                    self.estados.pop(int(person_id), None)
+                except (TypeError, ValueError):
+                    pass
+
+    def close(self):
+        if self._own_conn and self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# --- Consultas (dashboard) e reprocessamento ---
+
+def latest_status(conn, person_id):
+    """Ultima linha de renal_alert do paciente (estado renal vigente) como dict, ou None."""
+    cur = conn.execute(
+        """SELECT * FROM renal_alert WHERE person_id = ?
+           ORDER BY alert_datetime DESC, alert_id DESC LIMIT 1""", (person_id,))
+    row = cur.fetchone()
+    return dict(zip([c[0] for c in cur.description], row)) if row else None
+
+
+def rebuild(conn, chunk=50_000):
+    """
+    Refaz renal_alert a partir de toda a creatinina em measurement (ordem por
+    paciente e data/hora, pelo indice). Util apos mudar limites das regras.
+    """
+    ensure_schema(conn)
+    # O historico inteiro e reprocessado: do banco so vem o cadastro
+    engine = RenalRulesEngine(conn=conn, aquecer=False)
+    t0 = time.perf_counter()
+    cur = conn.cursor()
+    cur.execute(
+        """SELECT person_id, measurement_source_value, value_as_number, unit_source_value,
+                  measurement_datetime, source_system
+           FROM measurement WHERE measurement_source_value = ?
+           ORDER BY person_id, measurement_datetime""", (CREAT_CODE,))
+    alertas, n = [], 0
+    for row in cur:
+        n += 1
+        alerta = engine.process(*row)
+        if alerta is not None:
+            alertas.append(alerta)
+    with conn:
+        conn.execute("DELETE FROM renal_alert")
+        for i in range(0, len(alertas), chunk):
+            conn.executemany(SQL_INSERT_RENAL_ALERT, alertas[i:i + chunk])
+    elapsed = time.perf_counter() - t0
+    record("renal_rules", elapsed * 1000, items=n, kind="rebuild")
+    print(f"[OK] {n} creatininas reavaliadas, {len(alertas)} alertas em {elapsed:.1f} s "
+          f"({n / elapsed if elapsed > 0 else 0:.0f} resultados/s).")
+    return len(alertas)
+
+
+def benchmark(n_pacientes=50_000, exames_por_paciente=12, seed=42):
+    """Vazao do motor em memoria (resultados/s), sem banco: o custo que entra na ingestao."""
+    rng = np.random.default_rng(seed)
+    n = n_pacientes * exames_por_paciente
+    pids = rng.integers(1, n_pacientes + 1, n)
+    # Basal por paciente com variacao analitica; ~2% dos resultados com lesao aguda (1.5-3.5x)
+    basal = rng.lognormal(np.log(0.9), 0.25, n_pacientes + 1)
+    valores = basal[pids] * rng.lognormal(0.0, 0.06, n)
+    lesao = rng.random(n) < 0.02
+    valores[lesao] *= rng.uniform(1.5, 3.5, lesao.sum())
+    valores = np.round(valores, 2)
+    base = datetime(2025, 1, 1).timestamp()
+    # Tempo crescente: o feed chega em ordem cronologica
+    ts = [datetime.fromtimestamp(base + s).isoformat(sep=" ", timespec="seconds")
+          for s in np.sort(rng.uniform(0, 90 * 86400, n)).astype(int)]
+    engine = RenalRulesEngine()
+    for pid in range(1, n_pacientes + 1):
+        engine.estados[pid] = _EstadoRenal((float(rng.integers(30, 85)), float(rng.integers(45, 110)),
+                                            bool(rng.integers(0, 2))))
+    t0 = time.perf_counter()
+    alertas = 0
+    for pid, valor, dt in zip(pids.tolist(), valores.tolist(), ts):
+        if engine.process(pid, CREAT_CODE, valor, "mg/dL", dt) is not None:
+            alertas += 1
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] {n} creatininas de {n_pacientes} pacientes em {elapsed:.2f} s: "
+          f"{n / elapsed:.0f} resultados/s ({elapsed / n * 1e6:.1f} us/resultado), {alertas} alertas.")
+    return {"items": n, "seconds": elapsed, "alertas": alertas}
+
+
+if __name__ == "__main__":
+    # Uso: python src/models/toxicity/renal_rules.py [db_path] [--rebuild | --bench]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--bench" in sys.argv:
+        benchmark()
+        sys.exit(0)
+    db_path = args[0] if args else DB_PATH
+    if not os.path.exists(db_path):
+        print("[ERRO] Banco de dados nao encontrado.")
+        sys.exit(1)
+    conn = sqlite3.connect(db_path)
+    if "--rebuild" in sys.argv:
+        rebuild(conn)
+    else:
+        ensure_schema(conn)
+        ativos = conn.execute(
+            """SELECT a.person_id, a.alert_datetime, a.estagio_kdigo, a.criterio,
+                      a.creatinina_mg_dl, a.basal_mg_dl, a.crcl_ml_min
+               FROM renal_alert a
+               WHERE a.alert_id = (SELECT b.alert_id FROM renal_alert b WHERE b.person_id = a.person_id
+                                   ORDER BY b.alert_datetime DESC, b.alert_id DESC LIMIT 1)
+                 AND (a.estagio_kdigo > 0 OR a.crcl_baixo = 1)
+               ORDER BY a.estagio_kdigo DESC, a.alert_datetime DESC""").fetchall()
+        print(f"[INFO] {len(ativos)} paciente(s) com alerta renal vigente.")
+        for pid, dt, est, crit, creat, basal, crcl in ativos[:50]:
+            print(f"      {pid:>10} | {dt} | estagio {est} ({crit}) | creat {creat} mg/dL | "
+                  f"basal {basal if basal is not None else '-'} | CrCl {crcl if crcl is not None else '-'}")
+    conn.close()
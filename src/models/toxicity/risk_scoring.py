@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Artefato versionado do modelo de Cox (gerado offline; a pontuacao nao usa o sksurv)
+ARTIFACT_DIR = "data/models"
+MODEL_VERSION = "v1"
+COX_PATH = os.path.join(ARTIFACT_DIR, f"cox_toxicidade_{MODEL_VERSION}.joblib")
+COX_META = os.path.join(ARTIFACT_DIR, f"cox_toxicidade_{MODEL_VERSION}.json")
+
+DB_PATH = "database/oncopharm.db"
+FEATURES = ["dose_mg", "variante_genetica", "idade"]
+# Grade fixa de dias do ciclo (mesma janela de 30 dias do grafico)
+DAY_GRID = np.arange(0, 31, dtype=float)
+HORIZON_DAYS = 30
+RISK_THRESHOLD = 0.5
+
+# Variante genetica registrada como exame (1 = presente); ausente = 0
+VARIANT_CODE = "VARIANTE"
+DEFAULT_DOSE_MG = 75.0
+INACTIVE_STATUS = ("Alta", "Obito", "Óbito")
+
+
+def fit_cox_model(n=200):
+    """Ajusta o CoxPH (scikit-survival) na coorte sintetica de treino."""
+    from sksurv.linear_model import CoxPHSurvivalAnalysis
+    from sksurv.util import Surv
+    try:
+        from src.models.toxicity.predicao_risco import generate_synthetic_cohort
+    except ImportError:
+        from predicao_risco import generate_synthetic_cohort
+
+    train_data = generate_synthetic_cohort(n)
+    y = Surv.from_dataframe('teve_toxicidade', 'dias_observacao', train_data)
+    estimator = CoxPHSurvivalAnalysis()
+    estimator.fit(train_data[FEATURES], y)
+    return estimator, len(train_data)
+
+
+def export_model(estimator, day_grid=DAY_GRID):
+    """
+    Forma compacta para pontuacao: coeficientes e risco acumulado basal H0(t) ja
+    avaliado na grade de dias. S(t | x) = exp(-H0(t) * exp(x . beta)).
+    """
+    h0 = estimator.cum_baseline_hazard_
+    # Funcao degrau continua a direita; antes do primeiro evento H0 = 0
+    idx = np.searchsorted(h0.x, day_grid, side="right") - 1
+    h0_grid = np.where(idx >= 0, h0.y[np.maximum(idx, 0)], 0.0)
+    return {
+        "version": MODEL_VERSION,
+        "features": list(FEATURES),
+        "coef": np.asarray(estimator.coef_, dtype=float),
+        "day_grid": np.asarray(day_grid, dtype=float),
+        "cum_baseline_hazard": h0_grid,
+    }
+
+
+def train_cox_model(out_path=COX_PATH, meta_path=COX_META):
+    """Etapa OFFLINE: ajusta e serializa o modelo com metadados de versao."""
+    import joblib
+    import sksurv
+
+    estimator, n_rows = fit_cox_model()
+    model = export_model(estimator)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    joblib.dump(model, out_path, compress=3)
+    meta = {
+        "version": MODEL_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "sksurv_version": sksurv.__version__,
+        "train_rows": n_rows,
+        "features": model["features"],
+        "coef": model["coef"].round(6).tolist(),
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Modelo de Cox salvo: {out_path} ({n_rows} pacientes de treino)")
+    return model
+
+
+def load_cox_model(path=COX_PATH):
+    """Carrega o artefato; sem ele, ajusta em memoria (exige scikit-survival)."""
+    if os.path.exists(path):
+        import joblib
+        return joblib.load(path)
+    print(f"[AVISO] Artefato {path} ausente; ajustando em memoria. "
+          f"Rode: python src/models/toxicity/risk_scoring.py --train")
+    return export_model(fit_cox_model()[0])
+
+
+def survival_matrix(model, X):
+    """
+    Probabilidade livre de toxicidade para N pacientes x G dias (matriz densa).
+    X: DataFrame com as colunas de FEATURES ou array (N, F).
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X[model["features"]].to_numpy(dtype=float)
+    risk = np.exp(np.asarray(X, dtype=float) @ model["coef"])               # (N,)
+    return np.exp(-np.multiply.outer(risk, model["cum_baseline_hazard"]))   # (N, G)
+
+
+def rank_at_risk(model, cohort, horizon=HORIZON_DAYS, threshold=RISK_THRESHOLD, top=None):
+    """
+    Pontua a coorte inteira de uma vez e devolve os pacientes ordenados pelo risco
+    de toxicidade ate 'horizon' dias (1 - S(horizon)), com a flag em_risco.
+    """
+    surv = survival_matrix(model, cohort)
+    col = int(np.searchsorted(model["day_grid"], horizon, side="right")) - 1
+    ranked = cohort.assign(risco=1.0 - surv[:, col])
+    ranked["em_risco"] = ranked["risco"] >= threshold
+    ranked = ranked.sort_values("risco", ascending=False, kind="stable")
+    return ranked.head(top) if top else ranked
+
+
+def load_active_cohort(conn):
+    """
+    Pacientes ativos com as covariaveis do modelo: dose do ultimo episodio
+    (episode_source_value 'Dose: 75mg | ...', senao 75 mg), variante genetica
+    (exame) e idade.
+    """
+    df = pd.read_sql_query(
+        f"""SELECT p.person_id, p.idade,
+                   (SELECT e.episode_source_value FROM episode e
+                     WHERE e.person_id = p.person_id AND e.episode_number = 1
+                     ORDER BY COALESCE(e.episode_start_datetime, e.episode_start_date) DESC
+                     LIMIT 1) AS episodio,
+                   (SELECT m.value_as_number FROM measurement m
+                     WHERE m.person_id = p.person_id AND m.measurement_source_value = ?
+                     ORDER BY m.measurement_datetime DESC LIMIT 1) AS variante_genetica
+            FROM person p
+            WHERE p.status IS NULL OR p.status NOT IN ({','.join('?' * len(INACTIVE_STATUS))})""",
+        conn, params=(VARIANT_CODE, *INACTIVE_STATUS),
+    )
+    dose = df.pop("episodio").str.extract(r"Dose:\s*([\d.,]+)", expand=False)
+    df.insert(1, "dose_mg", pd.to_numeric(dose.str.replace(",", "."), errors="coerce").fillna(DEFAULT_DOSE_MG))
+    df["variante_genetica"] = (df["variante_genetica"].fillna(0) > 0).astype(int)
+    df["idade"] = df["idade"].fillna(60)
+    return df
+
+
+def benchmark(n_patients=50_000, seed=42):
+    """Pontuacao vetorizada vs. predict_survival_function (StepFunctions por paciente)."""
+    rng = np.random.default_rng(seed)
+    cohort = pd.DataFrame({
+        "person_id": np.arange(n_patients),
+        "dose_mg": rng.normal(70, 15, n_patients),
+        "variante_genetica": rng.binomial(1, 0.3, n_patients),
+        "idade": rng.normal(60, 10, n_patients),
+    })
+    model = load_cox_model()
+
+    t0 = time.perf_counter()
+    ranked = rank_at_risk(model, cohort)
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] Matriz {n_patients} x {len(model['day_grid'])} dias + ranking em {elapsed * 1000:.1f} ms "
+          f"({n_patients / elapsed:.0f} pacientes/s) | {int(ranked['em_risco'].sum())} em risco")
+
+    try:
+        estimator = fit_cox_model()[0]
+    except ImportError:
+        return
+    sample = cohort[FEATURES].head(2_000)
+    t0 = time.perf_counter()
+    fns = estimator.predict_survival_function(sample)
+    legacy = np.array([fn(model["day_grid"][1:]) for fn in fns])
+    elapsed = time.perf_counter() - t0
+    diff = np.abs(legacy - survival_matrix(model, sample)[:, 1:]).max()
+    print(f"[OK] StepFunctions (linha de base): {len(sample) / elapsed:.0f} pacientes/s | "
+          f"diferenca maxima {diff:.2e}")
+
+
+if __name__ == "__main__":
+    # python src/models/toxicity/risk_scoring.py [--train | --bench] [db_path]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--train" in sys.argv or not os.path.exists(COX_PATH):
+        train_cox_model()
+    if "--bench" in sys.argv:
+        benchmark()
+    elif "--train" not in sys.argv:
+        conn = sqlite3.connect(args[0] if args else DB_PATH)
+        ranked = rank_at_risk(load_cox_model(), load_active_cohort(conn))
+        conn.close()
+        print(f"[OK] {len(ranked)} pacientes ativos pontuados; {int(ranked['em_risco'].sum())} em risco "
+              f"(>= {RISK_THRESHOLD:.0%} em {HORIZON_DAYS} dias)")
+        print(ranked.head(20).to_string(index=False))
@@ -0,0 +1,253 @@
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Camada unica de instrumentacao: contadores + histogramas de latencia por estagio
+# (hl7_parse, db_write, api_request, nlp_inference, pk_simulation, llm_call),
+# expostos em /metrics (api_server) e registrados linha a linha em logs/.
+LOG_DIR = "logs"
+# Um arquivo por componente/processo (varios processos nao rotacionam o mesmo arquivo)
+TIMING_LOG_PATTERN = "timings_{component}.jsonl"
+TIMING_LOG_MAX_BYTES = 20 * 1024 * 1024
+TIMING_LOG_BACKUPS = 5
+# Limites dos baldes do histograma (ms); o ultimo e +Inf
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+STAGE_LATENCY = "oncopharm_stage_latency_ms"
+STAGE_TOTAL = "oncopharm_stage_total"
+STAGE_ITEMS = "oncopharm_stage_items_total"
+HELP = {
+    STAGE_LATENCY: "Latencia por estagio (ms)",
+    STAGE_TOTAL: "Execucoes por estagio e status",
+    STAGE_ITEMS: "Itens processados por estagio (mensagens, linhas, notas, pacientes, tokens)",
+}
+
+
+def _key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets):
+        self.counts = [0] * (n_buckets + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Contadores e histogramas em memoria (por processo), seguros entre threads."""
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(float(b) for b in buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value_ms, **labels):
+        key = (name, _key(labels))
+        i = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(len(self.buckets))
+            hist.counts[i] += 1
+            hist.total += value_ms
+            hist.count += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def quantile(self, hist, q):
+        """Estimativa pelo balde (interpolacao linear dentro do balde)."""
+        if hist.count == 0:
+            return None
+        rank = q * hist.count
+        seen = 0
+        for i, c in enumerate(hist.counts):
+            if c and seen + c >= rank:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def snapshot(self):
+        """Visao JSON: contadores e, por histograma, contagem, media e p50/p95/p99 estimados."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(h.counts), h.total, h.count) for k, h in self._histograms.items()}
+        out = {"counters": [], "histograms": []}
+        for (name, labels), value in sorted(counters.items()):
+            out["counters"].append({"name": name, "labels": dict(labels), "value": value})
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            hist = _Histogram(len(self.buckets))
+            hist.counts, hist.total, hist.count = counts, total, count
+            out["histograms"].append({
+                "name": name, "labels": dict(labels), "count": count,
+                "mean_ms": round(total / count, 4) if count else None,
+                **{f"p{int(q * 100)}_ms": round(self.quantile(hist, q), 4) for q in (0.5, 0.95, 0.99)},
+            })
+        return out
+
+    def render_prometheus(self):
+        """Formato texto de exposicao do Prometheus (0.0.4)."""
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                                  for k, v in items) + "}"
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, (list(h.counts), h.total, h.count)) for k, h in self._histograms.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            lines.append(f"{name}{fmt_labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{fmt_labels(labels)} {total:.6g}")
+            lines.append(f"{name}_count{fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# --- Log estruturado de tempos (JSON por linha), gravado fora da thread chamadora ---
+
+_timing_logger = None
+_listener = None
+_log_lock = threading.Lock()
+_component = None
+
+
+def configure(component=None, log_dir=LOG_DIR):
+    """Define o nome do componente (arquivo logs/timings_<componente>.jsonl). Opcional."""
+    global _component, _timing_logger, _listener
+    with _log_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        _timing_logger = None
+        _component = component
+        _setup_timing_log(log_dir)
+
+
+def _setup_timing_log(log_dir=LOG_DIR):
+    global _timing_logger, _listener, _component
+    if _component is None:
+        # Nome do script em execucao (python -c / REPL -> "python")
+        script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ""))[0]
+        _component = script if script and not script.startswith("-") else "python"
+    logger = logging.getLogger(f"oncopharm.timing.{_component}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, TIMING_LOG_PATTERN.format(component=_component)),
+            maxBytes=TIMING_LOG_MAX_BYTES, backupCount=TIMING_LOG_BACKUPS, encoding="utf-8")
+    except OSError as e:
+        print(f"[AVISO] Log de tempos desativado ({e}).")
+        logger.disabled = True
+        _timing_logger = logger
+        return logger
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log_queue = queue.SimpleQueue()
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    _timing_logger = logger
+    return logger
+
+
+def _get_timing_logger():
+    if _timing_logger is None:
+        with _log_lock:
+            if _timing_logger is None:
+                _setup_timing_log()
+    return _timing_logger
+
+
+@atexit.register
+def _stop_listener():
+    # Esvazia a fila do log antes de o processo terminar
+    if _listener is not None:
+        _listener.stop()
+
+
+def record(stage, ms, status="ok", items=None, **labels):
+    """Registra uma execucao ja cronometrada: histograma, contadores e linha no log de tempos."""
+    REGISTRY.observe(STAGE_LATENCY, ms, stage=stage, **labels)
+    REGISTRY.inc(STAGE_TOTAL, stage=stage, status=status, **labels)
+    if items is not None:
+        REGISTRY.inc(STAGE_ITEMS, items, stage=stage, **labels)
+    logger = _get_timing_logger()
+    if not logger.disabled:
+        event = {"ts": datetime.now().isoformat(timespec="milliseconds"), "pid": os.getpid(),
+                 "stage": stage, "ms": round(ms, 4), "status": status}
+        if items is not None:
+            event["items"] = items
+        event.update({k: v for k, v in labels.items() if v is not None})
+        logger.info(json.dumps(event, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def track(stage, items=None, **labels):
+    """
+    Cronometra um bloco (ou funcao, como decorador). Excecoes contam como status=error
+    e sao repassadas. O dict devolvido permite ajustar 'items'/'status' dentro do bloco.
+    """
+    info = {"items": items, "status": "ok"}
+    t0 = time.perf_counter()
+    try:
+        yield info
+    except BaseException:
+        info["status"] = "error"
+        raise
+    finally:
+        record(stage, (time.perf_counter() - t0) * 1000, info["status"], info["items"], **labels)
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def render_prometheus():
+    return REGISTRY.render_prometheus()
+
+
+def print_summary(registry=REGISTRY):
+    """Tabela por estagio (contagem, media, p50/p95/p99) para scripts de linha de comando."""
+    for h in registry.snapshot()["histograms"]:
+        labels = ",".join(f"{k}={v}" for k, v in h["labels"].items() if k != "stage")
+        print(f"      {h['labels'].get('stage', h['name']):14s} {labels:28s} n={h['count']:<8d} "
+              f"media {h['mean_ms']:.3f} ms | p50 {h['p50_ms']:.3f} | p95 {h['p95_ms']:.3f} | p99 {h['p99_ms']:.3f}")
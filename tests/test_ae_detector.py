@@ -0,0 +1,62 @@
+import pandas as pd
+
+from src.models.nlp.ae_detector import PharmacovigilanceNLP, normalize
+
+
+def _dicionario(tmp_path):
+    path = tmp_path / "ctcae.csv"
+    path.write_text(
+        "termo,sinonimos,grau,risco,acao\n"
+        "insuficiência renal,lesão renal,G3,Alto,Suspender\n"
+        "insuficiência renal aguda,IRA,G4,Alto,URGENTE\n"
+        "diarreia,diarréia;evacuações líquidas,G2,Médio,Hidratação\n"
+        "renal,,G1,Baixo,-\n",
+        encoding="utf-8")
+    return str(path)
+
+
+def test_normalize_preserva_offsets():
+    texto = "Diarréia e NÁUSEA"
+    assert normalize(texto) == "diarreia e nausea"
+    assert len(normalize(texto)) == len(texto)
+
+
+def test_acentos_e_offsets():
+    nlp = PharmacovigilanceNLP()
+    texto = "Paciente com DIARRÉIA intensa, febre e diarreia de novo."
+    eventos = {e["termo"]: e for e in nlp.analyze_text(texto)}
+    assert set(eventos) == {"Diarreia", "Febre"}
+    trechos = [(o["inicio"], o["fim"], o["trecho"]) for o in eventos["Diarreia"]["ocorrencias"]]
+    assert [t for _, _, t in trechos] == ["DIARRÉIA", "diarreia"]
+    assert all(texto[i:f] == t for i, f, t in trechos)
+    # Palavra inteira: 'febres' nao e 'febre'
+    assert nlp.analyze_text("sem febres") == []
+
+
+def test_termos_sobrepostos_casamento_mais_longo(tmp_path):
+    nlp = PharmacovigilanceNLP(_dicionario(tmp_path))
+    texto = "Evolui com Insuficiência Renal Aguda; antes, insuficiência renal e função renal estável."
+    matches = nlp.find_matches(texto)
+    assert [(texto[i:f], termo) for i, f, termo in matches] == [
+        ("Insuficiência Renal Aguda", "insuficiência renal aguda"),
+        ("insuficiência renal", "insuficiência renal"),
+        ("renal", "renal"),
+    ]
+
+
+def test_sinonimos_de_varias_palavras(tmp_path):
+    nlp = PharmacovigilanceNLP(_dicionario(tmp_path))
+    texto = "IRA e evacuações líquidas; lesão renal prévia."
+    assert [(texto[i:f], termo) for i, f, termo in nlp.find_matches(texto)] == [
+        ("IRA", "insuficiência renal aguda"),
+        ("evacuações líquidas", "diarreia"),
+        ("lesão renal", "insuficiência renal"),
+    ]
+
+
+def test_analyze_batch_series():
+    nlp = PharmacovigilanceNLP()
+    notas = pd.Series(["febre alta", None, "rash leve"], index=[10, 11, 12])
+    out = nlp.analyze_batch(notas)
+    assert list(out.index) == [10, 11, 12]
+    assert [[e["termo"] for e in r] for r in out] == [["Febre"], [], ["Rash"]]
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+import httpx
+import pytest
+
+from src.integration import api_server
+from src.monitoring import metrics
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+EXAME = {"patient_id": 1, "exam_code": "CREAT", "value": 1.2, "unit": "mg/dL", "source_system": "SAP"}
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    db_path = str(tmp_path / "oncopharm.db")
+    sqlite3.connect(db_path).close()
+    monkeypatch.setattr(api_server, "DB_PATH", db_path)
+    metrics.REGISTRY.reset()
+    yield db_path
+    if api_server._ingest is not None:
+        api_server._ingest.close()
+        api_server._ingest = None
+
+
+async def _post(*requests):
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+        return [await client.request(method, url, json=body) for method, url, body in requests]
+
+
+def test_rotas_individual_e_em_lote(api):
+    single, batch, stats = asyncio.run(_post(
+        ("POST", "/api/v1/integrate/lab-result", EXAME),
+        ("POST", "/api/v1/integrate/lab-results", [dict(EXAME, patient_id=i) for i in (2, 3, 4)]),
+        ("GET", "/api/v1/integrate/stats", None),
+    ))
+    assert single.status_code == 200 and single.json()["status"] == "received"
+    assert batch.status_code == 200 and batch.json() == {"status": "received", "count": 3}
+    routes = {h["labels"].get("route") for h in stats.json()["histograms"] if h["labels"]["stage"] == "api_request"}
+    assert routes == {"lab-result", "lab-results"}
+
+    assert api_server._ingest.flush(timeout=10)
+    conn = sqlite3.connect(api)
+    assert sorted(p for (p,) in conn.execute("SELECT person_id FROM measurement")) == [1, 2, 3, 4]
+    conn.close()
+
+
+def test_lote_grande_e_payload_invalido(api, monkeypatch):
+    monkeypatch.setattr(api_server, "MAX_BATCH_SIZE", 2)
+    grande, invalido, vazio = asyncio.run(_post(
+        ("POST", "/api/v1/integrate/lab-results", [EXAME] * 3),
+        ("POST", "/api/v1/integrate/lab-result", dict(EXAME, value="alto")),
+        ("POST", "/api/v1/integrate/lab-results", []),
+    ))
+    assert grande.status_code == 413
+    assert invalido.status_code == 422
+    assert vazio.json() == {"status": "received", "count": 0}
+
+
+def test_append_fora_do_event_loop(api):
+    threads = []
+    ingest = api_server.get_ingest()
+    original = ingest.append
+
+    def append(rows):
+        threads.append(threading.current_thread())
+        return original(rows)
+
+    ingest.append = append
+    (resp,) = asyncio.run(_post(("POST", "/api/v1/integrate/lab-result", EXAME)))
+    assert resp.status_code == 200
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,59 @@
+import glob
+import os
+import sqlite3
+
+import pytest
+
+from src.app import chart_pipeline
+from src.models.pkpd import mipd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """Dois pacientes ativos com ajuste MIPD salvo em pk_fit."""
+    monkeypatch.chdir(ROOT)
+    conn = sqlite3.connect(str(tmp_path / "oncopharm.db"))
+    for schema in sorted(glob.glob(os.path.join("database", "schemas", "*.sql"))):
+        with open(schema, encoding="utf-8") as f:
+            conn.executescript(f.read())
+    with conn:
+        conn.executemany("INSERT INTO person (person_id, idade, peso_kg, bsa_m2, gender_source_value, status) "
+                         "VALUES (?, ?, 70, 1.8, 'M', 'Tratamento')", [(1, 50), (2, 70)])
+    mipd.fit_patients(conn, [1, 2])
+    yield conn
+    conn.close()
+
+
+def _files(out, kind):
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(out, "*", f"{kind}_*.png")))
+
+
+def test_cache_hit_miss_e_limpeza(conn, tmp_path):
+    out = str(tmp_path / "graficos")
+    report = chart_pipeline.render_census(conn, out, workers=1, dpi=50)
+    assert (report["charts"], report["rendered"], report["cache_hits"]) == (4, 4, 0)
+    pk_antes = _files(out, "pk")
+
+    # Mesmas entradas: tudo do cache
+    report = chart_pipeline.render_census(conn, out, workers=1, dpi=50)
+    assert (report["rendered"], report["cache_hits"]) == (0, 4)
+
+    # Nova dose do paciente 1: so a curva PK dele e refeita, a versao antiga e apagada
+    with conn:
+        conn.execute("UPDATE pk_fit SET dose_recomendada_mg = dose_recomendada_mg - 5 WHERE person_id = 1")
+    report = chart_pipeline.render_census(conn, out, workers=1, dpi=50)
+    assert (report["rendered"], report["cache_hits"]) == (1, 3)
+    assert len(glob.glob(os.path.join(out, "1", "pk_*.png"))) == 1
+    assert _files(out, "pk") != pk_antes
+    assert not glob.glob(os.path.join(out, "*", "*.tmp.png"))
+
+
+def test_dpi_faz_parte_da_chave(conn, tmp_path):
+    out = str(tmp_path / "graficos")
+    chart_pipeline.render_census(conn, out, workers=1, dpi=50)
+    report = chart_pipeline.render_census(conn, out, workers=1, dpi=60)
+    assert (report["rendered"], report["cache_hits"]) == (4, 0)
+    # Um arquivo por grafico: a resolucao anterior e substituida
+    assert len(glob.glob(os.path.join(out, "*", "*.png"))) == 4
@@ -0,0 +1,115 @@
+import glob
+import importlib.util
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+from src.analytics import columnar_store
+from src.analytics.columnar_store import AnalyticsStore, export_table
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _load_etl():
+    spec = importlib.util.spec_from_file_location("load_to_sql", os.path.join(ROOT, "src", "etl", "02_load_to_sql.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def etl_db(tmp_path, monkeypatch):
+    """Banco com episodios gravados pelo proprio ETL 02 ('Dose: X | Tox: grau_N')."""
+    monkeypatch.chdir(ROOT)
+    csv_path = tmp_path / "dados_limpos.csv"
+    linhas = ["id_paciente,dose_cisplatina,toxicidade_renal"]
+    # 10 pacientes por faixa: <50, 50-74, 75-99, >=100; graus 0..4 em rodizio
+    for i, dose in enumerate([40.0] * 10 + [60.0] * 10 + [80.0] * 10 + [110.0] * 10, start=1):
+        linhas.append(f"{i},{dose},grau_{i % 5}")
+    csv_path.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+
+    conn = sqlite3.connect(str(tmp_path / "oncopharm.db"))
+    for schema in sorted(glob.glob(os.path.join("database", "schemas", "*.sql"))):
+        with open(schema, encoding="utf-8") as f:
+            conn.executescript(f.read())
+    _load_etl().load_data(conn, str(csv_path))
+    yield conn
+    conn.close()
+
+
+def test_exportacao_de_episodios_do_etl(etl_db, tmp_path):
+    analytics_dir = str(tmp_path / "analytics")
+    assert export_table(etl_db, "episode", analytics_dir) == 40
+    # Segunda execucao: nada novo acima da marca d'agua
+    assert export_table(etl_db, "episode", analytics_dir) == 0
+
+    store = AnalyticsStore(analytics_dir)
+    assert store.query("SELECT COUNT(grau_tox) AS n FROM episode")["n"][0] == 40
+    df = store.nephrotoxicity_by_dose_band(date(2025, 1, 1), date(2026, 1, 1))
+    store.close()
+    assert list(df["faixa_dose"]) == ["<50", "50-74", "75-99", ">=100"]
+    # grau_3 e grau_4 em cada faixa de 10 pacientes
+    assert list(df["graves"]) == [4, 4, 4, 4]
+    assert list(df["taxa_grave_pct"]) == [40.0] * 4
+
+
+def test_quarter_bounds():
+    assert columnar_store.quarter_bounds(date(2026, 11, 5)) == (date(2026, 10, 1), date(2027, 1, 1))
+    assert columnar_store.quarter_bounds(date(2026, 2, 1)) == (date(2026, 1, 1), date(2026, 4, 1))
+
+
+def test_compactacao_interrompida_nao_duplica(etl_db, tmp_path):
+    analytics_dir = str(tmp_path / "analytics")
+    table_dir = os.path.join(analytics_dir, "episode")
+    assert export_table(etl_db, "episode", analytics_dir, chunk_rows=10) == 40
+    parts = columnar_store._parts(table_dir)
+    assert len(parts) == 4
+
+    # Queda entre gravar a parte compactada e apagar as antigas
+    merged = columnar_store._part_path(table_dir, parts[0][0], parts[-1][1])
+    con = columnar_store.duckdb.connect()
+    files = ", ".join(f"'{p}'" for _, _, p in parts)
+    columnar_store._write_parquet(con, f"SELECT * FROM read_parquet([{files}])", merged)
+    con.close()
+
+    store = AnalyticsStore(analytics_dir)
+    assert store.query("SELECT COUNT(*) AS n FROM episode")["n"][0] == 40
+    # Proxima execucao apaga as sobras cobertas
+    assert columnar_store.compact_table("episode", analytics_dir) == 0
+    assert [p[2] for p in columnar_store._parts(table_dir)] == [merged]
+    assert len(glob.glob(os.path.join(table_dir, "*.parquet"))) == 1
+    assert store.query("SELECT COUNT(*) AS n FROM episode")["n"][0] == 40
+    store.close()
+
+
+def test_compactacao(etl_db, tmp_path):
+    analytics_dir = str(tmp_path / "analytics")
+    export_table(etl_db, "episode", analytics_dir, chunk_rows=10)
+    assert columnar_store.compact_table("episode", analytics_dir, max_parts=2) == 4
+    assert len(columnar_store._parts(os.path.join(analytics_dir, "episode"))) == 1
+    store = AnalyticsStore(analytics_dir)
+    assert store.query("SELECT COUNT(DISTINCT episode_id) AS n FROM episode")["n"][0] == 40
+    store.close()
+
+
+def test_person_regravado_quando_cadastro_muda(etl_db, tmp_path):
+    analytics_dir = str(tmp_path / "analytics")
+    with etl_db:
+        etl_db.executemany("INSERT INTO person (person_id, gender_source_value, idade, peso_kg, bsa_m2, status) "
+                           "VALUES (?, ?, 60, ?, 1.8, 'Tratamento')", [(1, "M", 70.0), (2, "F", 80.0)])
+    assert columnar_store.export_person(etl_db, analytics_dir) == 2
+    assert columnar_store.export_person(etl_db, analytics_dir) == 0
+
+    # Contagem e somas iguais: so o conteudo muda (status, sexo, pesos trocados)
+    with etl_db:
+        etl_db.execute("UPDATE person SET status = 'Alta', gender_source_value = 'F' WHERE person_id = 1")
+        etl_db.execute("UPDATE person SET peso_kg = 150.0 - peso_kg")
+    assert columnar_store.export_person(etl_db, analytics_dir) == 2
+    store = AnalyticsStore(analytics_dir)
+    df = store.query("SELECT person_id, sexo, peso_kg, status FROM person ORDER BY person_id")
+    store.close()
+    assert list(df["status"]) == ["Alta", "Tratamento"]
+    assert list(df["sexo"]) == ["F", "F"]
+    assert list(df["peso_kg"]) == [80.0, 70.0]
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from src.integration.adapters.hl7_tasy_mv import GroupCommitWriter
+
+SQL = "INSERT INTO t (id, valor) VALUES (?, ?)"
+
+
+def _db(tmp_path):
+    db_path = str(tmp_path / "t.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, valor REAL NOT NULL)")
+    conn.close()
+    return db_path
+
+
+def test_linha_invalida_nao_trava_o_lote(tmp_path):
+    db_path = _db(tmp_path)
+    writer = GroupCommitWriter(db_path, SQL, batch_size=4, flush_interval=60, verbose=False)
+    for row in [(1, 1.0), (2, None), (3, 3.0), (1, 9.0), (5, 5.0), (6, 6.0)]:
+        writer.add(row)
+    assert writer.close() == 0
+    assert [r for r, _ in writer.rejected] == [(2, None), (1, 9.0)]
+
+    conn = sqlite3.connect(db_path)
+    assert [r[0] for r in conn.execute("SELECT id FROM t ORDER BY id")] == [1, 3, 5, 6]
+    conn.close()
+
+
+def test_banco_travado_limita_buffer_e_reporta(tmp_path):
+    db_path = _db(tmp_path)
+    writer = GroupCommitWriter(db_path, SQL, batch_size=2, flush_interval=0.01, verbose=False, max_buffer=3)
+    writer.conn.execute("PRAGMA busy_timeout = 0")
+    lock = sqlite3.connect(db_path)
+    lock.execute("BEGIN IMMEDIATE")
+    writer.add((1, 1.0))
+    writer.add((2, 2.0))
+    writer.add((3, 3.0))
+    with pytest.raises(sqlite3.OperationalError):
+        writer.add((4, 4.0))
+    assert writer.close() == 3
+    assert writer.unsaved == [(1, 1.0), (2, 2.0), (3, 3.0)]
+    lock.rollback()
+    lock.close()
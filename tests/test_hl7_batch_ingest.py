@@ -0,0 +1,92 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.integration.adapters import hl7_batch_ingest
+from src.integration.adapters.hl7_batch_ingest import ingest_batch_file, parse_observations
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _oru(msg_id, pid, ts, obx):
+    segments = [f"MSH|^~\\&|TASY|LAB|ONCO|CDSS|{ts}||ORU^R01|{msg_id}|P|2.3"]
+    if pid is not None:
+        segments.append(f"PID|1||{pid}^^^TASY||PACIENTE^TESTE")
+    segments.append("OBR|1|||PAINEL^Painel renal")
+    for i, (code, value, unit, obs_ts) in enumerate(obx, start=1):
+        segments.append(f"OBX|{i}|NM|{code}^{code}||{value}|{unit}|||N||F|||{obs_ts}")
+    return segments
+
+
+def _write_batch(path, messages, newline="\r"):
+    lines = ["FHS|^~\\&|TASY", "BHS|^~\\&|TASY"]
+    for segments in messages:
+        lines.extend(segments)
+    lines += ["BTS|%d" % len(messages), "FTS|1"]
+    path.write_bytes(newline.join(lines).encode("utf-8") + b"\r")
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    path = str(tmp_path / "oncopharm.db")
+    sqlite3.connect(path).close()
+    return path
+
+
+def test_parse_multi_obx():
+    records = parse_observations(_oru("M1", 7, "20260101", [("CREAT", "0.9", "mg/dL", "20260101080000"),
+                                                            ("K", "4.1", "mmol/L", "")]))
+    assert [(r["patient_id"], r["exam_code"], r["value"], r["set_id"]) for r in records] == [
+        ("7", "CREAT", "0.9", "1"), ("7", "K", "4.1", "2")]
+    # OBX-14 vazio: vale o MSH-7
+    assert records[1]["obs_datetime"] == "20260101"
+    with pytest.raises(ValueError):
+        parse_observations(_oru("M2", None, "20260101", [("K", "4.0", "mmol/L", "")]))
+
+
+@pytest.mark.parametrize("newline", ["\r", "\n", "\r\n"])
+def test_arquivo_de_lote_multi_obx(db_path, tmp_path, newline):
+    path = tmp_path / "lote.hl7"
+    _write_batch(path, [
+        _oru("M1", 1, "20260101", [("CREAT", "0.8", "mg/dL", "20260101080000"), ("K", "4.1", "mmol/L", ""),
+                                   ("NA", "140", "mmol/L", "")]),
+        _oru("M2", None, "20260101", [("K", "4.0", "mmol/L", "")]),
+        _oru("M3", 1, "20260102", [("CREAT", "2.0", "mg/dL", "20260102080000")]),
+    ], newline)
+    report = ingest_batch_file(str(path), db_path, batch_size=2, chunk_size=64)
+    assert (report["messages"], report["obx"], report["errors"]) == (3, 4, 1)
+    assert report["renal_alerts"] == 1 and report["rows_rejected"] == 0
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT person_id, measurement_source_value, value_as_number, measurement_datetime "
+                        "FROM measurement ORDER BY measurement_id").fetchall()
+    assert rows == [(1, "CREAT", 0.8, "2026-01-01 08:00:00"), (1, "K", 4.1, "2026-01-01 00:00:00"),
+                    (1, "NA", 140.0, "2026-01-01 00:00:00"), (1, "CREAT", 2.0, "2026-01-02 08:00:00")]
+    assert conn.execute("SELECT estagio_kdigo FROM renal_alert").fetchall() == [(2,)]
+    conn.close()
+
+
+def test_alerta_so_para_exame_gravado(db_path, tmp_path, monkeypatch):
+    conn = sqlite3.connect(db_path)
+    hl7_batch_ingest.ensure_schema(conn)
+    # Banco recusa a creatinina absurda: sem measurement, sem alerta
+    conn.execute("""CREATE TRIGGER recusa BEFORE INSERT ON measurement WHEN NEW.value_as_number > 100
+                    BEGIN SELECT RAISE(ABORT, 'valor fora da faixa'); END""")
+    conn.commit()
+    conn.close()
+
+    path = tmp_path / "lote.hl7"
+    _write_batch(path, [
+        _oru("M1", 1, "20260101", [("CREAT", "0.8", "mg/dL", "20260101080000")]),
+        _oru("M2", 1, "20260102", [("CREAT", "250", "mg/dL", "20260102080000"),
+                                   ("CREAT", "0.9", "mg/dL", "20260102090000")]),
+    ])
+    report = ingest_batch_file(str(path), db_path, batch_size=10)
+    assert report["rows_rejected"] == 1 and report["renal_alerts"] == 0
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM measurement").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM renal_alert").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,76 @@
+import glob
+import importlib.util
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _load_etl():
+    spec = importlib.util.spec_from_file_location("ingest_data", os.path.join(ROOT, "src", "etl", "01_ingest_data.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+etl = _load_etl()
+
+
+def _paths(tmp_path):
+    return str(tmp_path / "dados_limpos.csv"), str(tmp_path / "dados_limpos_parquet")
+
+
+def test_parsing_de_dose_e_grau():
+    df = pd.DataFrame({"ID_Paciente ": pd.array([1, 2, 3, 4], dtype="Int64"),
+                       "Dose_Cisplatina": pd.array(["75mg", "82,5 mg", "100", None], dtype="string"),
+                       "Toxicidade_Renal": pd.array(["grau_1", "Grau 3", "sem dado", None], dtype="string")})
+    out = etl.transform_chunk(df)
+    assert list(out.columns[:3]) == ["id_paciente", "dose_cisplatina", "toxicidade_renal"]
+    assert out["dose_cisplatina_mg"].tolist()[:3] == [75.0, 82.5, 100.0]
+    assert pd.isna(out["dose_cisplatina_mg"].iloc[3])
+    assert out["toxicidade_renal_grau"].tolist() == [1, 3, pd.NA, pd.NA]
+
+
+def test_saida_csv_e_parquet_particionado(tmp_path):
+    raw = tmp_path / "dados_teste.csv"
+    raw.write_text("ID_Paciente,Dose_Cisplatina,Toxicidade_Renal\n"
+                   + "".join(f"{i},{70 + i}mg,grau_{i % 3}\n" for i in range(1, 8)), encoding="utf-8")
+    csv_path, parquet_dir = _paths(tmp_path)
+    etl.run_etl(str(raw), csv_path, parquet_dir, chunk_rows=3)
+
+    df = pd.read_csv(csv_path)
+    assert df["id_paciente"].tolist() == list(range(1, 8))
+    assert sorted(os.path.basename(p) for p in glob.glob(os.path.join(parquet_dir, "*"))) == [
+        "toxicidade_renal_grau=0", "toxicidade_renal_grau=1", "toxicidade_renal_grau=2"]
+    files = glob.glob(os.path.join(parquet_dir, "**", "*.parquet"), recursive=True)
+    table = pd.concat([pq.read_table(f).to_pandas() for f in files]).sort_values("linha_origem")
+    assert table["id_paciente"].tolist() == list(range(1, 8))
+    assert table["linha_origem"].tolist() == list(range(7))
+
+
+def test_entrada_vazia_apaga_saida_anterior(tmp_path):
+    raw = tmp_path / "dados_teste.csv"
+    raw.write_text("id_paciente,dose_cisplatina,toxicidade_renal\n1,75mg,grau_1\n", encoding="utf-8")
+    csv_path, parquet_dir = _paths(tmp_path)
+    etl.run_etl(str(raw), csv_path, parquet_dir)
+
+    raw.write_text("id_paciente,dose_cisplatina,toxicidade_renal\n", encoding="utf-8")
+    etl.run_etl(str(raw), csv_path, parquet_dir)
+    assert pd.read_csv(csv_path).empty
+    assert not os.path.exists(parquet_dir)
+
+
+def test_tipo_invalido_cai_no_caminho_de_erro(tmp_path, capsys):
+    raw = tmp_path / "dados_teste.csv"
+    raw.write_text("id_paciente,dose_cisplatina,toxicidade_renal\n1,75mg,grau_1\n", encoding="utf-8")
+    csv_path, parquet_dir = _paths(tmp_path)
+    etl.run_etl(str(raw), csv_path, parquet_dir)
+
+    # id_paciente nao inteiro no segundo bloco: ValueError ao iterar o leitor
+    raw.write_text("id_paciente,dose_cisplatina,toxicidade_renal\n1,75mg,grau_1\nabc,80mg,grau_2\n",
+                   encoding="utf-8")
+    etl.run_etl(str(raw), csv_path, parquet_dir, chunk_rows=1)
+    assert "Erro ao ler CSV" in capsys.readouterr().out
+    assert not os.path.exists(csv_path) and not os.path.exists(parquet_dir)
@@ -0,0 +1,52 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from src.integration.adapters import ingest_spool
+from src.integration.adapters.ingest_spool import IngestSpool, SpooledIngest
+from src.integration.adapters.omop_measurement import measurement_row
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture
+def ingest(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(ingest_spool, "RETRY_BASE_S", 0.01)
+    db_path = str(tmp_path / "oncopharm.db")
+    sqlite3.connect(db_path).close()
+    spooled = SpooledIngest(db_path, "teste", batch_size=50, flush_interval=0.05, verbose=False,
+                            directory=str(tmp_path / "spool"))
+    yield spooled
+    spooled.close()
+
+
+def _count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM measurement").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_registro_invalido_vai_para_dead_letter(ingest):
+    ingest.append([measurement_row(1, "K", "4.1", "mmol/L", "2026-01-01 08:00:00", "TESTE")])
+    # Linha com colunas a menos: erro permanente (bindings), nao some com nova tentativa
+    ingest.spool.append({"t": "measurement", "rows": [[1, 0, "2026-01-01"]]})
+    # Payload sem 'rows': KeyError fora do sqlite3 nao pode derrubar a thread
+    ingest.spool.append({"t": "measurement"})
+    ingest.append([measurement_row(2, "K", "3.9", "mmol/L", "2026-01-01 09:00:00", "TESTE")])
+
+    assert ingest.flush(timeout=20)
+    assert ingest.drainer._thread.is_alive()
+    assert _count(ingest.drainer.db_path) == 2
+    assert ingest.drainer.stats["dead_letter"] == 2
+    with open(ingest.drainer.dead_letter_path, encoding="utf-8") as f:
+        assert [json.loads(line)["seq"] for line in f] == [2, 3]
+
+
+def test_spool_travado_entre_processos(ingest):
+    with pytest.raises(RuntimeError):
+        IngestSpool(ingest.spool.directory)
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.ai.llm_groq import GroqSecondOpinion, ResponseCache
+
+CASO = ("Paciente com creatinina em alta.", "Grau 3/4 (Grave)", [{"word": "creatinina"}])
+
+
+def _chunk(content=None, finish=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish)])
+
+
+class FakeClient:
+    """Cliente Groq falso: conta as chamadas e devolve 'tokens' (com atraso) e o finish_reason."""
+    def __init__(self, tokens, finish="stop"):
+        self.calls = 0
+        self.tokens = tokens
+        self.finish = finish
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+
+        async def stream():
+            for token in self.tokens:
+                await asyncio.sleep(0.01)
+                yield _chunk(token)
+            yield _chunk(finish=self.finish)
+        return stream()
+
+    async def close(self):
+        pass
+
+
+def _service(client):
+    service = GroqSecondOpinion(api_key="teste", cache=ResponseCache(":memory:"))
+    service._client = client
+    service._semaphore = asyncio.Semaphore(4)
+    return service
+
+
+async def _ask(service):
+    return "".join([token async for token in service.astream(*CASO)])
+
+
+def test_chamadas_identicas_simultaneas_sao_agrupadas():
+    client = FakeClient(["Reduzir ", "dose."])
+    service = _service(client)
+
+    async def run():
+        return await asyncio.gather(*[_ask(service) for _ in range(8)])
+
+    assert asyncio.run(run()) == ["Reduzir dose."] * 8
+    assert client.calls == 1
+    # Resposta completa vai para o cache
+    assert asyncio.run(_ask(service)) == "Reduzir dose."
+    assert client.calls == 1
+
+
+def test_resposta_vazia_ou_truncada_nao_entra_no_cache():
+    for client in (FakeClient([]), FakeClient(["Parcial"], finish="length")):
+        service = _service(client)
+        asyncio.run(_ask(service))
+        asyncio.run(_ask(service))
+        assert client.calls == 2
+
+
+def test_close_encerra_o_event_loop():
+    service = GroqSecondOpinion(api_key="teste", cache=ResponseCache(":memory:"))
+    loop = service._ensure_loop()
+    service.close()
+    assert loop.is_closed()
+    assert not service._thread.is_alive()
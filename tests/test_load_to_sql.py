@@ -0,0 +1,85 @@
+import glob
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _load_etl():
+    spec = importlib.util.spec_from_file_location("load_to_sql", os.path.join(ROOT, "src", "etl", "02_load_to_sql.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+etl = _load_etl()
+
+
+def _write_csv(path, ids):
+    linhas = ["id_paciente,dose_cisplatina,toxicidade_renal"] + [f"{i},75.0,grau_{i % 5}" for i in ids]
+    path.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+
+
+def _ids(conn):
+    return [r[0] for r in conn.execute("SELECT episode_id FROM episode ORDER BY episode_id")]
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    conn = sqlite3.connect(str(tmp_path / "oncopharm.db"))
+    for schema in sorted(glob.glob(os.path.join("database", "schemas", "*.sql"))):
+        with open(schema, encoding="utf-8") as f:
+            conn.executescript(f.read())
+    yield conn
+    conn.close()
+
+
+def test_retoma_carga_interrompida(conn, tmp_path, monkeypatch):
+    csv_path = tmp_path / "dados_limpos.csv"
+    _write_csv(csv_path, range(1, 11))
+
+    # Falha no terceiro bloco: os dois primeiros ja estao gravados com o checkpoint
+    original, calls = etl.build_episode_rows, []
+
+    def falha_no_terceiro(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 3:
+            raise RuntimeError("queda")
+        return original(chunk)
+
+    monkeypatch.setattr(etl, "build_episode_rows", falha_no_terceiro)
+    with pytest.raises(RuntimeError):
+        etl.load_data(conn, str(csv_path), chunk_rows=3)
+    assert _ids(conn) == [1, 2, 3, 4, 5, 6]
+    assert etl.get_checkpoint(conn, etl.checkpoint_source(str(csv_path))) == 6
+
+    monkeypatch.setattr(etl, "build_episode_rows", original)
+    etl.load_data(conn, str(csv_path), chunk_rows=3)
+    assert _ids(conn) == list(range(1, 11))
+    # Carga completa: o checkpoint e removido
+    assert conn.execute("SELECT COUNT(*) FROM etl_checkpoint").fetchone()[0] == 0
+
+
+def test_csv_reescrito_e_lido_inteiro(conn, tmp_path):
+    csv_path = tmp_path / "dados_limpos.csv"
+    _write_csv(csv_path, range(1, 6))
+    etl.load_data(conn, str(csv_path), chunk_rows=2)
+
+    # ETL 01 rodou de novo: pacientes novos no inicio do arquivo
+    _write_csv(csv_path, [20, 21, 1, 2, 3, 4, 5])
+    etl.load_data(conn, str(csv_path), chunk_rows=2)
+    assert _ids(conn) == [1, 2, 3, 4, 5, 20, 21]
+
+
+def test_checkpoint_de_versao_anterior_e_descartado(conn, tmp_path):
+    csv_path = tmp_path / "dados_limpos.csv"
+    _write_csv(csv_path, range(1, 6))
+    with conn:
+        conn.execute("INSERT INTO etl_checkpoint (source, rows_done) VALUES (?, 3)", (f"{csv_path}:1:1",))
+    etl.load_data(conn, str(csv_path), chunk_rows=2)
+    assert _ids(conn) == [1, 2, 3, 4, 5]
+    assert conn.execute("SELECT COUNT(*) FROM etl_checkpoint").fetchone()[0] == 0
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from src.monitoring import metrics
+
+
+@pytest.fixture
+def timing_log(tmp_path, monkeypatch):
+    """Log de tempos isolado em tmp_path; o logger global volta ao estado anterior."""
+    for name in ("_timing_logger", "_listener", "_component"):
+        monkeypatch.setattr(metrics, name, getattr(metrics, name))
+    monkeypatch.setattr(metrics, "_listener", None)
+    metrics.configure("pytest", log_dir=str(tmp_path))
+    metrics.REGISTRY.reset()
+    listener = metrics._listener
+
+    def read_events():
+        # Parar o listener esvazia a fila no arquivo
+        nonlocal listener
+        if listener is not None:
+            listener.stop()
+            listener = None
+        with open(os.path.join(str(tmp_path), "timings_pytest.jsonl"), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    yield read_events
+    if listener is not None:
+        listener.stop()
+    metrics.REGISTRY.reset()
+
+
+def _counter(snap, name, **labels):
+    labels = {k: str(v) for k, v in labels.items()}
+    return sum(c["value"] for c in snap["counters"] if c["name"] == name and c["labels"] == labels)
+
+
+def test_record_e_track(timing_log):
+    metrics.record("db_write", 3.0, items=10, sink="teste")
+    with metrics.track("nlp_inference") as info:
+        info["items"] = 2
+    with pytest.raises(RuntimeError):
+        with metrics.track("nlp_inference"):
+            raise RuntimeError("falha")
+
+    snap = metrics.snapshot()
+    assert _counter(snap, metrics.STAGE_TOTAL, stage="db_write", status="ok", sink="teste") == 1
+    assert _counter(snap, metrics.STAGE_ITEMS, stage="db_write", sink="teste") == 10
+    assert _counter(snap, metrics.STAGE_TOTAL, stage="nlp_inference", status="ok") == 1
+    assert _counter(snap, metrics.STAGE_TOTAL, stage="nlp_inference", status="error") == 1
+    hist = {h["labels"]["stage"]: h for h in snap["histograms"]}
+    assert hist["nlp_inference"]["count"] == 2
+    assert hist["db_write"]["mean_ms"] == 3.0
+
+    events = timing_log()
+    assert [e["stage"] for e in events] == ["db_write", "nlp_inference", "nlp_inference"]
+    assert events[0]["items"] == 10 and events[0]["sink"] == "teste"
+    assert events[2]["status"] == "error"
+
+
+def test_quantis_por_balde():
+    registry = metrics.MetricsRegistry(buckets=(1, 10, 100))
+    for ms in [0.5] * 50 + [5] * 45 + [50] * 5:
+        registry.observe("lat", ms, stage="x")
+    (hist,) = registry.snapshot()["histograms"]
+    assert hist["count"] == 100
+    # p50 cai no fim do primeiro balde; p95 no fim do segundo; p99 dentro do terceiro
+    assert hist["p50_ms"] == pytest.approx(1.0)
+    assert hist["p95_ms"] == pytest.approx(10.0)
+    assert 10.0 < hist["p99_ms"] <= 100.0
+    registry.reset()
+    assert registry.snapshot() == {"counters": [], "histograms": []}
+
+
+def test_formato_prometheus():
+    registry = metrics.MetricsRegistry(buckets=(1, 10))
+    registry.inc(metrics.STAGE_TOTAL, stage="api_request", status="ok", path='/a"b')
+    registry.observe(metrics.STAGE_LATENCY, 5.0, stage="api_request")
+    registry.observe(metrics.STAGE_LATENCY, 50.0, stage="api_request")
+    lines = registry.render_prometheus().splitlines()
+    assert f"# TYPE {metrics.STAGE_TOTAL} counter" in lines
+    assert f"# TYPE {metrics.STAGE_LATENCY} histogram" in lines
+    assert f'{metrics.STAGE_TOTAL}{{path="/a\\"b",stage="api_request",status="ok"}} 1' in lines
+    buckets = [l for l in lines if l.startswith(f"{metrics.STAGE_LATENCY}_bucket")]
+    assert [l.rsplit(" ", 1)[1] for l in buckets] == ["0", "1", "2"]
+    assert buckets[-1].startswith(f'{metrics.STAGE_LATENCY}_bucket{{stage="api_request",le="+Inf"}}')
+    assert f'{metrics.STAGE_LATENCY}_sum{{stage="api_request"}} 55' in lines
+    assert f'{metrics.STAGE_LATENCY}_count{{stage="api_request"}} 2' in lines
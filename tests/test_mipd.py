@@ -0,0 +1,71 @@
+import glob
+import os
+import sqlite3
+
+import pytest
+
+from src.app.data_access import PatientRepository
+from src.integration.adapters.omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+from src.models.pkpd import mipd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """Paciente 1 cadastrado em person; paciente 2 so com exames (chegou via HL7/API)."""
+    monkeypatch.chdir(ROOT)
+    conn = sqlite3.connect(str(tmp_path / "oncopharm.db"))
+    for schema in sorted(glob.glob(os.path.join("database", "schemas", "*.sql"))):
+        with open(schema, encoding="utf-8") as f:
+            conn.executescript(f.read())
+    conn.execute("INSERT INTO person (person_id, idade, peso_kg, bsa_m2, gender_source_value) "
+                 "VALUES (1, 55, 70, 1.8, 'M')")
+    for pid in (1, 2):
+        conn.execute(
+            """INSERT INTO episode (person_id, episode_concept_id, episode_start_date, episode_start_datetime,
+                                    episode_number, episode_object_concept_id, episode_type_concept_id,
+                                    episode_source_value)
+               VALUES (?, 0, '2026-01-01', '2026-01-01 08:00:00', 1, 0, 0, 'Dose: 100.0 | Tox: grau_0')""",
+            (pid,))
+        conn.executemany(SQL_INSERT_MEASUREMENT, [
+            measurement_row(pid, "CREAT", "1.0", "mg/dL", "2026-01-01 07:00:00", "TASY"),
+            measurement_row(pid, "CISPL", "2.0", "mg/L", "2026-01-01 10:00:00", "TASY"),
+            measurement_row(pid, "CISPL", "0.8", "mg/L", "2026-01-01 20:00:00", "TASY"),
+        ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_paciente_sem_cadastro_nao_derruba_o_ajuste(conn):
+    fits = mipd.fit_patients(conn, [1, 2])
+    assert list(fits.index) == [1]
+    assert fits.loc[1, "n_obs"] == 2
+    assert fits.loc[1, "cl_L_h"] > 0
+
+
+def test_update_pending_avanca_a_marca_dagua(conn):
+    assert mipd.update_pending(conn) == 2
+    max_id = conn.execute("SELECT MAX(measurement_id) FROM measurement").fetchone()[0]
+    assert conn.execute("SELECT rows_done FROM etl_checkpoint WHERE source = ?",
+                        (mipd.CHECKPOINT_SOURCE,)).fetchone()[0] == max_id
+    assert mipd.update_pending(conn) == 0
+    assert list(mipd.load_fits(conn, [1, 2], refit_stale=False).index) == [1]
+
+
+def test_dashboard_so_le_ajustes_salvos(conn, tmp_path):
+    repo = PatientRepository(str(tmp_path / "oncopharm.db"))
+    # Sem ajuste salvo: nada e estimado nem gravado durante a renderizacao
+    assert repo.get_mipd(1) is None
+    assert conn.execute("SELECT COUNT(*) FROM pk_fit").fetchone()[0] == 0
+
+    mipd.update_pending(conn)
+    with conn:
+        conn.execute("UPDATE pk_fit SET fitted_at = '2026-01-02 00:00:00'")
+        # Nivel com data futura nao dispara reajuste a cada rerun
+        conn.executemany(SQL_INSERT_MEASUREMENT,
+                         [measurement_row(1, "CISPL", "0.5", "mg/L", "2099-01-01 08:00:00", "TASY")])
+    assert repo.get_mipd(1)["fitted_at"] == "2026-01-02 00:00:00"
+    assert conn.execute("SELECT fitted_at FROM pk_fit WHERE person_id = 1").fetchone()[0] == "2026-01-02 00:00:00"
+    repo.conn.close()
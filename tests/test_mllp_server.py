@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from src.integration.adapters.hl7_tasy_mv import HospitalInterfaceEngine
+from src.integration.adapters.mllp_server import MLLPServer, build_ack, frame, send_mllp, unframe
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ORU = ("MSH|^~\\&|TASY|LAB|ONCO|CDSS|20260101080000||ORU^R01|{id}|P|2.3\r"
+       "PID|1||{pid}^^^TASY||PACIENTE^TESTE\rOBR|1|||PAINEL^Painel\r{obx}")
+OBX = "OBX|1|NM|CREAT^Creatinina||1.1|mg/dL|||N||F\rOBX|2|NM|K^Potassio||4.2|mmol/L|||N||F"
+
+
+def _msa(ack):
+    return [seg for seg in ack.split("\r") if seg.startswith("MSA")][0].split("|")
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    path = str(tmp_path / "oncopharm.db")
+    sqlite3.connect(path).close()
+    return path
+
+
+def _round_trip(db_path, messages, patch=None):
+    async def run():
+        engine = HospitalInterfaceEngine(db_path=db_path, verbose=False)
+        if patch:
+            patch(engine)
+        server = await MLLPServer(engine, host="127.0.0.1", port=0).start()
+        try:
+            return await send_mllp(messages, port=server.port), server.stats
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def test_moldura_e_ack():
+    assert unframe(frame("MSH|x")) == "MSH|x"
+    msa = _msa(build_ack(ORU.format(id="C1", pid=1, obx=OBX), "AE", "falha|grave"))
+    assert msa == ["MSA", "AE", "C1", "falha grave"]
+
+
+def test_aa_ar_e_gravacao(db_path):
+    acks, stats = _round_trip(db_path, [
+        ORU.format(id="M1", pid=1, obx=OBX),
+        "PID|1||2^^^TASY||SEM^MSH",
+        ORU.format(id="M3", pid=3, obx=""),
+    ])
+    assert [_msa(a)[1:3] for a in acks] == [["AA", "M1"], ["AR", ""], ["AR", "M3"]]
+    assert stats["acks"] == 1 and stats["naks"] == 2
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT person_id, measurement_source_value FROM measurement "
+                        "ORDER BY measurement_id").fetchall() == [(1, "CREAT"), (1, "K")]
+    conn.close()
+
+
+def test_ae_quando_o_fsync_falha(db_path):
+    def falha(engine):
+        def sync(timeout=None):
+            raise OSError("disco cheio")
+        engine.sync = sync
+
+    acks, stats = _round_trip(db_path, [ORU.format(id="M1", pid=1, obx=OBX), "SEM MSH"], falha)
+    assert _msa(acks[0])[1] == "AE" and "disco cheio" in _msa(acks[0])[3]
+    # Rejeicao continua AR: reenviar nao adianta
+    assert _msa(acks[1])[1] == "AR"
+    assert stats["acks"] == 0
+
+
+def test_ae_quando_o_fsync_nao_confirma(db_path):
+    acks, _ = _round_trip(db_path, [ORU.format(id="M1", pid=1, obx=OBX)],
+                          lambda engine: setattr(engine, "sync", lambda timeout=None: False))
+    assert _msa(acks[0])[1] == "AE"
@@ -0,0 +1,36 @@
+import numpy as np
+
+from src.models.pkpd import monte_carlo_pta as mc
+
+
+def test_resultado_independe_do_numero_de_processos():
+    um = mc.simulate_pta(2_500, workers=1, chunk_size=1_000)
+    dois = mc.simulate_pta(2_500, workers=2, chunk_size=1_000)
+    assert um["n"] == dois["n"] == 2_500
+    np.testing.assert_array_equal(um["pta_time_above"], dois["pta_time_above"])
+    np.testing.assert_array_equal(um["pta_cmax"], dois["pta_cmax"])
+
+
+def test_pta_cai_com_a_dose():
+    res = mc.simulate_pta(2_000, workers=1, chunk_size=500)
+    assert np.all(np.diff(res["pta_time_above"]) <= 0)
+    assert np.all(np.diff(res["pta_cmax"]) <= 0)
+    assert 0.0 <= res["pta_time_above"].min() <= res["pta_time_above"].max() <= 1.0
+
+
+def test_bloco_igual_a_referencia_por_paciente():
+    covariates = {"peso_kg": 70.0, "bsa_m2": 1.8, "crcl_ml_min": 90.0}
+    seed = np.random.SeedSequence(7)
+    doses = (50.0, 100.0)
+    part = mc._simulate_chunk((seed, 200, doses, 0.0, covariates, 1.5, 6.0))
+
+    # Mesmos pacientes (mesma semente); bolus: C(t) = dose/V * exp(-CL/V * t)
+    pop = mc.sample_population(200, np.random.default_rng(seed), covariates)
+    t = np.linspace(0, mc.HOURS, mc.N_TIMES)
+    for j, dose in enumerate(doses):
+        conc = dose / pop["v1"][:, None] * np.exp(-(pop["cl"] / pop["v1"])[:, None] * t)
+        mid = (conc[:, 1:] + conc[:, :-1]) / 2.0
+        above = (mid > 1.5) @ np.diff(t)
+        assert part["ok_time"][j] == (above <= 6.0).sum()
+        assert part["ok_cmax"][j] == (conc.max(axis=1) < 1.5).sum()
+
@@ -0,0 +1,26 @@
+import os
+import sqlite3
+
+from src.models.nlp.model_store import MODEL_VERSION, severity_version
+from src.models.nlp.note_scoring import lookup_scores, save_scores, text_hash
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def test_retreino_invalida_cache(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    with open(os.path.join(ROOT, "database", "schemas", "05_note_nlp_score.sql"), encoding="utf-8") as f:
+        conn.executescript(f.read())
+    artifact = tmp_path / "severidade.joblib"
+    artifact.write_bytes(b"modelo-1")
+    v1 = severity_version(str(artifact))
+    h = text_hash("Dor intensa e vomitos")
+    save_scores(conn, [h], [("Grau 3/4 (Grave)", 0.9, [])], v1)
+    assert lookup_scores(conn, [h], v1)[h]["g"] == "Grau 3/4 (Grave)"
+
+    # Retreino sob o mesmo MODEL_VERSION: nova chave, resultado antigo nao e reutilizado
+    artifact.write_bytes(b"modelo-2 retreinado")
+    v2 = severity_version(str(artifact))
+    assert v2 != v1 and v2.startswith(MODEL_VERSION) and len(v2) <= 20
+    assert lookup_scores(conn, [h], v2) == {}
+    conn.close()
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.app import data_access as da
+from src.integration.adapters.omop_measurement import SQL_INSERT_MEASUREMENT, measurement_row
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    repo = da.PatientRepository(str(tmp_path / "oncopharm.db"))
+    repo.seed(pd.DataFrame(da.DEMO_PATIENTS), pd.DataFrame(da.DEMO_EXAMS), pd.DataFrame(da.DEMO_NOTES))
+    yield repo
+    repo.conn.close()
+
+
+def test_versao_sobe_a_cada_escrita(repo):
+    # Carga inicial: pessoa + 1 exame + 1 nota por paciente
+    assert repo.get_version(1001) == repo.get_version(1002) == 3
+    assert repo.get_version(4242) == 0
+
+    with repo.conn:
+        repo.conn.execute(SQL_INSERT_MEASUREMENT,
+                          measurement_row(1001, "CREAT", 1.1, "mg/dL", "2026-01-02 08:00:00", "TASY"))
+    assert repo.get_version(1001) == 4
+
+    with repo.conn:
+        repo.conn.execute("INSERT INTO note (person_id, note_date, note_text) VALUES (1001, '2026-01-02', 'Sem queixas.')")
+    assert repo.get_version(1001) == 5
+
+    with repo.conn:
+        repo.conn.execute("UPDATE person SET status = 'Alta' WHERE person_id = 1001")
+    assert repo.get_version(1001) == 6
+
+    with repo.conn:
+        repo.conn.execute("INSERT INTO person (person_id, person_source_value) VALUES (2001, 'Novo Paciente')")
+    assert repo.get_version(2001) == 1
+    # Escritas de outros pacientes nao invalidam o cache deste
+    assert repo.get_version(1002) == 3
@@ -0,0 +1,41 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from src.models.pkpd import pk_engine
+from src.models.pkpd.pk_engine import concentrations, exponentials
+
+
+def _superposicao(t, dose, cl, v1, q, v2, tinf, tau, n_doses):
+    """Referencia: soma dose a dose das respostas unitarias."""
+    a, lam = exponentials(cl, v1, q, v2)
+    total = np.zeros_like(t)
+    for j in range(n_doses):
+        total += (a * pk_engine._unit_response(lam, t[:, None] - j * tau, tinf)).sum(axis=-1)
+    return dose / v1 * total
+
+
+@pytest.mark.parametrize("cl, v1, q, v2, tinf, tau, n_doses", [
+    (3.0, 20.0, 0.0, 1.0, 0.0, 24.0, 6),
+    (3.0, 20.0, 1.5, 40.0, 2.0, 24.0, 6),
+    (1e-8, 20.0, 0.0, 1.0, 1.0, 24.0, 4),      # r ~ 1 (serie degenera em 'last')
+    (30.0, 20.0, 0.0, 1.0, 0.0, 504.0, 3),     # lambda * tau > 745: r subfluxa para 0
+    (30.0, 20.0, 1.5, 40.0, 3.0, 504.0, 3),
+])
+def test_serie_geometrica_igual_a_superposicao(cl, v1, q, v2, tinf, tau, n_doses):
+    t = np.linspace(0.0, tau * (n_doses + 1), 97)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        conc = concentrations(t, 100.0, cl, v1, q, v2, tinf, tau, n_doses)
+    assert np.isfinite(conc).all()
+    np.testing.assert_allclose(conc, _superposicao(t, 100.0, cl, v1, q, v2, tinf, tau, n_doses),
+                               rtol=1e-6, atol=1e-12)
+
+
+def test_simulate_ward_formato():
+    t = np.linspace(0, 48, 49)
+    conc, resumo = pk_engine.simulate_ward({"cl": [3.0, 30.0], "v1": [20.0, 20.0]},
+                                           {"dose": [100.0, 150.0], "tau": [24.0, 504.0], "n_doses": [2, 3]}, t)
+    assert conc.shape == (2, 2, 49)
+    assert np.isfinite(resumo["auc_mg_h_L"]).all()
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.integration.adapters.ingest_spool import SpooledIngest
+from src.integration.adapters.omop_measurement import ensure_schema, measurement_row
+from src.models.toxicity import renal_rules
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture
+def db_sem_cadastro(tmp_path, monkeypatch):
+    """Banco so com measurement + renal_alert (como o criado pelo spool/HL7): sem a tabela person."""
+    monkeypatch.chdir(ROOT)
+    db_path = str(tmp_path / "oncopharm.db")
+    conn = sqlite3.connect(db_path)
+    ensure_schema(conn)
+    renal_rules.ensure_schema(conn)
+    conn.close()
+    return db_path
+
+
+def test_regras_sem_tabela_person(db_sem_cadastro):
+    engine = renal_rules.RenalRulesEngine(db_path=db_sem_cadastro)
+    assert engine.process(1, "CREAT", 0.8, "mg/dL", "2026-01-01 08:00:00") is None
+    alerta = engine.process(1, "CREAT", 1.6, "mg/dL", "2026-01-02 08:00:00")
+    assert alerta is not None
+    assert alerta[2] == 2 and alerta[3] == "KDIGO_RAZAO"
+    # Sem cadastro nao ha CrCl
+    assert alerta[8] is None and alerta[9] == 0
+    engine.close()
+
+
+def test_spool_drena_sem_tabela_person(db_sem_cadastro, tmp_path):
+    ingest = SpooledIngest(db_sem_cadastro, "teste", verbose=False, directory=str(tmp_path / "spool"))
+    ingest.append([measurement_row(7, "CREAT", "0.8", "mg/dL", "2026-01-01 08:00:00", "TESTE"),
+                   measurement_row(7, "CREAT", "2.5", "mg/dL", "2026-01-02 08:00:00", "TESTE")])
+    assert ingest.flush(timeout=10)
+    assert ingest.drainer.stats["retries"] == 0
+    ingest.close()
+
+    conn = sqlite3.connect(db_sem_cadastro)
+    assert conn.execute("SELECT COUNT(*) FROM measurement").fetchone()[0] == 2
+    assert conn.execute("SELECT estagio_kdigo FROM renal_alert WHERE person_id = 7").fetchone()[0] == 3
+    conn.close()
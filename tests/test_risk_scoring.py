@@ -0,0 +1,70 @@
+import glob
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.toxicity import risk_scoring as rs
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.fixture(scope="module")
+def estimator():
+    return rs.fit_cox_model()[0]
+
+
+def _cohort(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"person_id": np.arange(n), "dose_mg": rng.normal(70, 15, n),
+                         "variante_genetica": rng.binomial(1, 0.3, n), "idade": rng.normal(60, 10, n)})
+
+
+def test_matriz_vetorizada_igual_ao_sksurv(estimator):
+    model = rs.export_model(estimator)
+    cohort = _cohort()
+    fns = estimator.predict_survival_function(cohort[rs.FEATURES])
+    legacy = np.array([fn(model["day_grid"][1:]) for fn in fns])
+    surv = rs.survival_matrix(model, cohort)
+    assert surv.shape == (len(cohort), len(rs.DAY_GRID))
+    np.testing.assert_allclose(surv[:, 1:], legacy, rtol=1e-10, atol=1e-12)
+    # Antes do primeiro evento ninguem teve toxicidade
+    assert np.all(surv[:, 0] == 1.0)
+
+
+def test_ranking_e_artefato(estimator, tmp_path):
+    path, meta = str(tmp_path / "cox.joblib"), str(tmp_path / "cox.json")
+    rs.train_cox_model(path, meta)
+    model = rs.load_cox_model(path)
+    cohort = _cohort(50)
+    ranked = rs.rank_at_risk(model, cohort, top=10)
+    assert len(ranked) == 10
+    assert ranked["risco"].is_monotonic_decreasing
+    assert (ranked["em_risco"] == (ranked["risco"] >= rs.RISK_THRESHOLD)).all()
+    full = 1.0 - rs.survival_matrix(model, cohort)[:, -1]
+    assert ranked["risco"].iloc[0] == pytest.approx(full.max())
+
+
+def test_coorte_ativa(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    conn = sqlite3.connect(str(tmp_path / "oncopharm.db"))
+    for schema in sorted(glob.glob(os.path.join("database", "schemas", "*.sql"))):
+        with open(schema, encoding="utf-8") as f:
+            conn.executescript(f.read())
+    conn.executemany("INSERT INTO person (person_id, idade, status) VALUES (?, ?, ?)",
+                     [(1, 50, "Tratamento"), (2, None, None), (3, 70, "Alta")])
+    conn.execute("""INSERT INTO episode (person_id, episode_concept_id, episode_start_date, episode_number,
+                                         episode_object_concept_id, episode_type_concept_id, episode_source_value)
+                    VALUES (1, 0, '2026-01-01', 1, 0, 0, 'Dose: 82,5 | Tox: grau_1')""")
+    conn.execute("""INSERT INTO measurement (person_id, measurement_concept_id, measurement_date,
+                                             measurement_datetime, measurement_type_concept_id, value_as_number,
+                                             measurement_source_value)
+                    VALUES (1, 0, '2026-01-01', '2026-01-01 08:00:00', 0, 1, 'VARIANTE')""")
+    cohort = rs.load_active_cohort(conn).set_index("person_id")
+    conn.close()
+    assert list(cohort.index) == [1, 2]
+    assert cohort.loc[1, "dose_mg"] == 82.5 and cohort.loc[2, "dose_mg"] == rs.DEFAULT_DOSE_MG
+    assert list(cohort["variante_genetica"]) == [1, 0]
+    assert cohort.loc[2, "idade"] == 60
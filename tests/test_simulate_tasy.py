@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from src.integration import simulate_tasy as st
+from src.integration.adapters.mllp_server import END_BLOCK, build_ack, frame, unframe
+
+
+async def _ack_server(reader, writer):
+    """Responde AA para toda mensagem (sem banco: mede so o gerador)."""
+    try:
+        while True:
+            try:
+                data = await reader.readuntil(END_BLOCK)
+            except asyncio.IncompleteReadError:
+                break
+            writer.write(frame(build_ack(unframe(data))))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _silent_server(reader, writer):
+    """Le e nunca responde: simula o servidor travado ate o cliente desistir."""
+    await reader.read()
+    writer.close()
+
+
+async def _load(handler, **kwargs):
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await st.run_load(port=port, **kwargs)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_carga_mllp_sustentada():
+    report = asyncio.run(_load(_ack_server, rate=50, concurrency=4, duration=0.4))
+    assert report["sent"] == report["ok"] == 20
+    assert report["errors"] == report["backlog"] == 0
+    assert report["p99_ms"] is not None and report["p50_ms"] <= report["p99_ms"]
+
+
+def test_backlog_quando_servidor_nao_responde(monkeypatch):
+    monkeypatch.setattr(st, "DRAIN_TIMEOUT_S", 0.5)
+    report = asyncio.run(_load(_silent_server, rate=40, concurrency=4, duration=0.5))
+    # Cada worker fica preso na primeira mensagem; o resto nunca sai da fila
+    assert report["sent"] == 4 and report["ok"] == 0
+    assert report["backlog"] == 20 - report["sent"]
+    assert st.is_saturated(report)
+
+
+def test_mix_e_saturacao():
+    assert st.parse_mix("creat:0.7, K") == {"CREAT": 0.7, "K": 1.0}
+    with pytest.raises(ValueError):
+        st.parse_mix("XYZ:1")
+    ok = {"throughput": 99.0, "rate_alvo": 100, "errors": 0, "p99_ms": 50.0}
+    assert not st.is_saturated(ok)
+    assert st.is_saturated({**ok, "throughput": 90.0})
+    assert st.is_saturated({**ok, "p99_ms": st.SATURATION_P99_MS + 1})